@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import List
+
+
+class GapBuffer(object):
+    """A text edited at a cursor. The characters are kept in a list with a gap of free slots at the cursor: typing and
+        erasing next to the cursor fill and widen the gap in constant time, moving the cursor moves the characters
+        between its old and new position across the gap.
+
+        Attributes:
+            cursor (int): The position of the cursor, from 0 (before the first character) to the length of the text.
+
+        Note:
+            The gap doubles when it is full, so that the cost of the insertions is amortized constant time.
+    """
+    __slots__ = ("_chars", "_start", "_end")
+
+    def __init__(self, text: str = '', capacity: int = 16):
+        size = max(len(text) + capacity, 1)
+        self._chars: List[str] = list(text) + [''] * (size - len(text))
+        # The gap is [_start, _end): the cursor is at _start.
+        self._start: int = len(text)
+        self._end: int = size
+
+    def __len__(self) -> int:
+        return len(self._chars) - (self._end - self._start)
+
+    def __str__(self) -> str:
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._chars[:self._start]) + ''.join(self._chars[self._end:])
+
+    @property
+    def cursor(self) -> int:
+        return self._start
+
+    @cursor.setter
+    def cursor(self, position: int) -> None:
+        position = min(max(position, 0), len(self))
+        chars, start, end = self._chars, self._start, self._end
+        if position < start:
+            # The characters between the new position and the cursor move to the end of the gap.
+            moved = start - position
+            chars[end - moved:end] = chars[position:start]
+            self._start, self._end = position, end - moved
+        elif position > start:
+            moved = position - start
+            chars[start:start + moved] = chars[end:end + moved]
+            self._start, self._end = position, end + moved
+
+    def slice(self, start: int, end: int) -> str:
+        """Returns the characters [start, end) of the text without building the whole text."""
+        length = len(self)
+        start, end = min(max(start, 0), length), min(max(end, 0), length)
+        gap = self._end - self._start
+        if end <= self._start:
+            return ''.join(self._chars[start:end])
+        if start >= self._start:
+            return ''.join(self._chars[start + gap:end + gap])
+        return ''.join(self._chars[start:self._start]) + ''.join(self._chars[self._end:end + gap])
+
+    def insert(self, text: str) -> None:
+        """Inserts text at the cursor, which moves after it."""
+        if len(text) > self._end - self._start:
+            # The gap grows to twice the size of the text, at least by the size of the inserted text.
+            grow = max(len(self._chars), len(text))
+            self._chars[self._end:self._end] = [''] * grow
+            self._end += grow
+        self._chars[self._start:self._start + len(text)] = text
+        self._start += len(text)
+
+    def delete_before(self, count: int = 1) -> str:
+        """Erases up to count characters before the cursor, as the backspace key.
+
+        Returns:
+            The erased characters.
+        """
+        count = min(count, self._start)
+        erased = ''.join(self._chars[self._start - count:self._start])
+        self._start -= count
+        return erased
+
+    def delete_after(self, count: int = 1) -> str:
+        """Erases up to count characters after the cursor, as the delete key.
+
+        Returns:
+            The erased characters.
+        """
+        count = min(count, len(self._chars) - self._end)
+        erased = ''.join(self._chars[self._end:self._end + count])
+        self._end += count
+        return erased
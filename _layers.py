@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Tuple
+
+from cell_buffer import CellBuffer
+from gui_elements import ElementTreeManager
+
+
+class Layer(object):
+    """A tab or a popup of the window: an element tree drawn into its own cell buffer. The buffer is retained between
+        frames, so that the layer can be shown again, or uncovered by a popup, without rendering its elements.
+
+        Attributes:
+            name (str): The identifier of the layer.
+            buffer (CellBuffer): The cells drawn by the elements, with the size of the window. It is the canvas of
+                                 the root of the element tree.
+            manager (ElementTreeManager): The element tree and its active element.
+            is_popup (bool): True for a popup, drawn over the layers beneath it, False for a tab.
+            region (Tuple[int, int, int, int]): The (y, x, h, w) rectangle of the screen covered by the layer: the
+                                                whole screen for a tab, the union of its top-level elements for a
+                                                popup. It is computed by render().
+            valid (bool): False when the buffer no longer holds the elements, e.g. before the first render or after
+                          a resize.
+    """
+    def __init__(self, name: str, h: int, w: int, is_popup: bool = False, manager: ElementTreeManager = None):
+        self.name: str = name
+        self.buffer: CellBuffer = CellBuffer(h, w)
+        self.is_popup: bool = is_popup
+        self.region: Tuple[int, int, int, int] = (0, 0, h, w)
+        self.valid: bool = False
+        # An existing tree, e.g. the one the elements were added to before the first tab, is moved to the buffer.
+        if manager is None:
+            self.manager: ElementTreeManager = ElementTreeManager(self.buffer)
+        else:
+            self.manager: ElementTreeManager = manager
+            manager.canvas = self.buffer
+
+    def resize(self, h: int, w: int) -> None:
+        """Changes the size of the buffer if it differs. Its content is then lost until the next render()."""
+        if self.buffer.get_max_yx() != (h, w):
+            self.buffer.resize(h, w)
+            self.region = (0, 0, h, w)
+            self.valid = False
+
+    def render(self) -> None:
+        """Renders all the elements of the layer into its buffer and computes the region it covers."""
+        self.buffer.clear()
+        elements = [element for element in self.manager.get_elements() if element.shown]
+        for element in elements:
+            element.render()
+        self.valid = True
+
+        if self.is_popup:
+            rectangles = [(element.y, element.x, element.h, element.w) for element in elements if element.is_visible]
+            if rectangles:
+                top = min(y for y, x, h, w in rectangles)
+                left = min(x for y, x, h, w in rectangles)
+                bottom = max(y + h for y, x, h, w in rectangles)
+                right = max(x + w for y, x, h, w in rectangles)
+                self.region = (top, left, bottom - top, right - left)
+            else:
+                self.region = (0, 0, 0, 0)
+
+    def rows(self) -> range:
+        """The rows of the screen covered by the layer."""
+        return range(self.region[0], self.region[0] + self.region[2])
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Iterator, List, Tuple, Union
+
+# The largest number of characters held by a leaf. Editing a leaf copies its text.
+LEAF_SIZE = 512
+
+
+class _Leaf(object):
+    __slots__ = ("text", "length", "newlines", "height")
+
+    def __init__(self, text: str):
+        self.text: str = text
+        self.length: int = len(text)
+        self.newlines: int = text.count('\n')
+        self.height: int = 0
+
+
+class _Branch(object):
+    __slots__ = ("left", "right", "length", "newlines", "height")
+
+    def __init__(self, left: _Piece, right: _Piece):
+        self.left: _Piece = left
+        self.right: _Piece = right
+        self.length: int = left.length + right.length
+        self.newlines: int = left.newlines + right.newlines
+        self.height: int = max(left.height, right.height) + 1
+
+
+_Piece = Union[_Leaf, _Branch]
+
+
+def _balance(left: _Piece, right: _Piece) -> _Piece:
+    # Joins two pieces whose heights differ by at most 2, with the rotations of an AVL tree.
+    if left.height > right.height + 1:
+        if left.left.height >= left.right.height:
+            return _Branch(left.left, _Branch(left.right, right))
+        inner = left.right
+        return _Branch(_Branch(left.left, inner.left), _Branch(inner.right, right))
+    if right.height > left.height + 1:
+        if right.right.height >= right.left.height:
+            return _Branch(_Branch(left, right.left), right.right)
+        inner = right.left
+        return _Branch(_Branch(left, inner.left), _Branch(inner.right, right.right))
+    return _Branch(left, right)
+
+
+def _join(left: Union[None, _Piece], right: Union[None, _Piece]) -> Union[None, _Piece]:
+    # Concatenates two balanced pieces, in a time proportional to the difference of their heights.
+    if left is None or right is None:
+        return right if left is None else left
+    if left.height == 0 and right.height == 0 and left.length + right.length <= LEAF_SIZE:
+        return _Leaf(left.text + right.text)
+    if left.height > right.height + 1:
+        return _balance(left.left, _join(left.right, right))
+    if right.height > left.height + 1:
+        return _balance(_join(left, right.left), right.right)
+    return _Branch(left, right)
+
+
+def _build(text: str) -> Union[None, _Piece]:
+    # A balanced piece holding a text, cut into leaves of at most LEAF_SIZE characters.
+    leaves: List[_Piece] = [_Leaf(text[n:n + LEAF_SIZE]) for n in range(0, len(text), LEAF_SIZE)]
+    if not leaves:
+        return None
+    while len(leaves) > 1:
+        paired = [_Branch(leaves[n], leaves[n + 1]) for n in range(0, len(leaves) - 1, 2)]
+        if len(leaves) % 2:
+            paired[-1] = _join(paired[-1], leaves[-1])
+        leaves = paired
+    return leaves[0]
+
+
+def _split(piece: Union[None, _Piece], index: int) -> Tuple[Union[None, _Piece], Union[None, _Piece]]:
+    # Cuts a piece in two before the character at index.
+    if piece is None:
+        return None, None
+    if index <= 0:
+        return None, piece
+    if index >= piece.length:
+        return piece, None
+    if piece.height == 0:
+        return _Leaf(piece.text[:index]), _Leaf(piece.text[index:])
+    if index < piece.left.length:
+        left, right = _split(piece.left, index)
+        return left, _join(right, piece.right)
+    left, right = _split(piece.right, index - piece.left.length)
+    return _join(piece.left, left), right
+
+
+def _insert(piece: Union[None, _Piece], index: int, text: str) -> _Piece:
+    if piece is None:
+        return _build(text)
+    if piece.height == 0:
+        joined = piece.text[:index] + text + piece.text[index:]
+        return _Leaf(joined) if len(joined) <= LEAF_SIZE else _build(joined)
+    # A long text makes the edited side grow by more than one level: the sides are joined, not just balanced.
+    if index <= piece.left.length:
+        return _join(_insert(piece.left, index, text), piece.right)
+    return _join(piece.left, _insert(piece.right, index - piece.left.length, text))
+
+
+class Rope(object):
+    """A text kept in a balanced binary tree whose leaves hold pieces of it. Every node knows the number of characters
+        and of line breaks below it: inserting or erasing text, and finding a line or the line of a position, take a
+        time proportional to the logarithm of the length of the text.
+
+        Note:
+            A rope is never modified in place: the nodes along the edited path are replaced, the others are shared.
+    """
+    __slots__ = ("_root",)
+
+    def __init__(self, text: str = ''):
+        self._root: Union[None, _Piece] = _build(text)
+
+    def __len__(self) -> int:
+        return 0 if self._root is None else self._root.length
+
+    def __str__(self) -> str:
+        return ''.join(self._leaves(0, len(self)))
+
+    @property
+    def line_count(self) -> int:
+        """The number of lines, one more than the number of line breaks."""
+        return 1 if self._root is None else self._root.newlines + 1
+
+    def insert(self, index: int, text: str) -> None:
+        """Inserts text before the character at index."""
+        if text:
+            self._root = _insert(self._root, min(max(index, 0), len(self)), text)
+
+    def delete(self, start: int, end: int) -> str:
+        """Erases the characters [start, end).
+
+        Returns:
+            The erased characters.
+        """
+        start, end = max(start, 0), min(end, len(self))
+        if end <= start:
+            return ''
+        erased = self.slice(start, end)
+        left, rest = _split(self._root, start)
+        _, right = _split(rest, end - start)
+        self._root = _join(left, right)
+        return erased
+
+    def _leaves(self, start: int, end: int) -> Iterator[str]:
+        # The parts of the leaves covering [start, end).
+        stack = [(self._root, 0)] if self._root is not None else []
+        while stack:
+            piece, offset = stack.pop()
+            if offset >= end or offset + piece.length <= start:
+                continue
+            if piece.height == 0:
+                yield piece.text[max(start - offset, 0):end - offset]
+            else:
+                stack.append((piece.right, offset + piece.left.length))
+                stack.append((piece.left, offset))
+
+    def slice(self, start: int, end: int) -> str:
+        """Returns the characters [start, end)."""
+        return ''.join(self._leaves(max(start, 0), end))
+
+    def line_start(self, line: int) -> int:
+        """Returns the position of the first character of a line, counted from 0. The lines after the last one start
+            at the end of the text."""
+        if line <= 0 or self._root is None:
+            return 0
+        if line > self._root.newlines:
+            return len(self)
+        # The line starts after the line-th line break.
+        piece, offset, remaining = self._root, 0, line
+        while piece.height:
+            if remaining <= piece.left.newlines:
+                piece = piece.left
+            else:
+                remaining -= piece.left.newlines
+                offset += piece.left.length
+                piece = piece.right
+        position = -1
+        for n in range(remaining):
+            position = piece.text.index('\n', position + 1)
+        return offset + position + 1
+
+    def line_of(self, index: int) -> int:
+        """Returns the line of the character at index, counted from 0."""
+        piece, line, index = self._root, 0, min(max(index, 0), len(self))
+        while piece is not None and piece.height:
+            if index < piece.left.length:
+                piece = piece.left
+            else:
+                line += piece.left.newlines
+                index -= piece.left.length
+                piece = piece.right
+        return line if piece is None else line + piece.text.count('\n', 0, index)
+
+    def line(self, line: int) -> str:
+        """Returns the text of a line, without its line break."""
+        start = self.line_start(line)
+        end = self.line_start(line + 1)
+        if line + 1 < self.line_count:
+            end -= 1
+        return self.slice(start, end)
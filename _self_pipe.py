@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# imports used for type hints
+from typing import Callable, Union
+
+import os
+import signal
+import threading
+
+
+class SelfPipe(object):
+    """A non-blocking pipe used to wake up a select() call from a signal handler or from another thread.
+        Each notification is a single byte telling its reason.
+
+        Note:
+            Notifications are lost if the pipe is full, which only happens when thousands of them are pending. The
+            reader is guaranteed to be woken up anyway.
+    """
+    RESIZE = b'R'
+    WAKEUP = b'W'
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+        self._previous_handler: Union[None, Callable] = None
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._read_fd = self._write_fd = -1
+
+    def fileno(self) -> int:
+        """The file descriptor to watch for reading."""
+        return self._read_fd
+
+    def notify(self, reason: bytes = WAKEUP) -> None:
+        try:
+            os.write(self._write_fd, reason)
+        except (BlockingIOError, OSError):
+            pass
+
+    def drain(self) -> bytes:
+        """Reads all the pending notifications without blocking."""
+        reasons = b''
+        while True:
+            try:
+                chunk = os.read(self._read_fd, 4096)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            reasons += chunk
+        return reasons
+
+    def watch_resize(self) -> bool:
+        """Installs a SIGWINCH handler notifying RESIZE through the pipe. The previous handler is still called.
+
+        Returns:
+            True if the handler is installed. It is not possible outside the main thread, or on platforms without
+            SIGWINCH.
+        """
+        if not hasattr(signal, "SIGWINCH") or threading.current_thread() is not threading.main_thread():
+            return False
+
+        previous = signal.getsignal(signal.SIGWINCH)
+        self._previous_handler = previous if callable(previous) else None
+
+        def on_resize(signum, frame):
+            self.notify(self.RESIZE)
+            if self._previous_handler is not None:
+                self._previous_handler(signum, frame)
+
+        signal.signal(signal.SIGWINCH, on_resize)
+        return True
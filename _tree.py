@@ -5,7 +5,7 @@
 
 # Imports used for type hints
 from __future__ import annotations
-from typing import Any, Union, List
+from typing import Any, Callable, Union, List
 
 
 class Node(object):
@@ -15,7 +15,12 @@ class Node(object):
     Attributes:
         name (str): The identifier of the node.
         payload (Any): The object carried by the node. It can be anything.
+
+    Note:
+        A node is created for every element, the attributes are kept in slots rather than in a per-instance dict.
     """
+    __slots__ = ("_name", "_payload", "_parent", "_children")
+
     def __init__(self, name: str, payload: Any = None):
         self._name: str = name
         self._payload: Any = payload
@@ -30,6 +35,10 @@ class Node(object):
     def payload(self) -> Any:
         return self._payload
 
+    @payload.setter
+    def payload(self, payload: Any) -> None:
+        self._payload = payload
+
     @property
     def parent(self) -> Node:
         return self._parent
@@ -68,12 +77,13 @@ class Node(object):
             yield child
 
 
-def _node_iterator(node: Node) -> Union[Node, _node_iterator]:
+def _node_iterator(node: Node, skip: Callable[[Node], bool] = None) -> Union[Node, _node_iterator]:
     """A generator that takes a Node as input and yields (one-by-one) all the leaves
         of the subtree originated from the node.
 
     Parameters:
         node (Node): A starting node. It defines the subtree for the research of leaves.
+        skip (Callable): (Optional) The children for which it returns True are not visited, nor their subtrees.
 
     Returns:
         The next available leaf of the subtree.
@@ -82,7 +92,9 @@ def _node_iterator(node: Node) -> Union[Node, _node_iterator]:
         yield node
     else:
         for child in node:
-            iterator = _node_iterator(child)
+            if skip is not None and skip(child):
+                continue
+            iterator = _node_iterator(child, skip)
             stop = False
             while not stop:
                 try:
@@ -101,14 +113,19 @@ class Tree(object):
                             a new node with the provided name. If the root payload (optional) parameter is passed, it
                             will be the payload of the newly created root node.
         _current (Node): The current node. I.e. the last node yielded by the set_next() method.
+        _skip (Callable): (Optional) A function returning True for the nodes whose subtree is left out of the leaves,
+                          e.g. the hidden ones. It is called at each step, the skipped nodes may change at any time.
+                          When every node is skipped, the current node is the root.
     """
-    def __init__(self, root: Union[str, Node] = "root", root_payload: Any = None):
+    def __init__(self, root: Union[str, Node] = "root", root_payload: Any = None,
+                 skip: Callable[[Node], bool] = None):
         if isinstance(root, str):
             self._root: Node = Node(root, root_payload)
         elif isinstance(root, Node):
             self._root: Node = root
+        self._skip: Union[None, Callable[[Node], bool]] = skip
         self._current: Node = self._root
-        self._iterator: _node_iterator = _node_iterator(self._root)
+        self._iterator: _node_iterator = _node_iterator(self._root, skip)
 
     @property
     def root(self) -> Node:
@@ -120,7 +137,7 @@ class Tree(object):
 
     @property
     def leaves(self) -> List[Node]:
-        return [leaf for leaf in _node_iterator(self._root)]
+        return [leaf for leaf in _node_iterator(self._root, self._skip)]
 
     def get_node(self, name: str, node: Node = None) -> Union[None, Node]:
         """Method looking for the first occurrence of a node in the tree with a given its name.
@@ -156,8 +173,23 @@ class Tree(object):
             If any node of the tree is modified this method MUST be called before any call of the set_next() method.
 
         """
-        self._iterator = _node_iterator(self._root)
-        self._current = next(self._iterator)
+        self._iterator = _node_iterator(self._root, self._skip)
+        self._current = next(self._iterator, self._root)
+
+    def set_current(self, node: Node) -> bool:
+        """Makes a leaf the current one: set_next() continues the sequence from it.
+
+        Returns:
+            True if the node is a leaf of the sequence, False otherwise. The current leaf is then unchanged.
+
+        """
+        iterator = _node_iterator(self._root, self._skip)
+        for leaf in iterator:
+            if leaf is node:
+                self._iterator = iterator
+                self._current = leaf
+                return True
+        return False
 
     def set_next(self) -> Node:
         """Yields the next leaf of the sequence
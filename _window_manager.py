@@ -1,12 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # imports used for type hints
-from typing import Tuple, Union
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Deque, Iterable, Iterator, List, Set, Tuple, Union
 
 # allows the definition of interfaces
 from abc import abstractmethod
 
-from gui_elements import ICanvas, GuiElement, ElementTreeManager
+# asyncio is only imported by the asynchronous run mode, it takes a large part of the startup time.
+from collections import deque
+from collections.abc import Awaitable as _Awaitable
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+from gui_elements import ICanvas, GuiElement, ElementTreeManager, CannotDrawError
+from _layers import Layer
+from _tree import Node
+from cell_buffer import CellBuffer
+from instrumentation import RenderStats, StatsOverlay, add_sink, remove_sink
+from text_width import truncate, width as width_of
+from tracing import TraceRecorder
+
+# Key code reported by the backends after the terminal has been resized. It has the same value curses uses.
+KEY_RESIZE = 410
 
 
 class IWindow(ICanvas):
@@ -14,9 +31,24 @@ class IWindow(ICanvas):
         though the interface method.
     """
     @abstractmethod
-    def get_input(self) -> int:
+    def get_input(self, timeout: float = None) -> int:
+        """Waits for the next input, for at most timeout seconds (forever by default).
+            Returns None if the timeout expired without any input."""
+        pass
+
+    def wakeup(self) -> None:
+        """Makes a get_input() waiting in another thread return None. It must be safe to call from any thread."""
         pass
 
+    def input_fds(self) -> List[int]:
+        """The file descriptors that become readable when get_input() has an input to return without waiting.
+            They are watched by the event loop in the asynchronous run mode."""
+        return []
+
+    def is_resize(self, key: int) -> bool:
+        """Tells whether an input returned by get_input() notifies a terminal resize."""
+        return key == KEY_RESIZE
+
     @abstractmethod
     def delete(self, y_pos: int, x_pos: int) -> None:
         pass
@@ -25,20 +57,76 @@ class IWindow(ICanvas):
     def clear(self) -> None:
         pass
 
+    def flush(self) -> None:
+        """Sends to the terminal what has been drawn so far. Backends writing immediately do not need it."""
+        pass
+
+
+def _traced(name: str, category: str) -> Callable:
+    """Decorator recording the calls of a WindowManager method as spans when a trace is running."""
+    def decorate(method: Callable) -> Callable:
+        @wraps(method)
+        def traced(self, *args, **kwargs):
+            if self._tracer is None:
+                return method(self, *args, **kwargs)
+            start = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._tracer.complete(name, category, start, perf_counter())
+        return traced
+    return decorate
+
 
 class WindowManager(object):
     """Manages the low level API for rendering the elements displayed on the window an catch user interaction.
        It takes care of exposing the current active element and provides methods to activate a new one.
 
+       Note:
+           The elements can be organised in tabs and popups (see add_tab() and open_popup()). Each one is a Layer:
+           an element tree drawn into its own retained cell buffer. The current tab and the stack of popups above it
+           are composed on the window when it is flushed, so that switching tabs or closing a popup only copies
+           cells, without rendering the elements again. Without tabs nor popups, the elements draw on the window.
     """
-
-    #   TODO: Implement tabs through a cyclic list of PanelManagers.
-    #   TODO: Implement popup panels through a stack.
-
     def __init__(self):
         self._window: Union[None, IWindow] = None
         self._element_tree_manager: Union[None, ElementTreeManager] = None
 
+        # The tabs form a cyclic list, the popups a stack drawn over the current tab. The active element is the one of
+        # the top popup, or of the current tab if there is no popup.
+        self._tabs: List[Layer] = []
+        self._tab: int = 0
+        self._popups: List[Layer] = []
+        # The tab composed on the window, which differs from the current one until the latter is selected.
+        self._shown_tab: Union[None, Layer] = None
+        # The composed screen, for the windows which do not draw into a cell buffer.
+        self._screen: Union[None, CellBuffer] = None
+        self._stats: Union[None, RenderStats] = None
+        self._stats_overlay: Union[None, StatsOverlay] = None
+        self._tracer: Union[None, TraceRecorder] = None
+        self._offscreen: Union[None, OffscreenRenderer] = None
+
+        # State of the asynchronous run mode (see serve()).
+        self._loop: Union[None, asyncio.AbstractEventLoop] = None
+        self._stopped: Union[None, asyncio.Future] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._invalidated: Union[None, Set[GuiElement]] = None
+        self._full_render: bool = False
+
+        # Updates posted by other threads (see post()). Appending to and popping from a deque are atomic.
+        self._updates: Deque[Tuple[Callable[[], Any], Union[None, GuiElement]]] = deque()
+        self._wakeup_pending: bool = False
+
+        # Elements to redraw at the end of the running batch (see batch()), None outside of a batch.
+        self._batch: Union[None, Set[GuiElement]] = None
+        self._batch_full: bool = False
+
+        # Resize handling (see get_input()). Inputs read while waiting for the end of a resize are kept for later.
+        self.resize_delay: float = 0.1
+        self.interim_resize_frames: bool = False
+        self._pending_inputs: Deque[Any] = deque()
+        self._resize_timer: Union[None, asyncio.TimerHandle] = None
+
     @property
     def window(self) -> IWindow:
         return self._window
@@ -47,9 +135,156 @@ class WindowManager(object):
     def window(self, window: IWindow):
         self._window = window
         self._element_tree_manager = ElementTreeManager(window)
+        self._tabs = []
+        self._tab = 0
+        self._popups = []
+        self._shown_tab = None
+
+    @_traced("input wait", "input")
+    def get_input(self, timeout: float = None) -> int:
+        """Waits for the next input. The updates posted by other threads meanwhile are applied and drawn.
+
+        A terminal resize is debounced: the burst of resizes fired while a window edge is dragged is returned as a
+        single resize input, once no other resize happened for resize_delay seconds. The window has then already
+        been laid out and redrawn, the caller does not need to render it. Set resize_delay to 0 to receive every
+        resize as it happens, and interim_resize_frames to True to draw the borders of the top-level panels at each
+        resize of the burst.
+
+        Parameters:
+            timeout (float): (Optional) Maximum time to wait in seconds. It blocks until an input by default.
+
+        Returns:
+            The input, None if the timeout expired.
+        """
+        deadline = None if timeout is None else perf_counter() + timeout
+        while True:
+            if self._updates:
+                # Pending inputs go first: the updates are applied while the user is idle.
+                key = self._read_input(0)
+                if key is not None:
+                    return key
+                self.process_updates()
+
+            if self._updates:
+                # The budget of process_updates() was exhausted: inputs are checked before applying the rest.
+                wait = 0
+            elif deadline is None:
+                wait = None
+            else:
+                wait = max(deadline - perf_counter(), 0)
+
+            key = self._read_input(wait)
+            if key is not None:
+                return key
+            if deadline is not None and perf_counter() >= deadline:
+                return None
+
+    def _read_input(self, timeout: Union[None, float]) -> Any:
+        if self._pending_inputs:
+            return self._pending_inputs.popleft()
+        key = self.window.get_input(timeout)
+        # The asynchronous run mode debounces resizes with a timer of the event loop instead of waiting.
+        if key is None or self._loop is not None or self.resize_delay <= 0 or not self.is_resize(key):
+            return key
+        return self._settle_resize(key)
+
+    @_traced("resize settle", "input")
+    def _settle_resize(self, key: Any) -> Any:
+        # Waits until the size stops changing, then lays out and draws the window once.
+        while True:
+            if self.interim_resize_frames:
+                self._draw_interim_frame()
+            following = self.window.get_input(self.resize_delay)
+            if following is None:
+                break
+            if not self.is_resize(following):
+                # The user is typing again: the size is settled.
+                self._pending_inputs.append(following)
+                break
+            key = following
+        self.render()
+        return key
+
+    def _draw_interim_frame(self) -> None:
+        # A cheap frame drawn while the terminal is being resized: the borders of the top-level panels only.
+        self.window.clear()
+        for element in self._element_tree_manager.get_elements():
+            draw_borders = getattr(element, "draw_borders", None)
+            if draw_borders is not None:
+                try:
+                    draw_borders()
+                except CannotDrawError:
+                    pass
+        self.flush()
+
+    def get_inputs(self, timeout: float = None, collapse: Iterable = (), limit: int = 1024) -> List[Tuple[Any, int]]:
+        """Waits for the next input, then drains without blocking all the inputs already pending, e.g. a paste or the
+            repetitions of a held-down key. The batch is meant to be dispatched inside batch(), so that it is drawn
+            once.
+
+        Parameters:
+            timeout (float): (Optional) Maximum time to wait for the first input in seconds. It blocks by default.
+            collapse (Iterable): (Optional) The keys whose consecutive repetitions are merged, typically the
+                                 navigation keys.
+            limit (int): Maximum number of inputs read at once.
+
+        Returns:
+            The (input, repetitions) pairs in the order they were received. The repetitions are always 1 for the
+            keys not in collapse. The list is empty if the timeout expired.
+        """
+        key = self.get_input(timeout)
+        if key is None:
+            return []
+        collapse = set(collapse)
+        inputs = [(key, 1)]
+        for n in range(limit - 1):
+            key = self._read_input(0)
+            if key is None:
+                break
+            last, count = inputs[-1]
+            if key == last and key in collapse and not self.is_resize(key):
+                inputs[-1] = (last, count + 1)
+            else:
+                inputs.append((key, 1))
+        return inputs
 
-    def get_input(self) -> int:
-        return self.window.get_input()
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Defers the drawing made by the window manager until the end of the block: the elements activated and
+            deactivated by get_next() and reset_active() are redrawn once, and calls to render() produce a single
+            frame. Batches can be nested, the outermost one draws.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = set()
+        try:
+            yield
+        finally:
+            dirty, full = self._batch, self._batch_full
+            self._batch = None
+            self._batch_full = False
+            if full:
+                self.render()
+            else:
+                for element in dirty:
+                    if element.is_shown:
+                        element.render()
+                self.flush()
+
+    def _redraw(self, *elements: Any) -> None:
+        # Redraws the focus changes now, or at the end of the running batch.
+        elements = [element for element in elements if isinstance(element, GuiElement)]
+        if self._batch is not None:
+            self._batch.update(elements)
+            return
+        for element in elements:
+            if element.is_shown:
+                element.render()
+        self.flush()
+
+    def is_resize(self, key: int) -> bool:
+        return self.window.is_resize(key)
 
     def get_max_yx(self) -> Tuple[int, int]:
         return self.window.get_max_yx()
@@ -60,34 +295,631 @@ class WindowManager(object):
     def clear(self) -> None:
         self.window.clear()
 
+    @_traced("flush", "backend")
+    def flush(self) -> None:
+        if self._tabs:
+            self._present()
+        self.window.flush()
+
+    @_traced("frame", "frame")
     def render(self) -> None:
+        if self._batch is not None:
+            self._batch_full = True
+            return
+        if self._offscreen is not None:
+            managers = [layer.manager for layer in self._layers()] if self._tabs else [self._element_tree_manager]
+            self._prefetch(leaf.payload for manager in managers for leaf in manager.tree.leaves)
         self.clear()
-        for child in self._element_tree_manager.get_elements():
-            child.render()
+        if self._tabs:
+            # The current tab and the popups are rendered into their buffers, then composed on the window.
+            h, w = self.window.get_max_yx()
+            for layer in self._layers():
+                layer.resize(h, w)
+                layer.render()
+            self._present(range(h))
+            self._shown_tab = self._tabs[self._tab]
+        else:
+            for child in self._element_tree_manager.get_elements():
+                if child.shown:
+                    child.render()
+        if self._stats is not None:
+            self._stats.counters["frames"] += 1
+            if self._stats_overlay is not None:
+                self._stats_overlay.render()
         if isinstance(self._element_tree_manager.get_current(), GuiElement):
             if not self._element_tree_manager.get_current().is_visible:
                 self.get_next()
+        self.flush()
+
+    @property
+    def stats(self) -> Union[None, RenderStats]:
+        """The statistics collected since enable_stats() was called, None if the instrumentation is disabled."""
+        return self._stats
+
+    def enable_stats(self, overlay: bool = False) -> RenderStats:
+        """Installs the instrumentation hooks counting constraint evaluations, size queries, draw calls and bytes
+            written, and timing the render() of each element.
+
+        Parameters:
+            overlay (bool): Set to True to display the statistics in a panel drawn on top of the elements at each
+                            render. The window must already be set.
+
+        Returns:
+            The RenderStats instance collecting the data.
+        """
+        if self._stats is None:
+            self._stats = RenderStats()
+            add_sink(self._stats)
+        if overlay and self._stats_overlay is None:
+            self._stats_overlay = StatsOverlay(self._stats)
+            Node("StatsOverlay", self.window).add_child(self._stats_overlay.node)
+        return self._stats
+
+    def disable_stats(self) -> None:
+        """Removes the instrumentation hooks (when no other sink uses them) and the overlay."""
+        if self._stats is not None:
+            remove_sink(self._stats)
+        self._stats = None
+        self._stats_overlay = None
+
+    @property
+    def offscreen(self) -> Union[None, OffscreenRenderer]:
+        """The renderer painting the off-screen elements in parallel, None if it is disabled."""
+        return self._offscreen
+
+    def enable_offscreen(self, workers: int = None) -> OffscreenRenderer:
+        """Starts a pool of processes painting the OffscreenElements (see offscreen.py) shown on the screen in
+            parallel, before each frame and before drawing the elements modified by posted updates or invalidations.
+
+        Parameters:
+            workers (int): (Optional) The number of processes, the number of CPUs by default.
+
+        Returns:
+            The OffscreenRenderer.
+        """
+        # Imported here as multiprocessing is only needed by the applications rendering off-screen.
+        from offscreen import OffscreenRenderer
+        if self._offscreen is None:
+            self._offscreen = OffscreenRenderer(workers)
+        return self._offscreen
+
+    def disable_offscreen(self) -> None:
+        """Stops the processes: the off-screen elements paint themselves again when they are rendered."""
+        if self._offscreen is not None:
+            self._offscreen.close()
+        self._offscreen = None
+
+    def _prefetch(self, elements: Iterable[Any]) -> None:
+        # The off-screen elements about to be rendered are painted in parallel.
+        from offscreen import OffscreenElement
+        self._offscreen.prefetch([element for element in elements
+                                  if isinstance(element, OffscreenElement) and element.is_shown])
+
+    @property
+    def tabs(self) -> List[Layer]:
+        return list(self._tabs)
+
+    @property
+    def current_tab(self) -> Union[None, Layer]:
+        return self._tabs[self._tab] if self._tabs else None
+
+    @property
+    def popups(self) -> List[Layer]:
+        """The open popups, from the bottom of the stack to the top one."""
+        return list(self._popups)
+
+    def _layers(self) -> List[Layer]:
+        # The layers composing the screen, from the bottom one.
+        return [self._tabs[self._tab]] + self._popups
+
+    def _activate_top(self) -> None:
+        self._element_tree_manager = self._layers()[-1].manager
+
+    def _ensure_tab(self) -> None:
+        # The elements added before the first tab, if any, form a first tab named "main".
+        if not self._tabs:
+            h, w = self.window.get_max_yx()
+            self._tabs.append(Layer("main", h, w, manager=self._element_tree_manager))
+            self._tab = 0
+
+    def _validate(self) -> bool:
+        """Renders the layers of the screen whose buffer is not up to date, e.g. after a resize.
+
+        Returns:
+            True if a layer was rendered.
+        """
+        h, w = self.window.get_max_yx()
+        rendered = False
+        for layer in self._layers():
+            layer.resize(h, w)
+            if not layer.valid:
+                layer.render()
+                rendered = True
+        return rendered
+
+    def _present(self, rows: Iterable[int] = None) -> None:
+        """Composes rows of the screen from the buffers of the current tab and of the popups above it, and copies
+            them to the window.
+
+        Parameters:
+            rows (Iterable[int]): (Optional) The rows to compose. By default, the rows written in any of the
+                                  layers since they were last presented.
+        """
+        layers = self._layers()
+        if rows is None:
+            rows = set()
+            for layer in layers:
+                rows |= layer.buffer.touched
+        for layer in layers:
+            layer.buffer.touched = set()
+
+        h, w = self.window.get_max_yx()
+        screen = getattr(self.window, "buffer", None)
+        # The windows drawing into a cell buffer receive the cells directly, the others are sent runs of cells.
+        direct = isinstance(screen, CellBuffer) and screen.get_max_yx() == (h, w)
+        if not direct:
+            if self._screen is None or self._screen.get_max_yx() != (h, w):
+                self._screen = CellBuffer(h, w)
+            screen = self._screen
+
+        tab = layers[0].buffer
+        for y in sorted(rows):
+            if not 0 <= y < h:
+                continue
+            screen.blit_region(tab, y, 0, 1, w)
+            for popup in layers[1:]:
+                top, left, height, width = popup.region
+                if top <= y < top + height:
+                    screen.blit_region(popup.buffer, y, left, 1, width)
+            if not direct:
+                for _, x, text, attr in screen.runs(y):
+                    # Writing the bottom-right cell scrolls some terminals (or fails with curses): it is left out.
+                    if y == h - 1 and x + width_of(text) >= w:
+                        text = truncate(text, w - 1 - x)
+                    if text:
+                        self.window.draw(y, x, text, attr)
+
+    def add_tab(self, name: str) -> Layer:
+        """Creates a tab and makes it the current one: the elements added next belong to it. It is shown by the next
+            call of select_tab() or render(). The elements added before the first tab form a first tab named "main".
+            The window must already be set.
+
+        Returns:
+            The Layer of the tab.
+        """
+        if not self._tabs and self._element_tree_manager.get_elements():
+            self._ensure_tab()
+        h, w = self.window.get_max_yx()
+        self._tabs.append(Layer(name, h, w))
+        self._tab = len(self._tabs) - 1
+        self._activate_top()
+        return self._tabs[self._tab]
+
+    @_traced("tab switch", "dispatch")
+    def select_tab(self, tab: Union[int, str, Layer]) -> Layer:
+        """Shows a tab, given by its index, name or Layer. Its retained buffer is copied to the window, which sends
+            only the cells that differ from the previous tab. Its elements are rendered only if the buffer is not up
+            to date, e.g. the first time or after a resize.
+
+        Returns:
+            The Layer of the tab.
+        """
+        if isinstance(tab, Layer):
+            index = self._tabs.index(tab)
+        elif isinstance(tab, str):
+            index = next((n for n, layer in enumerate(self._tabs) if layer.name == tab), None)
+            if index is None:
+                raise ValueError("There is no tab named {}".format(tab))
+        else:
+            index = tab % len(self._tabs)
+
+        self._tab = index
+        self._activate_top()
+        # The buffer of the tab is kept up to date while it is hidden: it is only rendered after a resize.
+        rendered = self._validate()
+        if rendered or self._tabs[index] is not self._shown_tab:
+            self._present(range(self.window.get_max_yx()[0]))
+            self._shown_tab = self._tabs[index]
+            # The active element of the tab is the one it had when it was left, unless there is none yet.
+            if not isinstance(self.get_active(), GuiElement):
+                self.reset_active()
+            self.flush()
+        return self._tabs[self._tab]
+
+    def next_tab(self, steps: int = 1) -> Layer:
+        """Shows the tab steps tabs after the current one, cycling through the list. Negative steps go backward."""
+        return self.select_tab((self._tab + steps) % len(self._tabs))
+
+    @_traced("popup open", "dispatch")
+    def open_popup(self, name: str, *elements: GuiElement) -> Layer:
+        """Pushes a popup made of the given elements on top of the screen and gives it the focus. Only the popup is
+            rendered, the screen underneath is kept by the buffers of the layers beneath.
+
+        Returns:
+            The Layer of the popup.
+        """
+        self._ensure_tab()
+        h, w = self.window.get_max_yx()
+        # The layers beneath are rendered first if their buffers are out of date, e.g. the first tab.
+        if self._validate():
+            self._present(range(h))
+        layer = Layer(name, h, w, is_popup=True)
+        for element in elements:
+            layer.manager.add_element(element)
+        self._popups.append(layer)
+        self._activate_top()
+        layer.render()
+        self._present(layer.rows())
+        self.reset_active()
+        return layer
+
+    @_traced("popup close", "dispatch")
+    def close_popup(self) -> Union[None, Layer]:
+        """Removes the top popup. The region it covered is composed again from the buffers of the layers beneath,
+            without rendering their elements, and the focus goes back to the layer beneath.
+
+        Returns:
+            The Layer of the closed popup, None if there was none.
+        """
+        if not self._popups:
+            return None
+        layer = self._popups.pop()
+        self._activate_top()
+        self._present(layer.rows())
+        self.flush()
+        return layer
 
     def add_element(self, child: GuiElement) -> None:
         self._element_tree_manager.add_element(child)
 
-    def get_next(self) -> GuiElement:
+    def load_layout(self, path: str, use_cache: bool = True) -> List[GuiElement]:
+        """Adds the elements described by a JSON or TOML layout file. See layout.load().
+
+        Returns:
+            The top-level elements added.
+        """
+        # Imported here as json, pickle and hashlib are only needed by the applications using layout files.
+        from layout import load
+        elements = load(path, use_cache)
+        for element in elements:
+            self.add_element(element)
+        return elements
+
+    @_traced("focus next", "dispatch")
+    def get_next(self, steps: int = 1) -> GuiElement:
+        """Activates the next element, or the one steps elements ahead. Only the previous and the final active
+            elements are redrawn."""
         old = self._element_tree_manager.get_current()
-        new = self._element_tree_manager.activate_next()
-        if isinstance(old, GuiElement):
-            old.render()
-        if isinstance(new, GuiElement):
-            new.render()
+        new = old
+        for n in range(steps):
+            new = self._element_tree_manager.activate_next()
+        self._redraw(old, new)
         return new
 
     def get_active(self) -> GuiElement:
         return self._element_tree_manager.get_current()
 
+    @_traced("focus set", "dispatch")
+    def activate(self, element: GuiElement) -> bool:
+        """Activates the given element, if it is a visible leaf of the top layer. Only the previous and the new active
+            elements are redrawn.
+
+        Returns:
+            True if the element is now the active one.
+        """
+        old = self._element_tree_manager.get_current()
+        if not self._element_tree_manager.activate(element):
+            return False
+        if old is not element:
+            self._redraw(old, element)
+        return True
+
+    @_traced("focus reset", "dispatch")
     def reset_active(self) -> GuiElement:
         old = self._element_tree_manager.get_current()
         new = self._element_tree_manager.reset_active()
-        if isinstance(old, GuiElement):
-            old.render()
-        if isinstance(new, GuiElement):
-            new.render()
+        self._redraw(old, new)
         return new
+
+    @property
+    def tracer(self) -> Union[None, TraceRecorder]:
+        """The running trace recorder, None if no trace is running."""
+        return self._tracer
+
+    def start_trace(self, path: str = None, capacity: int = 100000,
+                    categories: Iterable[str] = None) -> TraceRecorder:
+        """Starts recording spans for input wait, event dispatch, frames, layout, element render and backend calls.
+
+        Parameters:
+            path (str): (Optional) A file where the Chrome trace-event JSON is streamed. If not given, the events are
+                        kept in a ring buffer of the given capacity.
+            capacity (int): The size of the ring buffer.
+            categories (Iterable[str]): (Optional) Restricts the recording to some categories. See TraceRecorder.
+
+        Returns:
+            The TraceRecorder collecting the events.
+        """
+        self.stop_trace()
+        self._tracer = TraceRecorder(path, capacity, categories)
+        add_sink(self._tracer)
+        return self._tracer
+
+    def stop_trace(self) -> Union[None, TraceRecorder]:
+        """Stops the running trace and closes its file.
+
+        Returns:
+            The stopped TraceRecorder, None if no trace was running.
+        """
+        tracer = self._tracer
+        if tracer is not None:
+            remove_sink(tracer)
+            tracer.close()
+        self._tracer = None
+        return tracer
+
+    def start_recording(self, path: str, keyframe_interval: int = 100) -> IWindow:
+        """Records the session: the window is wrapped by a RecordingWindow streaming the inputs and the changes of
+            each frame to a file, which can be converted to asciicast or replayed (see recording.py). The window must
+            already be set.
+
+        Parameters:
+            path (str): The recording file, gzip compressed if its name ends with .gz.
+            keyframe_interval (int): Number of frames between two full keyframes.
+
+        Returns:
+            The RecordingWindow.
+        """
+        # Imported here as the recorder itself depends on this module.
+        from recording import RecordingWindow
+
+        self.stop_recording()
+        recorder = RecordingWindow(self.window, path, keyframe_interval)
+        self._window = recorder
+        # The screen of a headless window is read from its buffer: the elements keep drawing on it directly.
+        # With tabs or popups, the elements draw into the buffers of the layers, which are composed through it.
+        if recorder.mirrored and self._element_tree_manager.canvas is recorder.window:
+            self._element_tree_manager.canvas = recorder
+        return recorder
+
+    def stop_recording(self) -> None:
+        """Closes the recording file and restores the wrapped window."""
+        recorder = self._window
+        if getattr(type(recorder), "wraps_window", False) and hasattr(recorder, "close"):
+            recorder.close()
+            self._window = recorder.window
+            if self._element_tree_manager.canvas is recorder:
+                self._element_tree_manager.canvas = recorder.window
+
+    def on_key(self, key: Any) -> Union[None, Awaitable]:
+        """Handles an input in the asynchronous run mode. Applications override it to react to keys.
+            It can be a coroutine: it is then scheduled as a task and the next inputs are handled without waiting for
+            it. Resizes are already handled by the window manager, which redraws the whole window once the size
+            settled (see get_input()) before passing the resize to on_key().
+
+        Parameters:
+            key (Any): The input returned by the window.
+        """
+        pass
+
+    def interact(self, value: Any = 0) -> Union[None, asyncio.Task]:
+        """Calls interact() on the active element with the given input, e.g. the keys typed while a text element is
+            active. If it is a coroutine, it is scheduled as a task."""
+        active = self.get_active()
+        if active is None:
+            return None
+        result = active.interact(value)
+        if isinstance(result, _Awaitable):
+            return self.spawn(result)
+        return None
+
+    def spawn(self, awaitable: Awaitable) -> asyncio.Task:
+        """Schedules a coroutine on the event loop of the asynchronous run mode. Its tasks can modify the elements and
+            call invalidate() to have them redrawn. An exception raised by a task stops serve() and is raised by it.
+        """
+        import asyncio
+        task = asyncio.ensure_future(awaitable)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            if self._stopped is not None and not self._stopped.done():
+                self._stopped.set_exception(task.exception())
+
+    def invalidate(self, element: GuiElement = None) -> None:
+        """Schedules the redraw of an element, or of the whole window if no element is given, as a callback of the
+            event loop. Many invalidations made before the callback runs produce a single frame.
+            Outside the asynchronous run mode the element (or window) is rendered immediately.
+        """
+        if self._loop is None:
+            if element is None:
+                self.render()
+            else:
+                if element.is_shown:
+                    element.render()
+                self.flush()
+            return
+
+        if element is None:
+            self._full_render = True
+        if self._invalidated is None:
+            self._invalidated = set()
+            self._loop.call_soon(self._render_invalidated)
+        if element is not None:
+            self._invalidated.add(element)
+
+    def _render_invalidated(self) -> None:
+        invalidated, self._invalidated = self._invalidated, None
+        if self._full_render:
+            self._full_render = False
+            self.render()
+        else:
+            if self._offscreen is not None:
+                self._prefetch(invalidated)
+            for element in invalidated:
+                if element.is_shown:
+                    element.render()
+            self.flush()
+
+    def post(self, update: Callable[[], Any], element: GuiElement = None) -> None:
+        """Queues a modification of the elements. It is safe to call from any thread (e.g. the workers of a
+            concurrent.futures pool): the update is applied later by the UI thread, either while it waits in
+            get_input(), which is woken up, or by the event loop in the asynchronous run mode.
+
+        Parameters:
+            update (Callable): Called without arguments by the UI thread. It should only modify the elements, the
+                               window manager draws them afterwards.
+            element (GuiElement): (Optional) The element modified by the update. Only the modified elements are
+                                  redrawn. If not given, the whole window is redrawn.
+        """
+        self._updates.append((update, element))
+        # A single wakeup is sent until the queue is drained, whatever the number of updates posted meanwhile.
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            loop = self._loop
+            if loop is not None:
+                loop.call_soon_threadsafe(self.process_updates)
+            else:
+                self.window.wakeup()
+
+    def process_updates(self, budget: float = 0.005) -> int:
+        """Applies the posted updates, then draws the modified elements once.
+
+        Parameters:
+            budget (float): Maximum time spent applying updates, in seconds. The remaining updates are left in the
+                            queue so that a flood of updates cannot starve the inputs.
+
+        Returns:
+            The number of updates applied.
+
+        Note:
+            An update raising an exception is dropped, the other ones are still applied and drawn. The first exception
+            raised is then raised again, once the window is up to date.
+        """
+        # Cleared before draining: an update posted from now on either is drained below or sends a new wakeup.
+        self._wakeup_pending = False
+        deadline = perf_counter() + budget
+        modified: Set[GuiElement] = set()
+        full = False
+        count = 0
+        error = None
+
+        try:
+            while self._updates:
+                update, element = self._updates.popleft()
+                # The element is redrawn even if its update failed: it may have been modified partly.
+                if element is None:
+                    full = True
+                else:
+                    modified.add(element)
+                count += 1
+                try:
+                    update()
+                except Exception as exception:
+                    if error is None:
+                        error = exception
+                # Reading the clock is not free: it is checked once every 256 updates.
+                if not count & 255 and perf_counter() > deadline:
+                    break
+
+        finally:
+            if full:
+                self.render()
+            elif modified:
+                if self._offscreen is not None:
+                    self._prefetch(modified)
+                for element in modified:
+                    if element.is_shown:
+                        element.render()
+                self.flush()
+
+            # Come back for the remaining updates, after the pending inputs.
+            if self._updates and self._loop is not None and not self._wakeup_pending:
+                self._wakeup_pending = True
+                self._loop.call_soon(self.process_updates)
+
+        if error is not None:
+            raise error
+        return count
+
+    def stop(self) -> None:
+        """Ends the asynchronous run mode: serve() returns."""
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
+
+    async def main_async(self) -> None:
+        """Started as a task when serve() begins. Applications override it to start their background tasks."""
+        pass
+
+    def _on_input_ready(self) -> None:
+        # Every input available is handled, and drawn once, before returning to the event loop.
+        with self.batch():
+            while True:
+                key = self.get_input(0)
+                if key is None:
+                    return
+                if self.is_resize(key):
+                    self._schedule_resize(key)
+                    continue
+                self._dispatch_key(key)
+                if self._stopped.done():
+                    return
+
+    def handle_key(self, key: Any) -> None:
+        """Passes a key to on_key() at once, as if it had just been read, and draws the result as a single frame. Used
+            to inject keys coming from elsewhere than the window, e.g. from a shared screen (see share.py)."""
+        with self.batch():
+            self._dispatch_key(key)
+
+    def _dispatch_key(self, key: Any) -> None:
+        result = self.on_key(key)
+        if isinstance(result, _Awaitable):
+            self.spawn(result)
+
+    def _schedule_resize(self, key: Any) -> None:
+        # Each resize of a burst postpones the full redraw.
+        if self._resize_timer is not None:
+            self._resize_timer.cancel()
+        if self.resize_delay <= 0:
+            self._resize_timer = None
+            self._resize_settled(key)
+            return
+        if self.interim_resize_frames:
+            self._draw_interim_frame()
+        self._resize_timer = self._loop.call_later(self.resize_delay, self._resize_settled, key)
+
+    def _resize_settled(self, key: Any) -> None:
+        self._resize_timer = None
+        self.invalidate()
+        self._dispatch_key(key)
+
+    async def serve(self) -> None:
+        """Runs the asynchronous mode on the running event loop: the inputs of the window are read by the loop and
+            passed to on_key(), main_async() is started and rendering is scheduled by invalidate(). It returns once
+            stop() is called, cancelling the tasks still running.
+        """
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        self._stopped = self._loop.create_future()
+        fds = self.window.input_fds()
+        for fd in fds:
+            self._loop.add_reader(fd, self._on_input_ready)
+
+        try:
+            self.spawn(self.main_async())
+            await self._stopped
+        finally:
+            for fd in fds:
+                self._loop.remove_reader(fd)
+            if self._resize_timer is not None:
+                self._resize_timer.cancel()
+                self._resize_timer = None
+            for task in list(self._tasks):
+                task.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._loop = None
+            self._stopped = None
+            self._invalidated = None
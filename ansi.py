@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple, Union
+
+from cell_buffer import CellBuffer, Run
+from gui_elements import TextStyles
+from text_width import width
+
+
+# SGR parameters of the TextStyles flags. The backends let the lowest color flag win, so they are applied last.
+_SGR_FLAGS = [(TextStyles.HIGHLIGHTED, "7"), (TextStyles.UNDERLINE, "4"), (TextStyles.BOLD, "1"),
+              (TextStyles.CYAN, "36"), (TextStyles.MAGENTA, "35"), (TextStyles.BLUE, "34"),
+              (TextStyles.YELLOW, "33"), (TextStyles.GREEN, "32"), (TextStyles.RED, "31")]
+
+RESET = "\x1b[0m"
+
+
+def _sgr_color(color: Union[int, tuple], base: int) -> str:
+    if isinstance(color, int):
+        return "{};5;{}".format(base, color)
+    return "{};2;{};{};{}".format(base, *color)
+
+
+def sgr(attr: int) -> str:
+    """Escape sequence selecting the style of a cell, starting from the default style."""
+    parameters = ["0"] + [code for flag, code in _SGR_FLAGS if attr & flag]
+    fg, bg = TextStyles.colors(attr)
+    if fg is not None:
+        parameters.append(_sgr_color(fg, 38))
+    if bg is not None:
+        parameters.append(_sgr_color(bg, 48))
+    return "\x1b[" + ";".join(parameters) + "m"
+
+
+def cup(y_pos: int, x_pos: int) -> str:
+    """The shortest absolute cursor move to a position, counted from 0."""
+    if x_pos == 0:
+        return "\x1b[H" if y_pos == 0 else "\x1b[{}H".format(y_pos + 1)
+    return "\x1b[{};{}H".format(y_pos + 1, x_pos + 1)
+
+
+def _relative(n: int, final: str) -> str:
+    # Cursor up (A), down (B), forward (C) or back (D) by n cells, the count 1 being implied.
+    return "\x1b[" + final if n == 1 else "\x1b[{}{}".format(n, final)
+
+
+def _cost(sequence: str) -> int:
+    # The number of bytes sent to the terminal.
+    return len(sequence) if sequence.isascii() else len(sequence.encode("utf-8"))
+
+
+class Encoder(object):
+    """Converts runs of changed cells to the fewest bytes of output. It keeps track of the cursor and of the current
+        style, and reaches each run with the cheapest of: an absolute move, a relative move, a carriage return and
+        line feeds, or writing again the unchanged cells in between when the screen is known. The style is only
+        changed when it differs from the one of the previous run.
+
+        Attributes:
+            width (int): The number of columns of the terminal. Writing up to the last column leaves the cursor in a
+                         position that depends on the terminal: it is then forgotten.
+            y (int): The row of the cursor, None when unknown.
+            x (int): The column of the cursor, None when unknown.
+            attr (int): The current style, None when unknown.
+
+        Note:
+            The moves are ECMA-48 (ANSI) sequences. The line feeds are preceded by a carriage return, so that they go
+            to the first column whether the terminal translates them to CR LF or not.
+    """
+    def __init__(self, width: int, style: Callable[[int], str] = sgr, reset: str = RESET):
+        self.width: int = width
+        self._style: Callable[[int], str] = style
+        self._reset: str = reset
+        self._styles: Dict[int, str] = {}
+        self.y: Union[None, int] = None
+        self.x: Union[None, int] = None
+        self.attr: Union[None, int] = None
+
+    def invalidate(self) -> None:
+        """Forgets the cursor position and the style, e.g. after the screen has been cleared by other means."""
+        self.y = self.x = self.attr = None
+
+    def style(self, attr: int) -> str:
+        """The sequence selecting a style, whatever the current one."""
+        sequence = self._styles.get(attr)
+        if sequence is None:
+            sequence = self._styles[attr] = self._style(attr)
+        return sequence
+
+    def _horizontal(self, y: int, x: int, to_x: int, attrs: Tuple, screen: Union[None, CellBuffer],
+                    budget: int) -> Tuple[str, Union[None, int]]:
+        # The cheapest move along row y, from x to to_x. Returns the sequence and, when it writes cells again, their
+        # style.
+        if to_x == x:
+            return "", None
+        if to_x < x:
+            n = x - to_x
+            back = "\b" * n if n <= 3 else _relative(n, "D")
+            if to_x < len(back) - 1:
+                home, attr = self._horizontal(y, 0, to_x, attrs, screen, len(back) - 1)
+                if len(home) + 1 < len(back):
+                    return "\r" + home, attr
+            return back, None
+
+        best: Tuple[str, Union[None, int]] = (_relative(to_x - x, "C"), None)
+        cost = len(best[0])
+        if screen is not None and to_x - x < min(cost, budget):
+            # The cells in between are written again, in the current style or in the style of the next run.
+            for attr in attrs:
+                if attr is None:
+                    continue
+                text = screen.span_text(y, x, to_x, attr)
+                if text is not None and _cost(text) < cost:
+                    best, cost = (text, attr), _cost(text)
+                    break
+        return best
+
+    def _move(self, y: int, x: int, attr: int, screen: Union[None, CellBuffer]) -> Tuple[str, Union[None, int]]:
+        absolute = cup(y, x)
+        if self.y is None:
+            return absolute, None
+        attrs = (self.attr, attr)
+        candidates: List[Tuple[str, Union[None, int]]] = [(absolute, None)]
+        budget = len(absolute)
+        if y == self.y:
+            candidates.append(self._horizontal(y, self.x, x, attrs, screen, budget))
+        elif y > self.y:
+            n = y - self.y
+            if n < budget:
+                sequence, rewritten = self._horizontal(y, 0, x, attrs, screen, budget - n - 1)
+                candidates.append(("\r" + "\n" * n + sequence, rewritten))
+            sequence, rewritten = self._horizontal(y, self.x, x, attrs, screen, budget)
+            candidates.append((_relative(n, "B") + sequence, rewritten))
+        else:
+            sequence, rewritten = self._horizontal(y, self.x, x, attrs, screen, budget)
+            candidates.append((_relative(self.y - y, "A") + sequence, rewritten))
+        return min(candidates, key=lambda candidate: _cost(candidate[0]))
+
+    def encode(self, runs: List[Run], screen: CellBuffer = None) -> str:
+        """Converts runs of cells, sorted by position, to the output drawing them.
+
+        Parameters:
+            runs (List[Run]): The (y, x, text, attr) runs, e.g. returned by CellBuffer.update_view().
+            screen (CellBuffer): (Optional) The screen as it will be once the runs are drawn. It allows to write
+                                 again unchanged cells instead of moving over them.
+
+        Returns:
+            The escape sequences and the text.
+        """
+        out: List[str] = []
+        for y, x, text, attr in runs:
+            if not text:
+                continue
+            move, rewritten = self._move(y, x, attr, screen)
+            if rewritten is not None and rewritten != self.attr:
+                # The cells written again have the style of the run: it is selected first.
+                out.append(self.style(attr))
+                self.attr = attr
+            out.append(move)
+            if attr != self.attr:
+                out.append(self.style(attr))
+                self.attr = attr
+            out.append(text)
+
+            self.y, self.x = y, x + width(text)
+            if self.x >= self.width:
+                self.y = self.x = None
+        return "".join(out)
+
+    def end(self) -> str:
+        """The sequence restoring the default style at the end of a frame, empty if it is already in use."""
+        if self.attr == 0:
+            return ""
+        self.attr = 0
+        return self._reset
+
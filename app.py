@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from typing import Dict, List, Tuple
+
+import importlib
+import importlib.util
+import os
+import sys
+
+from _window_manager import WindowManager
+
+
+# The backends known by the registry: name -> (module, class, top-level modules it requires).
+# Nothing is imported before a backend is chosen, so that an application only pays for the one it uses.
+_BACKENDS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "curses": ("curses_app", "CursesApp", ("_curses",)),
+    "blessed": ("blessed_app", "BlessedApp", ("blessed",)),
+    "headless": ("headless_app", "HeadlessApp", ()),
+}
+
+# Order in which detect_backend() tries the backends. curses comes first as it is part of the standard library and
+# is the fastest to start, blessed is the fallback where curses is missing (e.g. Windows).
+_PREFERENCE: List[str] = ["curses", "blessed"]
+
+# Environment variable overriding the detected backend.
+BACKEND_VARIABLE = "TERMINAL_GUI_BACKEND"
+
+
+def register_backend(name: str, module: str, class_name: str, requires: Tuple[str, ...] = ()) -> None:
+    """Adds a backend to the registry. The module is only imported when the backend is chosen.
+
+    Parameters:
+        name (str): The name used to choose the backend.
+        module (str): The module defining the application class.
+        class_name (str): The application class, a subclass of WindowManager implementing run().
+        requires (Tuple[str, ...]): The modules needed by the backend, checked without importing them.
+    """
+    _BACKENDS[name] = (module, class_name, tuple(requires))
+
+
+def is_available(name: str) -> bool:
+    """Tells whether the modules required by a backend are installed, without importing them."""
+    if name not in _BACKENDS:
+        return False
+    return all(importlib.util.find_spec(required) is not None for required in _BACKENDS[name][2])
+
+
+def available_backends() -> List[str]:
+    return [name for name in _BACKENDS if is_available(name)]
+
+
+def detect_backend() -> str:
+    """Chooses the backend to use: the one named by the TERMINAL_GUI_BACKEND environment variable, otherwise the
+        first terminal backend available, or the headless one when there is no terminal.
+    """
+    name = os.environ.get(BACKEND_VARIABLE)
+    if name:
+        return name
+    if not (sys.stdin.isatty() and sys.stdout.isatty()):
+        return "headless"
+    for name in _PREFERENCE:
+        if is_available(name):
+            return name
+    return "headless"
+
+
+def load_backend(name: str = None) -> type:
+    """Imports a backend and returns its application class.
+
+    Parameters:
+        name (str): (Optional) The name of the backend, detected by default.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If the modules it requires are not installed.
+    """
+    if name is None:
+        name = detect_backend()
+    if name not in _BACKENDS:
+        raise ValueError("Unknown backend '{}', expected one of {}".format(name, ", ".join(_BACKENDS)))
+    module, class_name, _ = _BACKENDS[name]
+    return getattr(importlib.import_module(module), class_name)
+
+
+class App(WindowManager):
+    """Base class of the applications whose backend is chosen at instantiation instead of by inheritance.
+        Subclasses implement design() and main() as for CursesApp or BlessedApp, and are instantiated with
+        MyApp(backend="curses"), or MyApp() to detect the best backend available.
+
+        Attributes:
+            backend (str): The name of the backend in use.
+
+        Note:
+            The keys returned by get_input() are the ones of the backend: integers for curses and headless,
+            blessed.keyboard.Keystroke strings for blessed.
+    """
+    # The classes combining an application class with a backend class, built once.
+    _combined: Dict[Tuple[type, type], type] = {}
+
+    def __new__(cls, *args, backend: str = None, **kwargs):
+        if backend is None:
+            backend = detect_backend()
+        backend_class = load_backend(backend)
+        combined = App._combined.get((cls, backend_class))
+        if combined is None:
+            # The application methods come first, the backend provides the window and run().
+            combined = type(cls.__name__, (cls, backend_class), {"__module__": cls.__module__, "backend": backend})
+            App._combined[(cls, backend_class)] = combined
+        return super().__new__(combined)
+
+    def __init__(self, *args, backend: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
@@ -0,0 +1,969 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark suite for layout, rendering, focus traversal and input handling.
+
+A synthetic UI made of nested Panels, Checkboxes and RadioButtons is built on the headless backend, then every
+registered benchmark is timed. Results are printed as a table and can be written as JSON. When a baseline is given,
+any benchmark whose fastest sample is slower than the baseline by more than the tolerance makes the script exit with
+status 1. A benchmark found slower is run again before being reported, its fastest sample over all the runs being
+compared, and the benchmarks taking less than a millisecond are allowed a wider tolerance, as a few microseconds of
+noise are a large fraction of their time.
+
+Usage:
+    python benchmark.py                                  # run everything, compare with benchmark_baseline.json
+    python benchmark.py --depth 4 --breadth 3 -o out.json
+    python benchmark.py --save-baseline benchmark_baseline.json
+"""
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple, Union
+
+import argparse
+import gc
+import importlib.util
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from constraints import position_constraint, size_constraint
+from panels import Panel
+from checkbox import Checkbox
+from radiobutton import RadioButton
+from cell_buffer import CellBuffer
+from gui_elements import GuiElement, TextStyles
+from headless_app import HeadlessApp, KEY_RESIZE
+from offscreen import OffscreenElement
+from text_input import KEY_BACKSPACE, KEY_ENTER, KEY_UP, TextEditor, TextInput
+from text_width import truncate, width
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# The benchmarks whose baseline is faster than this, in microseconds, are compared with the micro tolerance.
+MICRO_BENCHMARK_US = 1000
+
+KEY_NEXT = ord("\t")
+KEY_INTERACT = ord(" ")
+
+# Registry of the benchmarks: each one receives the parsed configuration and returns the timings of its samples
+# in seconds, optionally followed by a dictionary of other metrics. A benchmark that cannot run in the current
+# environment (e.g. a missing backend) returns no samples and is left out of the results.
+_BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Union[List[float], Tuple[List[float], Dict]]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    """Decorator registering a benchmark under the given name."""
+    def register(function: Callable[[argparse.Namespace], List[float]]):
+        _BENCHMARKS[name] = function
+        return function
+    return register
+
+
+class SyntheticApp(HeadlessApp):
+    """A headless application whose design is a generated tree of panels.
+        Every panel holds `breadth` sub-panels side by side in its upper half (down to `depth` levels) and `leaves`
+        checkboxes and radio buttons stacked in its lower half.
+    """
+    def __init__(self, depth: int = 3, breadth: int = 2, leaves: int = 4, h: int = 200, w: int = 300):
+        super().__init__(h, w)
+        self.depth = depth
+        self.breadth = breadth
+        self.leaves = leaves
+        self.elements: List[GuiElement] = []
+
+    def design(self):
+        root = Panel(position_constraint("absolute", 0), position_constraint("absolute", 0),
+                     size_constraint("relative", 1), size_constraint("relative", 1), "p", title="p")
+        self.elements.append(root)
+        self.add_element(root)
+        self._populate(root, self.depth)
+
+    def _populate(self, panel: Panel, depth: int) -> None:
+        name = panel.node.name
+        if depth > 0:
+            for i in range(self.breadth):
+                sub = Panel(position_constraint("absolute", 0), position_constraint("relative", i / self.breadth),
+                            size_constraint("relative", .5), size_constraint("relative", 1 / self.breadth),
+                            "{}.{}".format(name, i), title="{}.{}".format(name, i))
+                self.elements.append(sub)
+                panel.add_child(sub)
+                self._populate(sub, depth - 1)
+            top, span = .5, .5
+        else:
+            top, span = 0, 1
+
+        for j in range(self.leaves):
+            y = position_constraint("relative", top + span * j / self.leaves)
+            leaf_id = "{}/{}".format(name, j)
+            if j % 2:
+                leaf = RadioButton(y, position_constraint("absolute", 0), leaf_id, "Radio " + leaf_id)
+            else:
+                leaf = Checkbox(y, position_constraint("absolute", 0), leaf_id, "Check " + leaf_id)
+            self.elements.append(leaf)
+            panel.add_child(leaf)
+
+    def main(self):
+        pass
+
+    def build(self) -> SyntheticApp:
+        self.design()
+        return self
+
+
+def _app(config: argparse.Namespace) -> SyntheticApp:
+    return SyntheticApp(config.depth, config.breadth, config.leaves, config.height, config.width).build()
+
+
+def _ready_app(config: argparse.Namespace) -> SyntheticApp:
+    app = _app(config)
+    app.render()
+    app.reset_active()
+    return app
+
+
+def _time(function: Callable[[], None], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark("render_cold")
+def bench_render_cold(config: argparse.Namespace) -> List[float]:
+    """First render of a freshly built tree."""
+    samples = []
+    for _ in range(config.repeat):
+        app = _app(config)
+        start = time.perf_counter()
+        app.render()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark("render_warm")
+def bench_render_warm(config: argparse.Namespace) -> List[float]:
+    """Render of a tree that has already been rendered once."""
+    app = _ready_app(config)
+    return _time(app.render, config.repeat)
+
+
+@benchmark("geometry")
+def bench_geometry(config: argparse.Namespace) -> List[float]:
+    """Evaluation of x, y, w and h for every element of the tree."""
+    app = _ready_app(config)
+
+    def geometry():
+        for element in app.elements:
+            element.x, element.y, element.w, element.h
+
+    return _time(geometry, config.repeat)
+
+
+@benchmark("widget_memory")
+def bench_widget_memory(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Building SyntheticApp with 4 levels of 4 panels holding 8 leaves (about 2700 elements). The memory allocated
+        per element, its node and constraints included, is reported with tracemalloc, outside of the timed runs."""
+    import tracemalloc
+
+    repeat = min(config.repeat, 20)
+    samples = _time(lambda: SyntheticApp(4, 4, 8).design(), repeat)
+
+    gc.collect()
+    tracemalloc.start()
+    app = SyntheticApp(4, 4, 8)
+    before = tracemalloc.get_traced_memory()[0]
+    app.design()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return samples, {"bytes_per_widget": allocated / len(app.elements), "widgets": len(app.elements)}
+
+
+@benchmark("focus_cycle")
+def bench_focus_cycle(config: argparse.Namespace) -> List[float]:
+    """ElementTreeManager.activate_next across a full cycle of the leaves."""
+    app = _ready_app(config)
+    manager = app._element_tree_manager
+    n_leaves = len(manager.tree.leaves)
+
+    def cycle():
+        for _ in range(n_leaves):
+            manager.activate_next()
+
+    return _time(cycle, config.repeat)
+
+
+@benchmark("get_node")
+def bench_get_node(config: argparse.Namespace) -> List[float]:
+    """Tree.get_node lookup of every element by name."""
+    app = _ready_app(config)
+    tree = app._element_tree_manager.tree
+    names = [element.node.name for element in app.elements]
+
+    def lookup():
+        for name in names:
+            tree.get_node(name)
+
+    return _time(lookup, config.repeat)
+
+
+@benchmark("radio_select")
+def bench_radio_select(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """A click on a radio button of a panel holding 400 of them, alternating between the first and the last one.
+        Their RadioGroup redraws only the two buttons whose state changed. The time to redraw the whole panel, as each
+        click used to, is reported too."""
+    app = SyntheticApp(0, 0, 0, 204, config.width).build()
+    panel = app.elements[0]
+    buttons = []
+    for n in range(400):
+        button = RadioButton(position_constraint("absolute", n % 200), position_constraint("relative", n // 200 / 2),
+                             "r{}".format(n), "Option {}".format(n))
+        panel.add_child(button)
+        buttons.append(button)
+    app.render()
+
+    clicks = itertools.cycle((buttons[0], buttons[-1]))
+    samples = _time(lambda: next(clicks).interact(), config.repeat)
+    return samples, {"panel_render": statistics.median(_time(panel.render, config.repeat)) * 1e6}
+
+
+@benchmark("checkbox_bulk")
+def bench_checkbox_bulk(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """CheckboxGroup.invert() on a group of 50000 checkboxes, 198 of them being shown by a panel and redrawn. The
+        times to check the members whose label matches a condition and to list the checked ids are reported too."""
+    from checkbox import CheckboxGroup
+
+    app = SyntheticApp(0, 0, 0, 200, config.width).build()
+    panel = app.elements[0]
+    group = CheckboxGroup()
+    for n in range(50000):
+        box = Checkbox(position_constraint("absolute", n % 198), position_constraint("absolute", 0), "c{}".format(n),
+                       "Item {}".format(n), group)
+        if n < 198:
+            panel.add_child(box)
+    app.render()
+
+    repeat = min(config.repeat, 20)
+    samples = _time(group.invert, config.repeat)
+    select = _time(lambda: group.select_where(lambda box: "7" in box.text), repeat)
+    ids = _time(group.selected_ids, repeat)
+    return samples, {"select_where": statistics.median(select) * 1e6, "selected_ids": statistics.median(ids) * 1e6}
+
+
+@benchmark("hide_subtree")
+def bench_hide_subtree(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Hiding then showing a panel holding a quarter of the elements of SyntheticApp with 4 levels of 4 panels (about
+        770 elements). The times of a full render with 3 of the 4 top panels hidden and with all of them shown are
+        reported too."""
+    app = SyntheticApp(4, 4, 8).build()
+    app.render()
+    app.reset_active()
+    panels = app.elements[0].children[:4]
+
+    def toggle() -> None:
+        panels[0].hide()
+        panels[0].show()
+
+    samples = _time(toggle, config.repeat)
+    repeat = min(config.repeat, 20)
+    shown = _time(app.render, repeat)
+    for panel in panels[1:]:
+        panel.hide()
+    hidden = _time(app.render, repeat)
+    return samples, {"render_hidden": statistics.median(hidden) * 1e6, "render_shown": statistics.median(shown) * 1e6}
+
+
+@benchmark("tab_switch")
+def bench_tab_switch(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Switching between two tabs each holding the design of SyntheticApp with 3 levels of 4 panels (about 200
+        elements). The times of a full render and of closing a popup covering a quarter of the screen are reported
+        too."""
+    app = SyntheticApp(3, 4, 8).build()
+    app.add_tab("second")
+    app.design()
+    app.render()
+    app.reset_active()
+
+    samples = _time(app.next_tab, config.repeat)
+    repeat = min(config.repeat, 20)
+    render = _time(app.render, repeat)
+
+    popup = Panel(position_constraint("relative", .25), position_constraint("relative", .25),
+                  size_constraint("relative", .5), size_constraint("relative", .5), "popup", title="popup")
+    close = []
+    for n in range(repeat):
+        app.open_popup("popup", popup)
+        start = time.perf_counter()
+        app.close_popup()
+        close.append(time.perf_counter() - start)
+    return samples, {"render": statistics.median(render) * 1e6, "popup_close": statistics.median(close) * 1e6}
+
+
+@benchmark("resize")
+def bench_resize(config: argparse.Namespace) -> List[float]:
+    """Relayout and full redraw after the terminal size changed."""
+    app = _ready_app(config)
+    app.resize_delay = 0
+    sizes = [(config.height - 10, config.width - 20), (config.height, config.width)]
+    samples = []
+    for n in range(config.repeat):
+        app.window.resize(*sizes[n % 2])
+        start = time.perf_counter()
+        if app.get_input() == KEY_RESIZE:
+            app.render()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark("resize_burst")
+def bench_resize_burst(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Time to handle a burst of 30 resizes, as fired while a window edge is dragged, with a debounce delay of
+        10ms. The number of full frames drawn per burst is reported too."""
+    app = _ready_app(config)
+    app.resize_delay = 0.01
+    stats = app.enable_stats()
+    samples = []
+    for n in range(config.repeat):
+        stats.reset()
+        for step in range(30):
+            app.window.resize(config.height - step, config.width - step)
+        start = time.perf_counter()
+        app.get_input()
+        samples.append(time.perf_counter() - start - app.resize_delay)
+    frames = stats.counters["frames"]
+    app.disable_stats()
+    return samples, {"frames": frames}
+
+
+@benchmark("keystroke")
+def bench_keystroke(config: argparse.Namespace) -> List[float]:
+    """Latency from a key being available to the frame being drawn, alternating focus changes and interactions."""
+    app = _ready_app(config)
+    samples = []
+    for n in range(config.repeat * 10):
+        app.window.feed(KEY_INTERACT if n % 2 else KEY_NEXT)
+        start = time.perf_counter()
+        k = app.get_input()
+        if k == KEY_NEXT:
+            app.get_next()
+        elif k == KEY_INTERACT and app.get_active() is not None:
+            app.get_active().interact()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark("paste")
+def bench_paste(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Time to handle a burst of 100 pending keys (runs of 9 focus changes and an interaction) drained by
+        get_inputs() and dispatched in a batch, repeated focus changes being collapsed. The time of the same burst
+        handled one key at a time is reported too."""
+    app = _ready_app(config)
+    burst = [KEY_INTERACT if n % 10 == 9 else KEY_NEXT for n in range(100)]
+
+    def dispatch(k: int, count: int = 1) -> None:
+        if k == KEY_NEXT:
+            app.get_next(count)
+        elif k == KEY_INTERACT and app.get_active() is not None:
+            app.get_active().interact()
+
+    samples, unbatched = [], []
+    for n in range(config.repeat):
+        app.window.feed(*burst)
+        start = time.perf_counter()
+        for k in iter(lambda: app.get_input(0), None):
+            dispatch(k)
+        unbatched.append(time.perf_counter() - start)
+
+        app.window.feed(*burst)
+        start = time.perf_counter()
+        with app.batch():
+            for k, count in app.get_inputs(0, collapse=(KEY_NEXT,)):
+                dispatch(k, count)
+        samples.append(time.perf_counter() - start)
+    return samples, {"unbatched": statistics.median(unbatched) * 1e6}
+
+
+class _TimedKey(int):
+    """A key code remembering when it was queued."""
+    def __new__(cls, code: int):
+        key = super().__new__(cls, code)
+        key.queued = time.perf_counter()
+        return key
+
+
+@benchmark("posted_updates")
+def bench_posted_updates(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Key latency while 4 worker threads post 100k checkbox updates per second, for one second, through
+        WindowManager.post(). The rate of applied updates is reported too."""
+    app = _ready_app(config)
+    checkboxes = [element for element in app.elements if isinstance(element, Checkbox)]
+    n_workers, n_updates = 4, 100000
+    done = threading.Event()
+
+    def worker(index: int) -> None:
+        # Batches of 25 updates every millisecond per worker.
+        begin = time.perf_counter()
+        for batch, first in enumerate(range(index, n_updates, n_workers * 25)):
+            for n in range(first, min(first + n_workers * 25, n_updates), n_workers):
+                box = checkboxes[n % len(checkboxes)]
+                app.post(lambda box=box, n=n: setattr(box, "toggle", bool(n & 1)), box)
+            time.sleep(max(0., begin + (batch + 1) * 0.001 - time.perf_counter()))
+
+    def typist() -> None:
+        while not done.is_set():
+            app.window.feed(_TimedKey(KEY_NEXT))
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_workers)]
+    keys = threading.Thread(target=typist)
+    samples: List[float] = []
+    start = time.perf_counter()
+    keys.start()
+    for thread in threads:
+        thread.start()
+
+    # Counts the updates left, as the UI thread applies them inside get_input().
+    while any(thread.is_alive() for thread in threads) or app._updates:
+        k = app.get_input(0.01)
+        if k == KEY_NEXT:
+            samples.append(time.perf_counter() - k.queued)
+            app.get_next()
+    elapsed = time.perf_counter() - start
+    done.set()
+    keys.join()
+    return samples, {"updates_per_second": n_updates / elapsed}
+
+
+class _CountingStream(io.TextIOBase):
+    """A text stream discarding its content, counting the write and flush calls and the bytes written."""
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.flushes = 0
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        self.bytes += len(text.encode("utf-8"))
+        return len(text)
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+
+def _blessed_app(config: argparse.Namespace) -> Union[None, Tuple[SyntheticApp, _CountingStream]]:
+    """Builds a one level synthetic UI drawn by the blessed backend on a 25x80 xterm writing to a counting stream.
+        Returns None when blessed is not installed.
+    """
+    if importlib.util.find_spec("blessed") is None:
+        return None
+    from blessed import Terminal
+    from blessed_app import _BlessedWindow
+
+    stream = _CountingStream()
+    app = SyntheticApp(1, config.breadth, config.leaves)
+    app.window = _BlessedWindow(Terminal(kind="xterm-256color", stream=stream, force_styling=True))
+    app.build()
+    app.render()
+    app.reset_active()
+    return app, stream
+
+
+@benchmark("blessed_frame")
+def bench_blessed_frame(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Full frame drawn by the blessed backend after a checkbox was toggled, reporting the writes and bytes sent to
+        the terminal per frame."""
+    built = _blessed_app(config)
+    if built is None:
+        return [], {}
+    app, stream = built
+    checkbox = next(element for element in app.elements if isinstance(element, Checkbox))
+    stream.writes = stream.flushes = stream.bytes = 0
+
+    def frame():
+        checkbox.toggle = not checkbox.toggle
+        app.render()
+
+    samples = _time(frame, config.repeat)
+    return samples, {"writes_per_frame": stream.writes / config.repeat,
+                     "flushes_per_frame": stream.flushes / config.repeat,
+                     "bytes_per_frame": stream.bytes / config.repeat}
+
+
+@benchmark("styled_draw")
+def bench_styled_draw(config: argparse.Namespace) -> List[float]:
+    """1000 draw calls of the blessed backend cycling through every combination of TextStyles flags."""
+    built = _blessed_app(config)
+    if built is None:
+        return []
+    window = built[0].window
+
+    def draw():
+        for attr in range(1000):
+            window.draw(attr % 25, 0, "styled text", attr)
+        window.flush()
+
+    return _time(draw, config.repeat)
+
+
+def _dashboard(buffer: CellBuffer, frame: int) -> None:
+    """Draws frame number `frame` of a 24x80 monitoring dashboard: a title bar, a clock, 12 counters changing at
+        different rates, a progress bar and a status."""
+    buffer.clear()
+    buffer.draw(0, 0, " Cluster monitor".ljust(80), TextStyles.HIGHLIGHTED)
+    buffer.draw(0, 70, "{:02}:{:02}:{:02}".format(frame // 3600 % 24, frame // 60 % 60, frame % 60),
+                TextStyles.HIGHLIGHTED)
+    for n in range(12):
+        value = frame * (n + 1) * 7 // (1 + n % 4) % 100000
+        buffer.draw(2 + n, 2, "node-{:02} requests/s".format(n))
+        buffer.draw(2 + n, 24, "{:>8}".format(value), TextStyles.BOLD)
+        buffer.draw(2 + n, 34, "errors {:>3}".format(frame // (5 + n) % 7), TextStyles.RED if n % 5 == 0 else 0)
+    done = frame % 101
+    buffer.draw(16, 2, "[" + "#" * (done // 2) + "." * (50 - done // 2) + "] {:3}%".format(done), TextStyles.GREEN)
+    warning = frame // 10 % 2
+    buffer.draw(18, 2, "status: " + ("WARN" if warning else "OK  "), TextStyles.YELLOW if warning else TextStyles.GREEN)
+
+
+@benchmark("dashboard_bytes")
+def bench_dashboard_bytes(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Encoding of the changed cells of a dashboard updated once per second by ansi.Encoder. The bytes per frame are
+        compared to an absolute move and a style per changed run, and converted to the frames per second a 9600 baud
+        link (960 bytes/s) can carry."""
+    from ansi import Encoder, sgr
+
+    screen, shown = CellBuffer(24, 80), CellBuffer(24, 80)
+    encoder = Encoder(80)
+    frames = []
+    # The first frames draw the whole dashboard, the measured ones are updates.
+    for frame in range(config.repeat + 2):
+        _dashboard(screen, frame)
+        touched, screen.touched = screen.touched, set()
+        frames.append(screen.update_view(shown, rows=touched))
+        encoder.encode(frames[-1], screen)
+    frames = frames[2:]
+
+    samples, encoded, absolute = [], 0, 0
+    styles: Dict[int, str] = {}
+    for frame, runs in enumerate(frames, 2):
+        # The screen as it is once the frame is drawn, as the encoder may write again unchanged cells.
+        _dashboard(screen, frame)
+        start = time.perf_counter()
+        output = encoder.encode(runs, screen) + encoder.end()
+        samples.append(time.perf_counter() - start)
+        encoded += len(output.encode("utf-8"))
+        for y, x, text, attr in runs:
+            style = styles.get(attr) or styles.setdefault(attr, sgr(attr))
+            absolute += len("\x1b[{};{}H{}{}".format(y + 1, x + 1, style, text).encode("utf-8"))
+        absolute += len("\x1b[0m")
+
+    n = len(frames)
+    return samples, {"bytes_per_frame": encoded / n, "absolute_bytes_per_frame": absolute / n,
+                     "frames_per_second_9600": 960 / (encoded / n)}
+
+
+@benchmark("text_width")
+def bench_text_width(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """1000 truncations of repeated labels mixing CJK, emoji and combining characters to 12 cells. The time taken by
+        as many ASCII labels is reported too."""
+    wide = ["名前 {}".format(n % 50) for n in range(500)] + ["✔ cafe\u0301 {}".format(n % 50) for n in range(500)]
+    ascii_labels = ["Label {}".format(n % 100) for n in range(1000)]
+
+    def measure(labels: List[str]) -> None:
+        for label in labels:
+            truncate(label, 12)
+            width(label)
+
+    return _time(lambda: measure(wide), config.repeat), \
+        {"ascii": statistics.median(_time(lambda: measure(ascii_labels), config.repeat)) * 1e6}
+
+
+@benchmark("startup")
+def bench_startup(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Time for a new interpreter to import the framework and resolve the curses backend through the lazy registry.
+        The time of the former entry points, importing both backends, is reported too."""
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def start(code: str) -> Callable[[], None]:
+        command = [sys.executable, "-W", "ignore", "-c", code]
+        return lambda: subprocess.run(command, cwd=here, check=True)
+
+    lazy = start("from app import load_backend; load_backend('curses')")
+    eager = start("import curses_app, blessed_app" if importlib.util.find_spec("blessed") else "import curses_app")
+    repeat = min(config.repeat, 10)
+    return _time(lazy, repeat), {"eager": statistics.median(_time(eager, repeat)) * 1e6}
+
+
+def _layout_description(name: str, depth: int, breadth: int, leaves: int) -> Dict:
+    """The description of the panel tree of SyntheticApp, in the layout file format."""
+    children = [_layout_description("{}.{}".format(name, i), depth - 1, breadth, leaves) for i in range(breadth)] \
+        if depth > 0 else []
+    for i, child in enumerate(children):
+        child.update(y=["absolute", 0], x=["relative", i / breadth], h=["relative", .5], w=["relative", 1 / breadth])
+    top, span = (.5, .5) if depth > 0 else (0, 1)
+    for j in range(leaves):
+        leaf_id = "{}/{}".format(name, j)
+        kind = "radiobutton" if j % 2 else "checkbox"
+        children.append({"type": kind, "id": leaf_id, "text": "{} {}".format(kind.capitalize(), leaf_id),
+                         "y": ["relative", top + span * j / leaves], "x": ["absolute", 0]})
+    return {"type": "panel", "id": name, "title": name, "children": children}
+
+
+def _toml_tables(description: Dict, table: str, lines: List[str]) -> None:
+    # JSON scalars and arrays of scalars are valid TOML values.
+    lines.append("[[{}]]".format(table))
+    lines.extend("{} = {}".format(key, json.dumps(value)) for key, value in description.items() if key != "children")
+    for child in description.get("children", []):
+        _toml_tables(child, table + ".children", lines)
+
+
+@benchmark("layout_load")
+def bench_layout_load(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Loading a TOML layout file of about 2700 elements (SyntheticApp with 4 levels of 4 panels holding 8 leaves)
+        from its cache. The times to parse and build it without the cache, from TOML and from JSON, and to build it
+        imperatively are reported too."""
+    import layout
+    root = _layout_description("p", 4, 4, 8)
+    root.update(y=["absolute", 0], x=["absolute", 0], h=["relative", 1], w=["relative", 1])
+    repeat = min(config.repeat, 20)
+
+    with tempfile.TemporaryDirectory() as directory:
+        toml_path = os.path.join(directory, "layout.toml")
+        lines: List[str] = []
+        _toml_tables(root, "elements", lines)
+        with open(toml_path, "w") as f:
+            f.write("\n".join(lines))
+        json_path = os.path.join(directory, "layout.json")
+        with open(json_path, "w") as f:
+            json.dump({"elements": [root]}, f)
+
+        layout.load(toml_path)
+        samples = _time(lambda: layout.load(toml_path), repeat)
+        toml = _time(lambda: layout.load(toml_path, use_cache=False), repeat)
+        json_ = _time(lambda: layout.load(json_path, use_cache=False), repeat)
+    imperative = _time(lambda: SyntheticApp(4, 4, 8).design(), repeat)
+    return samples, {"uncached_toml": statistics.median(toml) * 1e6, "uncached_json": statistics.median(json_) * 1e6,
+                     "imperative": statistics.median(imperative) * 1e6}
+
+
+class _PlotElement(OffscreenElement):
+    """An off-screen element plotting a sum of sines, computed cell by cell in pure Python."""
+    __slots__ = ("_snapshot",)
+
+    def __init__(self, y: float, x: float, element_id: str, phase: float):
+        super().__init__(position_constraint("relative", y), position_constraint("relative", x),
+                         size_constraint("relative", .5), size_constraint("relative", .25), element_id)
+        self._snapshot = (phase, 24)
+
+    def snapshot(self) -> Tuple[float, int]:
+        return self._snapshot
+
+    @staticmethod
+    def paint(snapshot: Tuple[float, int], buffer: CellBuffer) -> None:
+        import math
+        phase, harmonics = snapshot
+        h, w = buffer.get_max_yx()
+        for x in range(w):
+            value = sum(math.sin((x / w * 6.28 + phase) * k) / k for k in range(1, harmonics + 1))
+            top = int((1 - (value + 2) / 4) * (h - 1))
+            for y in range(max(min(top, h - 1), 0), h):
+                buffer.draw(y, x, "#" if y == top else ":", TextStyles.CYAN if y == top else 0)
+
+
+@benchmark("offscreen_render")
+def bench_offscreen_render(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Full render of a dashboard of 8 charts computed in pure Python, painted by a pool of one process per CPU.
+        The time of the same render painting the charts in the main thread is reported too."""
+    app = SyntheticApp()
+    for n in range(8):
+        app.add_element(_PlotElement(n // 4 * .5, n % 4 * .25, "plot{}".format(n), n * .4))
+    repeat = min(config.repeat, 10)
+    serial = _time(app.render, repeat)
+
+    renderer = app.enable_offscreen()
+    app.render()
+    try:
+        samples = _time(app.render, repeat)
+    finally:
+        app.disable_offscreen()
+    return samples, {"serial": statistics.median(serial) * 1e6, "workers": renderer.workers}
+
+
+@benchmark("chart_append")
+def bench_chart_append(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Appending 100 values to a series of a million values, then rendering it as a 60x20 Braille line chart. The
+        times of the append followed by the decimation alone, and of a min/max decimation of the whole history, which
+        the block summaries avoid, are reported too."""
+    try:
+        import numpy as np
+        from charts import LineChart, Series
+    except ImportError:
+        return []
+    app = SyntheticApp(h=20, w=60)
+    series = Series.from_array(np.sin(np.linspace(0, 200, 1000000)))
+    chart = LineChart(position_constraint("absolute", 0), position_constraint("absolute", 0),
+                      size_constraint("relative", 1), size_constraint("relative", 1), "chart", series, braille=True)
+    app.add_element(chart)
+    app.render()
+    values = np.linspace(-1, 1, 100)
+
+    def append() -> None:
+        series.append(values)
+        chart.render()
+
+    def decimate() -> None:
+        series.append(values)
+        series.decimate(120)
+
+    samples = _time(append, config.repeat)
+    repeat = min(config.repeat, 20)
+    incremental = _time(decimate, repeat)
+    history = series.values()
+    edges = np.arange(120) * len(history) // 120
+    full = _time(lambda: (np.fmin.reduceat(history, edges), np.fmax.reduceat(history, edges)), repeat)
+    return samples, {"append_decimation": statistics.median(incremental) * 1e6,
+                     "full_decimation": statistics.median(full) * 1e6}
+
+
+@benchmark("text_edit")
+def bench_text_edit(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """Typing a character in the middle of a 4 MB text (300000 lines) shown by a 40x120 editor, then erasing it, each
+        key being drawn. The times of a line break, which moves the lines below it, and of a character typed into a
+        single line input holding 100000 characters are reported too."""
+    app = SyntheticApp(h=40, w=120)
+    editor = TextEditor(position_constraint("absolute", 0), position_constraint("absolute", 0),
+                        size_constraint("absolute", 39), size_constraint("relative", 1), "editor",
+                        "line of text\n" * 300000)
+    text_input = TextInput(position_constraint("absolute", 39), position_constraint("absolute", 0),
+                           size_constraint("relative", 1), "input", "x" * 100000)
+    app.add_element(editor)
+    app.add_element(text_input)
+    app.render()
+    # The cursor goes to the middle of the view, at the middle of the text.
+    editor.cursor = 2000000
+    editor.render()
+    for n in range(20):
+        editor.interact(KEY_UP)
+
+    samples = _time(lambda: (editor.interact("x"), editor.interact(KEY_BACKSPACE)), config.repeat)
+    repeat = min(config.repeat, 20)
+    line_break = _time(lambda: (editor.interact(KEY_ENTER), editor.interact(KEY_BACKSPACE)), repeat)
+    text_input.cursor = 50000
+    typing = _time(lambda: text_input.interact("x"), repeat)
+    return samples, {"line_break": statistics.median(line_break) * 1e6, "input_key": statistics.median(typing) * 1e6}
+
+
+@benchmark("share_frame")
+def bench_share_frame(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """A checkbox toggled and redrawn, then published by a ShareServer to 16 attached clients which acknowledge every
+        frame. The time with a single client and the bytes sent per client and frame are reported too."""
+    from share import ShareServer
+
+    def frames(n_clients: int) -> Tuple[List[float], float]:
+        app = _ready_app(config)
+        server = ShareServer(app, "")
+        app.window.flush_listeners.append(server.publish)
+        streams = [io.BytesIO() for _ in range(n_clients)]
+        clients = [server.attach(stream, 50, 120) for stream in streams]
+        before = streams[0].tell()
+        checkbox = next(element for element in app.elements if isinstance(element, Checkbox))
+
+        def frame():
+            checkbox.interact()
+            app.flush()
+            for client in clients:
+                client.acked = client.sent
+
+        return _time(frame, config.repeat), (streams[0].tell() - before) / config.repeat
+
+    samples, sent = frames(16)
+    single, _ = frames(1)
+    return samples, {"one_client": statistics.median(single) * 1e6, "bytes_per_client": sent}
+
+
+@benchmark("recording")
+def bench_recording(config: argparse.Namespace) -> Tuple[List[float], Dict]:
+    """A checkbox toggled followed by a full render, recorded by a RecordingWindow with a keyframe every 100 frames.
+        The overhead compared to the same frames without recording and the bytes written per frame are reported, as
+        well as the overhead for the blessed backend."""
+    def frames(plain_app: SyntheticApp, recorded_app: SyntheticApp) -> Tuple[List[float], float, float]:
+        # The frames of both applications alternate, so that they are equally affected by the noise of the machine.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.rec")
+            recorded_app.start_recording(path)
+            samples: Dict[SyntheticApp, List[float]] = {plain_app: [], recorded_app: []}
+            for _ in range(config.repeat):
+                for app in samples:
+                    checkbox = next(element for element in app.elements if isinstance(element, Checkbox))
+                    start = time.perf_counter()
+                    checkbox.interact()
+                    app.render()
+                    samples[app].append(time.perf_counter() - start)
+            recorded_app.stop_recording()
+            overhead = (min(samples[recorded_app]) / min(samples[plain_app]) - 1) * 100
+            return samples[recorded_app], overhead, os.path.getsize(path) / config.repeat
+
+    samples, overhead, size = frames(_ready_app(config), _ready_app(config))
+    metrics = {"overhead_percent": overhead, "bytes_per_frame": size}
+    if importlib.util.find_spec("blessed") is not None:
+        _, metrics["blessed_overhead_percent"], _ = frames(_blessed_app(config)[0], _blessed_app(config)[0])
+    return samples, metrics
+
+
+def _summary(samples: List[float], metrics: Dict = None) -> Dict[str, Union[int, float]]:
+    summary = {
+        "unit": "us",
+        "samples": len(samples),
+        "min": min(samples) * 1e6,
+        "median": statistics.median(samples) * 1e6,
+        "mean": statistics.fmean(samples) * 1e6,
+    }
+    summary.update(metrics or {})
+    return summary
+
+
+def run(config: argparse.Namespace, names: List[str] = None) -> Dict:
+    """Runs the selected benchmarks (all of them by default) and returns the machine-readable results."""
+    results = {}
+    for name in names or list(_BENCHMARKS):
+        # The garbage left by the previous benchmark, e.g. thousands of elements, is not collected during this one.
+        gc.collect()
+        outcome = _BENCHMARKS[name](config)
+        samples, metrics = outcome if isinstance(outcome, tuple) else (outcome, None)
+        if samples:
+            results[name] = _summary(samples, metrics)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "depth": config.depth,
+            "breadth": config.breadth,
+            "leaves": config.leaves,
+            "height": config.height,
+            "width": config.width,
+            "repeat": config.repeat,
+        },
+        "results": results,
+    }
+
+
+def _slower(current: Dict, baseline: Dict, tolerance: float, micro_tolerance: float) -> List[str]:
+    # The names of the benchmarks slower than the baseline by more than their tolerance.
+    names = []
+    for name, result in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None or reference["min"] <= 0:
+            continue
+        allowed = tolerance if reference["min"] >= MICRO_BENCHMARK_US else max(tolerance, micro_tolerance)
+        if result["min"] / reference["min"] > 1 + allowed:
+            names.append(name)
+    return names
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, micro_tolerance: float = 0) -> List[str]:
+    """Compares the fastest samples of two result sets. The minimum is the statistic least affected by the noise
+        of the machine.
+
+    Parameters:
+        tolerance (float): The slowdown allowed, a fraction (0.25 = 25%).
+        micro_tolerance (float): (Optional) The slowdown allowed to the benchmarks faster than MICRO_BENCHMARK_US in
+                                 the baseline, if it is larger than tolerance.
+
+    Returns:
+        One message for every benchmark slower than the baseline by more than its tolerance.
+    """
+    regressions = []
+    for name in _slower(current, baseline, tolerance, micro_tolerance):
+        result, reference = current["results"][name], baseline["results"][name]
+        regressions.append("{}: {:.1f}us vs baseline {:.1f}us ({:+.0%})".format(
+            name, result["min"], reference["min"], result["min"] / reference["min"] - 1))
+    return regressions
+
+
+def confirm(config: argparse.Namespace, current: Dict, baseline: Dict) -> None:
+    """Runs again, up to config.reruns times, the benchmarks found slower than the baseline. The fastest sample of
+        all the runs of a benchmark is kept in current: a slowdown caused by the noise of the machine during a single
+        run is not reported, a real one remains."""
+    for _ in range(config.reruns):
+        names = _slower(current, baseline, config.tolerance, config.micro_tolerance)
+        if not names:
+            return
+        for name, result in run(config, names)["results"].items():
+            previous = current["results"][name]
+            previous["samples"] += result["samples"]
+            previous["min"] = min(previous["min"], result["min"])
+
+
+def _print_table(current: Dict, baseline: Union[None, Dict]) -> None:
+    print("{:<20} {:>12} {:>12} {:>12} {:>10}".format("benchmark", "min (us)", "median (us)", "mean (us)", "vs base"))
+    for name, result in current["results"].items():
+        change = ""
+        if baseline and name in baseline.get("results", {}) and baseline["results"][name]["min"] > 0:
+            change = "{:+.0%}".format(result["min"] / baseline["results"][name]["min"] - 1)
+        print("{:<20} {:>12.1f} {:>12.1f} {:>12.1f} {:>10}".format(
+            name, result["min"], result["median"], result["mean"], change))
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=3, help="nesting levels of panels")
+    parser.add_argument("--breadth", type=int, default=2, help="sub-panels per panel")
+    parser.add_argument("--leaves", type=int, default=4, help="checkboxes and radio buttons per panel")
+    parser.add_argument("--height", type=int, default=200, help="rows of the virtual screen")
+    parser.add_argument("--width", type=int, default=300, help="columns of the virtual screen")
+    parser.add_argument("--repeat", type=int, default=50, help="samples per benchmark")
+    parser.add_argument("--only", nargs="*", choices=sorted(_BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    parser.add_argument("--micro-tolerance", type=float, default=0.5,
+                        help="allowed slowdown of the benchmarks under {}us".format(MICRO_BENCHMARK_US))
+    parser.add_argument("--reruns", type=int, default=2, help="runs of a slower benchmark before reporting it")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store the results as the new baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    config = _parse_args(sys.argv[1:] if argv is None else argv)
+    current = run(config, config.only)
+
+    baseline = None
+    if config.baseline and os.path.exists(config.baseline) and not config.save_baseline:
+        with open(config.baseline) as f:
+            baseline = json.load(f)
+
+    if baseline:
+        confirm(config, current, baseline)
+    _print_table(current, baseline)
+
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if config.save_baseline:
+        with open(config.save_baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        return 0
+
+    if baseline:
+        regressions = compare(current, baseline, config.tolerance, config.micro_tolerance)
+        if regressions:
+            print("\nREGRESSIONS (tolerance {:.0%}, {:.0%} under {}us):".format(
+                config.tolerance, max(config.tolerance, config.micro_tolerance), MICRO_BENCHMARK_US), file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,30 +3,106 @@
 
 # allows the definition of interfaces
 from abc import abstractmethod
-from typing import Tuple
+from typing import Dict, List, Tuple, Union
+
+import selectors
 
 from blessed import Terminal
-from _window_manager import IWindow, WindowManager
+from blessed.keyboard import Keystroke
+from _window_manager import IWindow, WindowManager, KEY_RESIZE
+from _self_pipe import SelfPipe
+from ansi import Encoder
+from cell_buffer import CellBuffer
 from gui_elements import TextStyles
-from math import log2
 
 
 class _BlessedWindow(IWindow):
     """ Implements the IWindow interface to wrap the curses methods with APIs to interact with the terminal.
 
         Attributes:
-            screen (curses.window): A curses window where the elements will be drawn. It also provides user inputs.
+            screen (blessed.Terminal): The terminal where the elements will be drawn. It also provides user inputs.
+            buffer (CellBuffer): The frame being drawn.
 
         Note:
-            ideally it should be used in conjunction with curses.wrapper
+            The elements are drawn in a cell buffer. flush() compares it with what the terminal displays and writes
+            the changed cells with a single write, encoded with the fewest bytes (see ansi.Encoder). It is flushed
+            automatically before waiting for an input.
+            Inputs are expected to be read in cbreak mode, which BlessedApp.run() keeps for the whole session.
 
     """
-    def __init__(self):
-        self.screen = Terminal()
+    def __init__(self, terminal: Terminal = None):
+        self.screen = terminal if terminal is not None else Terminal()
+        self.buffer: CellBuffer = CellBuffer(0, 0)
+        # What the terminal displays. A size different from the one of the frame makes flush() clear the screen.
+        self._shown: CellBuffer = CellBuffer(0, 0)
+        self._encoder: Encoder = Encoder(0, self._style, str(self.screen.normal))
+
+        # get_input() blocks on the keyboard and on a self-pipe written by the SIGWINCH handler, so that a resize
+        # wakes it up. When the handler is installed, the terminal size is cached until the next resize.
+        self._pipe: SelfPipe = SelfPipe()
+        self._watch_resize: bool = self._pipe.watch_resize()
+        self._size: Union[None, Tuple[int, int]] = None
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._pipe, selectors.EVENT_READ)
+        # blessed does not expose its keyboard descriptor publicly, it is None when the input is not a terminal.
+        self._keyboard_fd: Union[None, int] = getattr(self.screen, "_keyboard_fd", None)
+        if self._keyboard_fd is not None:
+            self._selector.register(self._keyboard_fd, selectors.EVENT_READ)
+
+        # (prefix, suffix) escape sequences of every combination of TextStyles flags. Each flag is prepended, as the
+        # styles used to be nested in the order of TextStyles.FLAGS.
+        screen = self.screen
+        prefixes = TextStyles.compile({
+            TextStyles.HIGHLIGHTED: str(screen.reverse),
+            TextStyles.UNDERLINE: str(screen.underline),
+            TextStyles.BOLD: str(screen.bold),
+            TextStyles.RED: str(screen.red),
+            TextStyles.GREEN: str(screen.green),
+            TextStyles.YELLOW: str(screen.yellow),
+            TextStyles.BLUE: str(screen.blue),
+            TextStyles.MAGENTA: str(screen.magenta),
+            TextStyles.CYAN: str(screen.cyan),
+        }, lambda prefix, sequence: sequence + prefix, '')
+        self._styles: List[Tuple[str, str]] = [(prefix, str(screen.normal) if prefix else '') for prefix in prefixes]
+        # The (prefix, suffix) of the styles with fg()/bg() colors met so far. blessed downgrades the colors the
+        # terminal cannot display to the closest available.
+        self._color_styles: Dict[int, Tuple[str, str]] = {}
+
+    def get_input(self, timeout: float = None) -> Union[None, Keystroke]:
+        """Waits for the next key or terminal resize.
+
+        Parameters:
+            timeout (float): (Optional) Maximum time to wait in seconds. It blocks until an event by default.
+
+        Returns:
+            The pressed key, a keystroke named KEY_RESIZE after a resize, or None on timeout.
+        """
+        self.flush()
+
+        # Keys already received (e.g. the rest of a paste) are returned before waiting.
+        key = self.screen.inkey(timeout=0)
+        if key:
+            return key
+
+        for selected, _ in self._selector.select(timeout):
+            if selected.fileobj is self._pipe and SelfPipe.RESIZE in self._pipe.drain():
+                self._size = None
+                return Keystroke('', KEY_RESIZE, 'KEY_RESIZE')
 
-    def get_input(self) -> int:
-        with self.screen.cbreak():
-            return self.screen.inkey(timeout=1./100)
+        key = self.screen.inkey(timeout=0)
+        return key if key else None
+
+    def input_fds(self) -> List[int]:
+        fds = [self._pipe.fileno()]
+        if self._keyboard_fd is not None:
+            fds.append(self._keyboard_fd)
+        return fds
+
+    def wakeup(self) -> None:
+        self._pipe.notify(SelfPipe.WAKEUP)
+
+    def is_resize(self, key: Keystroke) -> bool:
+        return getattr(key, "name", None) == "KEY_RESIZE"
 
     def draw(self, y_pos: int, x_pos: int, text: str, attr=0) -> None:
         """Draw a string of text at a given (relative) position.
@@ -37,36 +113,29 @@ class _BlessedWindow(IWindow):
             text (str): The text to draw.
             attr: Optional parameters to specify text styles.
         """
-
-        max_y, max_x = self.get_max_yx()
-        max_len = max_x - x_pos
-
-        if len(text) > max_len:
-            text = text[:max_len]
-
-        # A bitmask is used to set multiple concurrent text styles:
-        if (attr & TextStyles.HIGHLIGHTED) >> int(log2(TextStyles.HIGHLIGHTED)):
-            text = self.screen.reverse(text)
-        if (attr & TextStyles.UNDERLINE) >> int(log2(TextStyles.UNDERLINE)):
-            text = self.screen.underline(text)
-        if (attr & TextStyles.BOLD) >> int(log2(TextStyles.BOLD)):
-            text = self.screen.bold(text)
-        if (attr & TextStyles.RED) >> int(log2(TextStyles.RED)):
-            text = self.screen.red(text)
-        if (attr & TextStyles.GREEN) >> int(log2(TextStyles.GREEN)):
-            text = self.screen.green(text)
-        if (attr & TextStyles.YELLOW) >> int(log2(TextStyles.YELLOW)):
-            text = self.screen.yellow(text)
-        if (attr & TextStyles.BLUE) >> int(log2(TextStyles.BLUE)):
-            text = self.screen.blue(text)
-        if (attr & TextStyles.MAGENTA) >> int(log2(TextStyles.MAGENTA)):
-            text = self.screen.magenta(text)
-        if (attr & TextStyles.CYAN) >> int(log2(TextStyles.CYAN)):
-            text = self.screen.cyan(text)
-
-        if max_len > 0 and x_pos < max_x and y_pos < max_y:
-             with self.screen.location(x_pos, y_pos):
-                print(text)
+        self.buffer.draw(y_pos, x_pos, text, attr)
+
+    def _style(self, attr: int) -> str:
+        # The sequence selecting a style from any other: the attributes are reset, then the ones of attr are set.
+        # A bitmask is used to set multiple concurrent text styles, its escape sequences are precompiled.
+        if attr >> TextStyles.COLOR_SHIFT:
+            prefix, _ = self._color_styles.get(attr) or self._color_style(attr)
+        else:
+            prefix, _ = self._styles[attr & (TextStyles.COMBINATIONS - 1)]
+        return str(self.screen.normal) + prefix
+
+    def _color_style(self, attr: int) -> Tuple[str, str]:
+        screen = self.screen
+        prefix = self._styles[attr & (TextStyles.COMBINATIONS - 1)][0]
+        fg, bg = TextStyles.colors(attr)
+        # Added after the flags, so that they override the color flags.
+        if fg is not None:
+            prefix += str(screen.color_rgb(*fg) if isinstance(fg, tuple) else screen.color(fg))
+        if bg is not None:
+            prefix += str(screen.on_color_rgb(*bg) if isinstance(bg, tuple) else screen.on_color(bg))
+        style = (prefix, str(screen.normal))
+        self._color_styles[attr] = style
+        return style
 
     def draw_rectangle(self, uly: int, ulx: int, lry: int, lrx: int) -> None:
         """Draw a rectangle with corners at the provided upper-left and lower-right coordinates.
@@ -78,35 +147,43 @@ class _BlessedWindow(IWindow):
             lrx: x position of the Lower-Right corner of the rectangle
 
         """
-        border_bl = u'└'
-        border_br = u'┘'
-        border_tl = u'┌'
-        border_tr = u'┐'
-        border_h = u'─'
-        border_v = u'│'
-
-        if uly != lry and ulx != lrx:
-            with self.screen.location(ulx, uly):
-                print(border_tl + border_h * (lrx - ulx - 1) + border_tr)
-            with self.screen.location(ulx, lry):
-                print(border_bl + border_h * (lrx - ulx - 1) + border_br)
-
-            for n in range(lry - uly - 1):
-                with self.screen.location(ulx, uly + 1 + n):
-                    print(border_v)
-
-            for n in range(lry - uly - 1):
-                with self.screen.location(lrx, uly + 1 + n):
-                    print(border_v)
+        self.buffer.draw_rectangle(uly, ulx, lry, lrx)
 
     def get_max_yx(self) -> Tuple[int, int]:
-        return self.screen.height, self.screen.width
+        if self._size is None or not self._watch_resize:
+            self._size = self.screen.height, self.screen.width
+        return self._size
 
     def delete(self, y_pos: int, x_pos: int) -> None:
-        self.draw(y_pos, x_pos, " ")
+        self.buffer.draw(y_pos, x_pos, self.buffer.fill)
 
     def clear(self) -> None:
-        print(self.screen.clear())
+        h, w = self.get_max_yx()
+        if (h, w) != self.buffer.get_max_yx():
+            self.buffer.resize(h, w)
+        else:
+            self.buffer.clear()
+
+    def flush(self) -> None:
+        """Writes the cells changed since the previous flush with a single write and flush."""
+        touched, self.buffer.touched = self.buffer.touched, set()
+        if not touched:
+            return
+        output = ""
+        if self._shown.get_max_yx() != self.buffer.get_max_yx():
+            # After a resize the terminal content is unknown: it is cleared and everything is drawn.
+            self._shown.resize(self.buffer.h, self.buffer.w)
+            self._encoder.width = self.buffer.w
+            self._encoder.invalidate()
+            output = str(self.screen.normal) + str(self.screen.clear)
+            touched = None
+        runs = self.buffer.update_view(self._shown, rows=touched)
+        output += self._encoder.encode(runs, self.buffer)
+        if output:
+            # The default style is restored at the end of each frame, so that nothing leaks if the application exits.
+            output += self._encoder.end()
+            self.screen.stream.write(output)
+            self.screen.stream.flush()
 
 
 class BlessedApp(WindowManager):
@@ -124,9 +201,23 @@ class BlessedApp(WindowManager):
 
     def run(self):
         self.design()
-        self.render()
-        self.reset_active()
         with self.window.screen.hidden_cursor():
-            with self.window.screen.fullscreen():
+            with self.window.screen.fullscreen(), self.window.screen.cbreak():
+                self.render()
+                self.reset_active()
                 self.main()
+                self.flush()
+
+    def run_async(self):
+        """Runs the application on an asyncio event loop instead of main(). Keys are handled by on_key()."""
+        # Imported here: the synchronous run mode does not pay for it.
+        import asyncio
+
+        self.design()
+        with self.window.screen.hidden_cursor():
+            with self.window.screen.fullscreen(), self.window.screen.cbreak():
+                self.render()
+                self.reset_active()
+                asyncio.run(self.serve())
+                self.flush()
 
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Iterable, List, Set, Tuple, Union
+
+from array import array
+from itertools import chain
+
+from text_width import cells, width
+
+
+# A changed run of cells: (y, x, text, attr). All the cells of a run share the same text style.
+Run = Tuple[int, int, str, int]
+
+# Bytes per cell of a packed buffer: the code point of the character (UTF-32), then the style (signed 64 bits).
+PACKED_CELL_SIZE = 12
+
+
+class CellBuffer(object):
+    """An in-memory grid of character cells. Each cell stores one character and its text style.
+        It is used as a drawing surface by the headless backend and to compare what was drawn between two frames.
+
+        Attributes:
+            h (int): The number of rows of the grid.
+            w (int): The number of columns of the grid.
+            fill (str): The character used for empty cells.
+            touched (Set[int]): The rows written since it was last reset by its consumer, e.g. a server sending the
+                                changes of each frame. The rows not in it are unchanged.
+    """
+    border_bl = u'└'
+    border_br = u'┘'
+    border_tl = u'┌'
+    border_tr = u'┐'
+    border_h = u'─'
+    border_v = u'│'
+
+    def __init__(self, h: int, w: int, fill: str = ' '):
+        self._h: int = 0
+        self._w: int = 0
+        self.fill: str = fill
+        self._chars: List[List[str]] = []
+        self._attrs: List[List[int]] = []
+        self.touched: Set[int] = set()
+        self.resize(h, w)
+
+    @property
+    def h(self) -> int:
+        return self._h
+
+    @property
+    def w(self) -> int:
+        return self._w
+
+    def get_max_yx(self) -> Tuple[int, int]:
+        return self._h, self._w
+
+    def resize(self, h: int, w: int) -> None:
+        """Changes the size of the grid. The content is lost."""
+        self._h = max(h, 0)
+        self._w = max(w, 0)
+        self.clear()
+
+    def clear(self) -> None:
+        self._chars = [[self.fill] * self._w for _ in range(self._h)]
+        self._attrs = [[0] * self._w for _ in range(self._h)]
+        self.touched.update(range(self._h))
+
+    def get(self, y_pos: int, x_pos: int) -> Tuple[str, int]:
+        """Returns the (character, style) pair stored at the given position."""
+        return self._chars[y_pos][x_pos], self._attrs[y_pos][x_pos]
+
+    def row_text(self, y_pos: int) -> str:
+        return ''.join(self._chars[y_pos])
+
+    def span_text(self, y_pos: int, start: int, end: int, attr: int) -> Union[None, str]:
+        """Returns the text of the cells [start, end) of a row if they all have the given style, None otherwise or if
+            the span cuts a wide character. Writing it redraws the cells as they are."""
+        chars = self._chars[y_pos]
+        if chars[start] == '' or (end < self._w and chars[end] == ''):
+            return None
+        attrs = self._attrs[y_pos]
+        if attrs[start:end].count(attr) != end - start:
+            return None
+        return ''.join(chars[start:end])
+
+    def lines(self) -> List[str]:
+        return [''.join(row) for row in self._chars]
+
+    def draw(self, y_pos: int, x_pos: int, text: str, attr: int = 0) -> int:
+        """Writes a string of text at the given position. The text is clipped to the grid.
+            A wide character takes two cells, the second one holding an empty string. Combining characters share the
+            cell of the character they modify.
+
+        Returns:
+            The number of cells actually written.
+        """
+        if y_pos < 0 or y_pos >= self._h or x_pos >= self._w:
+            return 0
+        # ASCII text has one character per cell, it is written as is.
+        is_ascii = text.isascii()
+        chars = text if is_ascii else cells(text)
+        if x_pos < 0:
+            chars = chars[-x_pos:]
+            x_pos = 0
+
+        end = min(x_pos + len(chars), self._w)
+        n = end - x_pos
+        if n <= 0:
+            return 0
+
+        clipped = n < len(chars)
+        chars = chars[:n]
+        if not is_ascii:
+            # A wide character cut by the clipping is replaced by a blank.
+            if chars[0] == '':
+                chars[0] = self.fill
+            if clipped and chars[-1] and width(chars[-1]) == 2:
+                chars[-1] = self.fill
+
+        row = self._chars[y_pos]
+        self.touched.add(y_pos)
+        # Overwriting half of a wide character blanks its other half.
+        if x_pos > 0 and row[x_pos] == '':
+            row[x_pos - 1] = self.fill
+        if end < self._w and row[end] == '':
+            row[end] = self.fill
+
+        row[x_pos:end] = chars
+        self._attrs[y_pos][x_pos:end] = [attr] * n
+        return n
+
+    def draw_rectangle(self, uly: int, ulx: int, lry: int, lrx: int) -> None:
+        """Draws a rectangle with box-drawing characters, the same way the terminal backends do."""
+        if uly != lry and ulx != lrx:
+            self.draw(uly, ulx, self.border_tl + self.border_h * (lrx - ulx - 1) + self.border_tr)
+            self.draw(lry, ulx, self.border_bl + self.border_h * (lrx - ulx - 1) + self.border_br)
+            # The sides are single cells, written directly unless they meet half of a wide character.
+            rows = range(max(uly + 1, 0), min(lry, self._h))
+            for x in (ulx, lrx):
+                if not 0 <= x < self._w:
+                    continue
+                for y in rows:
+                    row = self._chars[y]
+                    if row[x] == '' or (x + 1 < self._w and row[x + 1] == ''):
+                        self.draw(y, x, self.border_v)
+                    else:
+                        row[x] = self.border_v
+                        self._attrs[y][x] = 0
+                self.touched.update(rows)
+
+    def copy(self) -> CellBuffer:
+        other = CellBuffer.__new__(CellBuffer)
+        other._h = self._h
+        other._w = self._w
+        other.fill = self.fill
+        other._chars = [row[:] for row in self._chars]
+        other._attrs = [row[:] for row in self._attrs]
+        other.touched = set(self.touched)
+        return other
+
+    def blit(self, other: CellBuffer, y_pos: int = 0, x_pos: int = 0) -> None:
+        """Copies the whole content of another buffer into this one, with its upper-left corner at (y_pos, x_pos)."""
+        for row in range(other.h):
+            y = y_pos + row
+            if 0 <= y < self._h:
+                start = max(x_pos, 0)
+                end = min(x_pos + other.w, self._w)
+                if end > start:
+                    self._chars[y][start:end] = other._chars[row][start - x_pos:end - x_pos]
+                    self.touched.add(y)
+                    self._attrs[y][start:end] = other._attrs[row][start - x_pos:end - x_pos]
+
+    def blit_region(self, other: CellBuffer, y_pos: int, x_pos: int, h: int, w: int) -> None:
+        """Copies the cells of a rectangle of another buffer into the same rectangle of this one, e.g. to lay a popup
+            over the screen. The wide characters cut by its left and right sides are replaced by blanks."""
+        start, end = max(x_pos, 0), min(x_pos + w, self._w, other.w)
+        if end <= start:
+            return
+        fill = self.fill
+        for y in range(max(y_pos, 0), min(y_pos + h, self._h, other.h)):
+            row, source = self._chars[y], other._chars[y]
+            # Half of a wide character of this buffer is overwritten on either side: the other half is blanked.
+            if start > 0 and row[start] == '':
+                row[start - 1] = fill
+            if end < self._w and row[end] == '':
+                row[end] = fill
+            row[start:end] = source[start:end]
+            # Half of a wide character of the other buffer is copied on either side: it is blanked.
+            if row[start] == '':
+                row[start] = fill
+            if end < other.w and source[end] == '':
+                row[end - 1] = fill
+            self._attrs[y][start:end] = other._attrs[y][start:end]
+            self.touched.add(y)
+
+    def runs(self, y_pos: int) -> List[Run]:
+        """The runs of cells of a row, each one holding the consecutive cells with the same style."""
+        return _row_runs(y_pos, self._chars[y_pos], self._attrs[y_pos], None, None)
+
+    def pack_into(self, data: memoryview) -> bool:
+        """Writes the cells into a block of memory of at least PACKED_CELL_SIZE bytes per cell, e.g. shared memory:
+            the code points of the characters first, row by row, then the styles. The second half of a wide character
+            is stored as the code point 0.
+
+        Returns:
+            False if a cell holds more than one character (combining characters): the cells cannot be packed.
+        """
+        n = self._h * self._w
+        text = ''.join([char or '\0' for row in self._chars for char in row])
+        if len(text) != n:
+            return False
+        data[:4 * n] = text.encode('utf-32-le')
+        data[4 * n:PACKED_CELL_SIZE * n] = array('q', chain.from_iterable(self._attrs)).tobytes()
+        return True
+
+    def unpack_from(self, data: memoryview) -> None:
+        """Reads the cells written by pack_into() by a buffer of the same size."""
+        h, w = self._h, self._w
+        n = h * w
+        text = bytes(data[:4 * n]).decode('utf-32-le')
+        attrs = array('q')
+        attrs.frombytes(data[4 * n:PACKED_CELL_SIZE * n])
+        attrs = attrs.tolist()
+        self._chars = [list(text[y * w:(y + 1) * w]) for y in range(h)]
+        if '\0' in text:
+            self._chars = [[char if char != '\0' else '' for char in row] for row in self._chars]
+        self._attrs = [attrs[y * w:(y + 1) * w] for y in range(h)]
+        self.touched.update(range(h))
+
+    def diff(self, previous: CellBuffer) -> List[Run]:
+        """Computes the runs of cells that differ from a previous state of the grid.
+
+        Parameters:
+            previous (CellBuffer): The state to compare with. If its size differs, every cell is reported.
+
+        Returns:
+            A list of (y, x, text, attr) runs, sorted by position. Consecutive changed cells with the same style are
+            merged into a single run.
+        """
+        same_size = previous.h == self._h and previous.w == self._w
+        runs: List[Run] = []
+
+        for y in range(self._h):
+            chars = self._chars[y]
+            attrs = self._attrs[y]
+            if same_size:
+                old_chars = previous._chars[y]
+                old_attrs = previous._attrs[y]
+                if chars == old_chars and attrs == old_attrs:
+                    continue
+                runs.extend(_row_runs(y, chars, attrs, old_chars, old_attrs))
+            else:
+                runs.extend(_row_runs(y, chars, attrs, None, None))
+
+        return runs
+
+    def changed_rows(self, previous: CellBuffer, rows: Iterable[int] = None) -> List[int]:
+        """Lists the rows that differ from a previous state of the grid, all of them if its size differs.
+
+        Parameters:
+            previous (CellBuffer): The state to compare with.
+            rows (Iterable[int]): (Optional) Only these rows are compared, e.g. the touched ones. All by default.
+        """
+        if previous.h != self._h or previous.w != self._w:
+            return list(range(self._h))
+        return [y for y in (range(self._h) if rows is None else sorted(rows))
+                if self._chars[y] != previous._chars[y] or self._attrs[y] != previous._attrs[y]]
+
+    def update_view(self, view: CellBuffer, y_pos: int = 0, x_pos: int = 0, rows: Iterable[int] = None) -> List[Run]:
+        """Copies into a smaller (or larger) buffer the region of this grid with its upper-left corner at
+            (y_pos, x_pos) and the size of the view. The cells of the region outside of this grid are blank.
+
+        Parameters:
+            view (CellBuffer): The buffer receiving the region.
+            y_pos (int): The row of this grid shown by the first row of the view.
+            x_pos (int): The column of this grid shown by the first column of the view.
+            rows (Iterable[int]): (Optional) The rows of this grid which may have changed since the view was last
+                                  updated. The other rows are not compared. All of them by default.
+
+        Returns:
+            The runs of cells of the view which changed, in the coordinates of the view.
+        """
+        runs: List[Run] = []
+        view_rows = range(view.h) if rows is None else \
+            sorted(y - y_pos for y in set(rows) if 0 <= y - y_pos < view.h)
+        x_end = x_pos + view.w
+        for vy in view_rows:
+            y = y_pos + vy
+            if 0 <= y < self._h and x_pos >= 0 and x_end <= self._w:
+                chars = self._chars[y][x_pos:x_end]
+                attrs = self._attrs[y][x_pos:x_end]
+            else:
+                chars = [self.fill] * view.w
+                attrs = [0] * view.w
+                start, end = max(x_pos, 0), min(x_end, self._w)
+                if 0 <= y < self._h and end > start:
+                    chars[start - x_pos:end - x_pos] = self._chars[y][start:end]
+                    attrs[start - x_pos:end - x_pos] = self._attrs[y][start:end]
+
+            if chars == view._chars[vy] and attrs == view._attrs[vy]:
+                continue
+            runs.extend(_row_runs(vy, chars, attrs, view._chars[vy], view._attrs[vy]))
+            view._chars[vy] = chars
+            view._attrs[vy] = attrs
+        return runs
+
+
+def _row_runs(y: int, chars: List[str], attrs: List[int], old_chars, old_attrs) -> List[Run]:
+    runs: List[Run] = []
+    x = 0
+    w = len(chars)
+    while x < w:
+        if old_chars is not None and chars[x] == old_chars[x] and attrs[x] == old_attrs[x]:
+            x += 1
+            continue
+        start = x
+        attr = attrs[x]
+        x += 1
+        while x < w and attrs[x] == attr and \
+                (old_chars is None or chars[x] != old_chars[x] or attrs[x] != old_attrs[x]):
+            x += 1
+        runs.append((y, start, ''.join(chars[start:x]), attr))
+    return runs
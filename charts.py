@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Sparkline, bar and line chart elements plotting series of values with NumPy.
+
+A Series keeps its values in a ring buffer together with the minimum and maximum of each block of consecutive values.
+The charts ask it for the minimum and maximum of one bucket of values per column (or per half column with Braille
+cells): the buckets are aggregated from the block summaries, so that plotting a million values reads a few thousand
+summaries, and appending values only summarizes the blocks they fall in.
+
+    series = Series(1000000)
+    series.append(samples)                    # a value or an array of values
+    chart = LineChart(y, x, h, w, "cpu", series, braille=True)
+    app.post(lambda: series.append(value), chart)
+"""
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Iterable, List, Tuple, Union
+
+from abc import abstractmethod
+
+import numpy as np
+
+from gui_elements import GuiElement, IPositionConstraint, ISizeConstraint, CannotDrawError
+from constraints import size_constraint
+
+# The eighths of a cell, from empty to full.
+_EIGHTHS = np.array(list(u" ▁▂▃▄▅▆▇█"))
+
+# The bit of each dot of a Braille cell, 4 rows of 2 dots.
+_BRAILLE_DOTS = np.array([[0x01, 0x08], [0x02, 0x10], [0x04, 0x20], [0x40, 0x80]])
+
+
+class Series(object):
+    """A series of values kept in a ring buffer: once the capacity is reached, each value appended drops the oldest
+        one.
+
+        Attributes:
+            capacity (int): The maximum number of values kept.
+            block (int): The number of consecutive values summarized by their minimum and maximum.
+
+        Note:
+            The buckets are aggregated from the summaries when they hold at least 8 blocks. Their bounds are then
+            rounded to blocks: the buckets may differ by one block in size, which is not visible on a chart.
+    """
+    def __init__(self, capacity: int, block: int = 128):
+        self.capacity: int = capacity
+        self.block: int = block
+        # The ring holds a whole number of blocks, each one contiguous.
+        self._blocks: int = -(-capacity // block)
+        self._data: np.ndarray = np.full(self._blocks * block, np.nan)
+        # Number of values appended since the creation: the values kept are [count - capacity, count).
+        self._count: int = 0
+        # The summaries of the blocks, by block number modulo their number. The oldest block kept may share its
+        # place in the ring with the newest one: there is one more summary than blocks.
+        self._mins: np.ndarray = np.full(self._blocks + 1, np.nan)
+        self._maxs: np.ndarray = np.full(self._blocks + 1, np.nan)
+        self._decimated: Union[None, Tuple[int, int, np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_array(cls, values: Iterable[float], block: int = 128) -> Series:
+        """Creates a series holding the given values, with a capacity of their number."""
+        values = np.asarray(values, dtype=float).ravel()
+        series = cls(max(len(values), 1), block)
+        series.append(values)
+        return series
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def _start(self) -> int:
+        return max(self._count - self.capacity, 0)
+
+    def _raw(self, start: int, end: int) -> np.ndarray:
+        # The values of the absolute range [start, end), which must be kept by the ring.
+        size = len(self._data)
+        if end <= start:
+            return self._data[:0]
+        first, last = start % size, (end - 1) % size + 1
+        if first < last:
+            return self._data[first:last]
+        return np.concatenate((self._data[first:], self._data[:last]))
+
+    def values(self) -> np.ndarray:
+        """The values kept, from the oldest one."""
+        return self._raw(self._start(), self._count).copy()
+
+    def append(self, values: Union[float, Iterable[float]]) -> None:
+        """Appends a value or an array of values. Only the blocks receiving them are summarized again."""
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) > self.capacity:
+            self._count += len(values) - self.capacity
+            values = values[-self.capacity:]
+        if not len(values):
+            return
+        size = len(self._data)
+        start = self._count
+        position = start % size
+        head = min(len(values), size - position)
+        self._data[position:position + head] = values[:head]
+        self._data[:len(values) - head] = values[head:]
+        self._count += len(values)
+        self._summarize(start // self.block, (self._count - 1) // self.block + 1)
+
+    def _summarize(self, first: int, last: int) -> None:
+        # Computes the summaries of the blocks [first, last), from the values kept.
+        block = self.block
+        numbers = np.arange(first, last)
+        chunks = self._data.reshape(self._blocks, block)[numbers % self._blocks]
+        # Only the first and the last block may hold values which are not kept, or not written yet.
+        indices = numbers[:, None] * block + np.arange(block)
+        chunks = np.where((indices >= self._start()) & (indices < self._count), chunks, np.nan)
+        self._mins[numbers % len(self._mins)] = np.fmin.reduce(chunks, axis=1)
+        self._maxs[numbers % len(self._maxs)] = np.fmax.reduce(chunks, axis=1)
+
+    def decimate(self, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Splits the values kept into consecutive buckets and computes the minimum and maximum of each one. When
+            there are fewer values than buckets, the values are repeated over several buckets.
+
+        Returns:
+            The arrays of the minimums and of the maximums of the buckets, NaN for the buckets without any value.
+        """
+        if self._decimated is not None and self._decimated[:2] == (self._count, buckets):
+            return self._decimated[2], self._decimated[3]
+
+        start, end = self._start(), self._count
+        n = end - start
+        block = self.block
+        if n == 0 or buckets <= 0:
+            mins = maxs = np.full(max(buckets, 0), np.nan)
+        elif n < buckets * block * 8:
+            values = self._raw(start, end)
+            edges = np.arange(buckets) * n // buckets
+            mins, maxs = np.fmin.reduceat(values, edges), np.fmax.reduceat(values, edges)
+        else:
+            # The whole blocks are aggregated from their summaries, the partial blocks at both ends from the values.
+            first, last = -(-start // block), end // block
+            numbers = np.arange(first, last) % len(self._mins)
+            edges = np.arange(buckets) * (last - first) // buckets
+            mins = np.fmin.reduceat(self._mins[numbers], edges)
+            maxs = np.fmax.reduceat(self._maxs[numbers], edges)
+            for index, values in ((0, self._raw(start, first * block)), (-1, self._raw(last * block, end))):
+                if len(values):
+                    mins[index] = np.fmin(mins[index], np.fmin.reduce(values))
+                    maxs[index] = np.fmax(maxs[index], np.fmax.reduce(values))
+
+        self._decimated = (self._count, buckets, mins, maxs)
+        return mins, maxs
+
+
+def _bounds(mins: np.ndarray, maxs: np.ndarray, y_range: Union[None, Tuple[float, float]]) -> Tuple[float, float]:
+    # The range of values plotted: the given one, or the one of the buckets. An empty range is widened.
+    if y_range is not None:
+        low, high = y_range
+    elif np.isnan(mins).all():
+        low, high = 0., 1.
+    else:
+        low, high = float(np.nanmin(mins)), float(np.nanmax(maxs))
+    if high <= low:
+        low, high = low - .5, low + .5
+    return low, high
+
+
+class _Chart(GuiElement):
+    """The base of the charts: an element plotting a series with a single text style."""
+    __slots__ = ("series", "y_range", "style")
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, chart_id: str, series: Series,
+                 y_range: Tuple[float, float] = None, style: int = 0):
+        super().__init__(y_constraint, x_constraint, h_constraint, w_constraint, chart_id)
+        self.series: Series = series
+        self.y_range: Union[None, Tuple[float, float]] = y_range
+        self.style: int = style
+
+    @abstractmethod
+    def rows(self, h: int, w: int) -> List[str]:
+        """Returns the text of each row of the chart for the given size."""
+        pass
+
+    def render(self) -> None:
+        try:
+            # The size is computed inside the try: a chart which does not fit is hidden, not its panel.
+            h, w = self.get_max_yx()
+            if h > 0 and w > 0:
+                for y, text in enumerate(self.rows(h, w)):
+                    self.draw(y, 0, text, self.style)
+            self.is_visible = True
+
+        except CannotDrawError:
+            self.is_visible = False
+
+
+class Sparkline(_Chart):
+    """A one row chart: the maximum of the values of each column is drawn as a bar of eighths of a cell.
+
+        Attributes:
+            series (Series): The values plotted.
+            y_range (Tuple[float, float]): The values of the bottom and the top of the row. The range of the values
+                                           plotted if None.
+            style (int): The text style of the chart.
+    """
+    __slots__ = ()
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 w_constraint: ISizeConstraint, chart_id: str, series: Series, y_range: Tuple[float, float] = None,
+                 style: int = 0):
+        super().__init__(y_constraint, x_constraint, size_constraint("absolute", 1), w_constraint, chart_id, series,
+                         y_range, style)
+
+    def rows(self, h: int, w: int) -> List[str]:
+        mins, maxs = self.series.decimate(w)
+        low, high = _bounds(mins, maxs, self.y_range)
+        # Every value shows at least the lowest bar, NaN shows nothing.
+        levels = np.clip(np.round((maxs - low) / (high - low) * 7), 0, 7)
+        levels = np.where(np.isnan(maxs), 0, levels + 1).astype(int)
+        return [''.join(_EIGHTHS[levels])]
+
+
+class BarChart(_Chart):
+    """A chart drawing the maximum of the values of each column as a vertical bar, with a resolution of an eighth of
+        a cell.
+
+        Attributes:
+            series (Series): The values plotted.
+            y_range (Tuple[float, float]): The values of the bottom and the top of the chart. By default, from 0 (or
+                                           the lowest negative value) to the highest value.
+            style (int): The text style of the chart.
+    """
+    __slots__ = ()
+
+    def rows(self, h: int, w: int) -> List[str]:
+        mins, maxs = self.series.decimate(w)
+        low, high = _bounds(np.fmin(mins, 0), maxs, self.y_range)
+        eighths = np.nan_to_num(np.round((maxs - low) / (high - low) * h * 8), nan=0)
+        # The row y from the top is filled by the eighths above the (h - 1 - y) full rows below it.
+        bases = (h - 1 - np.arange(h))[:, None] * 8
+        cells = _EIGHTHS[np.clip(eighths[None, :] - bases, 0, 8).astype(int)]
+        return [''.join(row) for row in cells]
+
+
+class LineChart(_Chart):
+    """A chart drawing the values as a line: each column covers the range of its values, extended to join the range
+        of the previous column.
+
+        Attributes:
+            series (Series): The values plotted.
+            y_range (Tuple[float, float]): The values of the bottom and the top of the chart. The range of the values
+                                           plotted if None.
+            style (int): The text style of the chart.
+            braille (bool): True to draw with Braille characters, each cell holding 2 columns of 4 dots.
+    """
+    __slots__ = ("braille",)
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, chart_id: str, series: Series,
+                 y_range: Tuple[float, float] = None, style: int = 0, braille: bool = False):
+        super().__init__(y_constraint, x_constraint, h_constraint, w_constraint, chart_id, series, y_range, style)
+        self.braille: bool = braille
+
+    def rows(self, h: int, w: int) -> List[str]:
+        dots_y, dots_x = (4, 2) if self.braille else (1, 1)
+        mins, maxs = self.series.decimate(w * dots_x)
+        low, high = _bounds(mins, maxs, self.y_range)
+
+        # A column above the previous one goes down to its top, a column below it goes up to its bottom.
+        lows, highs = mins.copy(), maxs.copy()
+        lows[1:] = np.fmin(lows[1:], maxs[:-1])
+        highs[1:] = np.fmax(highs[1:], mins[:-1])
+
+        # The dots of each column, from its top to its bottom. The comparisons with NaN leave the column empty.
+        levels = h * dots_y - 1
+        tops = levels - np.round((highs - low) / (high - low) * levels)
+        bottoms = levels - np.round((lows - low) / (high - low) * levels)
+        dots = np.arange(h * dots_y)[:, None]
+        grid = (dots >= tops) & (dots <= bottoms)
+
+        if self.braille:
+            codes = (grid.reshape(h, 4, w, 2) * _BRAILLE_DOTS[None, :, None, :]).sum(axis=(1, 3))
+            return [''.join([chr(0x2800 + code) if code else ' ' for code in row]) for row in codes.tolist()]
+
+        # A dot joined to another one above or below it is drawn as a vertical line.
+        joined = np.zeros_like(grid)
+        joined[1:] |= grid[:-1]
+        joined[:-1] |= grid[1:]
+        cells = np.where(grid, np.where(joined, u'│', u'•'), ' ')
+        return [''.join(row) for row in cells]
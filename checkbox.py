@@ -3,25 +3,72 @@
 
 # Imports used for type hints
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Callable, Iterable, List, Set, Tuple, Union
+
+from itertools import compress
 
 from gui_elements import GuiElement, IPositionConstraint, TextStyles, CannotDrawError
 from constraints import size_constraint
+from text_width import width
 
 
 class Checkbox(GuiElement):
-    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint, box_id: str, text: str):
+    """A box checked and unchecked by the user.
+
+        Attributes:
+            toggle (bool): True when the box is checked. The state of the members of a group is kept by the group.
+            group (CheckboxGroup): The group of the box, None if it has none.
+    """
+    __slots__ = ("_toggle", "_text", "_group", "_index")
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint, box_id: str, text: str,
+                 group: CheckboxGroup = None):
 
         super().__init__(y_constraint, x_constraint, size_constraint("absolute", 1),
-                         size_constraint("relative", 1), box_id, min_w=len(text) + 4)
+                         size_constraint("relative", 1), box_id, min_w=width(text) + 4)
 
-        self.toggle = False
+        self._toggle = False
         self._text = text
         self._is_visible = False
+        self._group: Union[None, CheckboxGroup] = None
+        self._index: int = -1
+        if group is not None:
+            group.add(self)
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def group(self) -> Union[None, CheckboxGroup]:
+        return self._group
+
+    @property
+    def toggle(self) -> bool:
+        if self._group is None:
+            return self._toggle
+        return self._group.value >> self._index & 1 == 1
+
+    @toggle.setter
+    def toggle(self, toggle: bool) -> None:
+        if self._group is None:
+            self._toggle = toggle
+        else:
+            self._group.set(self._index, toggle)
+
+    # The group keeps track of the members drawn by their last render, which are the only ones redrawn after a change.
+    @GuiElement.is_visible.setter
+    def is_visible(self, is_visible) -> None:
+        if is_visible != self._is_visible and self._group is not None:
+            self._group._set_visible(self._index, is_visible)
+        GuiElement.is_visible.fset(self, is_visible)
 
     def interact(self, value: int = 0) -> None:
-        self.toggle = False if self.toggle else True
-        self.render()
+        if self._group is None:
+            self._toggle = not self._toggle
+            self.render()
+        else:
+            self._group.set(self._index, not self.toggle)
 
     def render(self) -> None:
         if self.toggle:
@@ -37,10 +84,163 @@ class Checkbox(GuiElement):
             else:
                 self.draw(0, 0, text)
 
-            if self.parent.is_visible:
-                self.is_visible = True
-            else:
-                self.is_visible = False
+            # The visibility of the parent is taken into account when is_visible is read.
+            self.is_visible = True
 
         except CannotDrawError:
             self.is_visible = False
+
+
+# Converts the reversed binary representation of a bitset to one byte per member, 0 or 1.
+_BITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+class CheckboxGroup(object):
+    """The state of many checkboxes, kept as a bitset: the bit n of an integer is set when the member n is checked.
+        Bulk operations (select all, invert, select the members matching a condition) are a few operations on
+        integers, whatever the number of members, and end with a single redraw of the visible members whose state
+        changed.
+
+        Attributes:
+            value (int): The bitset of the checked members, bit n for the member of index n. Setting it changes the
+                         state of every member at once.
+            boxes (List[Checkbox]): The members, by index.
+
+        Note:
+            As for any interaction with the elements, the redraws are made on the canvas of the boxes without
+            flushing the window.
+    """
+    def __init__(self, on_change: Callable[[int], None] = None):
+        self._boxes: List[Checkbox] = []
+        self._ids: List[str] = []
+        self._bits: int = 0
+        self._mask: int = 0
+        self._visible: Set[int] = set()
+        self._callbacks: List[Callable[[int], None]] = []
+        if on_change is not None:
+            self._callbacks.append(on_change)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    @property
+    def boxes(self) -> List[Checkbox]:
+        return list(self._boxes)
+
+    @property
+    def value(self) -> int:
+        return self._bits
+
+    @value.setter
+    def value(self, bits: int) -> None:
+        self.assign(bits)
+
+    def add(self, box: Checkbox) -> int:
+        """Adds a checkbox to the group, keeping its state. A box belongs to a single group for its whole life.
+
+        Returns:
+            The index of the box in the group.
+        """
+        if box._group is not None:
+            raise ValueError("{} already belongs to a group".format(box.node.name))
+        index = len(self._boxes)
+        self._boxes.append(box)
+        self._ids.append(box.node.name)
+        self._mask |= 1 << index
+        if box._toggle:
+            self._bits |= 1 << index
+        if box._is_visible:
+            self._visible.add(index)
+        box._group = self
+        box._index = index
+        return index
+
+    def _set_visible(self, index: int, is_visible: bool) -> None:
+        if is_visible:
+            self._visible.add(index)
+        else:
+            self._visible.discard(index)
+
+    def assign(self, bits: int) -> int:
+        """Sets the state of every member from a bitset. The visible members whose state changed are redrawn, then
+            the change callbacks are called once.
+
+        Returns:
+            The bitset of the members whose state changed.
+        """
+        bits &= self._mask
+        changed = bits ^ self._bits
+        if not changed:
+            return 0
+        self._bits = bits
+
+        # The visible members are few compared to the changed ones after a bulk operation: they are checked first.
+        # Those drawn by their last render may have been hidden since, with one of their parents.
+        boxes = self._boxes
+        for index in sorted(self._visible):
+            if changed >> index & 1 and boxes[index].is_visible:
+                boxes[index].render()
+
+        for callback in self._callbacks:
+            callback(changed)
+        return changed
+
+    def set(self, index: int, toggle: bool) -> int:
+        """Checks or unchecks the member of the given index."""
+        if toggle:
+            return self.assign(self._bits | 1 << index)
+        return self.assign(self._bits & ~(1 << index))
+
+    def select_all(self) -> int:
+        return self.assign(self._mask)
+
+    def clear(self) -> int:
+        return self.assign(0)
+
+    def invert(self) -> int:
+        return self.assign(self._bits ^ self._mask)
+
+    def mask(self, condition: Callable[[Checkbox], bool]) -> int:
+        """Returns the bitset of the members for which the condition is true, e.g.
+            group.mask(lambda box: "error" in box.text), to be combined with value by the bitwise operators."""
+        # The string of the bits, most significant first, is converted to an integer in a single call.
+        flags = ["1" if condition(box) else "0" for box in reversed(self._boxes)]
+        return int("".join(flags), 2) if flags else 0
+
+    def select_where(self, condition: Callable[[Checkbox], bool], toggle: bool = True) -> int:
+        """Checks (or unchecks) the members for which the condition is true, leaving the others as they are."""
+        if toggle:
+            return self.assign(self._bits | self.mask(condition))
+        return self.assign(self._bits & ~self.mask(condition))
+
+    def select_ids(self, box_ids: Iterable[str], toggle: bool = True) -> int:
+        """Checks (or unchecks) the members with the given ids."""
+        wanted = set(box_ids)
+        flags = ["1" if box_id in wanted else "0" for box_id in reversed(self._ids)]
+        bits = int("".join(flags), 2) if flags else 0
+        return self.assign(self._bits | bits if toggle else self._bits & ~bits)
+
+    def count(self) -> int:
+        """The number of checked members."""
+        return bin(self._bits).count("1")
+
+    def selected(self) -> List[Checkbox]:
+        """The checked members, by index."""
+        return list(compress(self._boxes, self._flags()))
+
+    def selected_ids(self) -> List[str]:
+        """The ids of the checked members, by index."""
+        return list(compress(self._ids, self._flags()))
+
+    def _flags(self) -> bytes:
+        # One byte per member, least significant bit first, 1 when it is checked.
+        return bin(self._bits)[:1:-1].encode().translate(_BITS) if self._bits else b""
+
+    def on_change(self, callback: Callable[[int], None]) -> Callable:
+        """Registers a function called with the bitset of the members whose state changed, once per operation. It
+            returns the function, so that it can be used as a decorator."""
+        self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: Callable) -> None:
+        self._callbacks.remove(callback)
@@ -44,6 +44,7 @@ class _AbsolutePosition(IPositionConstraint):
             value (int): The absolute position to impose to the element.
 
     """
+    __slots__ = ("value",)
 
     def __init__(self, value: int):
         self.value: int = value
@@ -98,6 +99,7 @@ class _RelativePosition(IPositionConstraint):
             Value must be comprised between 0 and 1.
 
     """
+    __slots__ = ("value",)
 
     def __init__(self, value: float):
         if 0 <= value <= 1:
@@ -136,6 +138,7 @@ class _RelativePosition(IPositionConstraint):
 
 class _CenteredPosition(IPositionConstraint):
     """ This constraint center the GUI element at the middle of its parent."""
+    __slots__ = ()
 
     def impose(self, direction: str, h: int, w: int, max_y: int, max_x: int) -> int:
         """Called when trying to impose the position constraint.
@@ -174,6 +177,7 @@ class _AbsoluteSize(ISizeConstraint):
             value (int): The absolute size to impose to the element.
 
     """
+    __slots__ = ("value",)
 
     def __init__(self, value: int):
         self.value: int = value
@@ -226,6 +230,7 @@ class _RelativeSize(ISizeConstraint):
             Value must be comprised between 0 and 1.
 
     """
+    __slots__ = ("value",)
 
     def __init__(self, value: float):
         if 0 <= value <= 1:
@@ -3,12 +3,105 @@
 
 # allows the definition of interfaces
 from abc import abstractmethod
-from typing import Tuple
+from typing import Dict, List, Tuple, Union
 
 import curses
+import os
+import selectors
+import sys
 from _window_manager import IWindow, WindowManager
+from _self_pipe import SelfPipe
 from gui_elements import TextStyles
-from math import log2
+from text_width import truncate
+from operator import or_
+from collections import OrderedDict
+from functools import lru_cache
+
+
+# RGB values of the 16 basic colors of xterm, the first entries of its 256-color palette.
+_BASIC_RGB = [
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255),
+    (255, 255, 255),
+]
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+# The curses colors of the color flags, the last one applied first: it is the one shown when several are set.
+_FLAG_COLORS = (
+    (TextStyles.CYAN, curses.COLOR_CYAN), (TextStyles.MAGENTA, curses.COLOR_MAGENTA),
+    (TextStyles.BLUE, curses.COLOR_BLUE), (TextStyles.YELLOW, curses.COLOR_YELLOW),
+    (TextStyles.GREEN, curses.COLOR_GREEN), (TextStyles.RED, curses.COLOR_RED),
+)
+_COLOR_FLAGS = sum(flag for flag, _ in _FLAG_COLORS)
+
+
+def _palette_rgb(index: int) -> Tuple[int, int, int]:
+    """RGB value of an entry of the xterm 256-color palette: 16 basic colors, a 6x6x6 cube and 24 grays."""
+    if index < 16:
+        return _BASIC_RGB[index]
+    if index < 232:
+        index -= 16
+        return _CUBE_LEVELS[index // 36], _CUBE_LEVELS[index // 6 % 6], _CUBE_LEVELS[index % 6]
+    gray = 8 + 10 * (index - 232)
+    return gray, gray, gray
+
+
+@lru_cache(maxsize=4096)
+def _curses_color(color: Union[None, int, Tuple[int, int, int]], colors: int) -> int:
+    """Converts a color decoded by TextStyles.colors() to a curses color number, -1 being the default color.
+        Colors outside of the first `colors` entries of the palette are replaced by the closest one."""
+    if color is None:
+        return -1
+    if isinstance(color, int):
+        if color < colors:
+            return color
+        color = _palette_rgb(color)
+    candidates = range(min(colors, 256))
+    return min(candidates, key=lambda index: sum((a - b) ** 2 for a, b in zip(_palette_rgb(index), color)))
+
+
+class _ColorPairs(object):
+    """Allocates curses color pairs on demand for (foreground, background) combinations.
+        When all the pairs are in use, the least recently used one is redefined. Lookups and evictions are O(1).
+
+        Attributes:
+            first (int): The first pair number managed by the allocator, the lower ones are left untouched.
+            last (int): The last pair number managed by the allocator.
+            fallback (Dict[int, int]): The pair used for each foreground color when the allocator manages no pair at
+                                       all, e.g. on a terminal with 8 pairs. Pair 0, the default colors, otherwise.
+            evictions (int): The number of pairs redefined so far.
+
+        Note:
+            Redefining a pair also changes the colors of the text already on screen with that pair, until it is
+            redrawn. Eviction only happens when more combinations are used than the terminal supports.
+    """
+    def __init__(self, first: int, last: int, fallback: Dict[int, int] = None):
+        self.first: int = first
+        self.last: int = last
+        self.fallback: Dict[int, int] = fallback if fallback is not None else {}
+        self.evictions: int = 0
+        self._pairs: OrderedDict = OrderedDict()
+        self._free: List[int] = list(range(last, first - 1, -1))
+
+    def attr(self, fg: int, bg: int) -> int:
+        """Returns the curses attribute of the pair of colors, allocating the pair if needed."""
+        key = (fg, bg)
+        pair = self._pairs.get(key)
+        if pair is not None:
+            self._pairs.move_to_end(key)
+            return curses.color_pair(pair)
+
+        if self._free:
+            pair = self._free.pop()
+        elif not self._pairs:
+            # No pair to allocate nor to evict: the colors are approximated by a pair defined beforehand.
+            return curses.color_pair(self.fallback.get(fg, 0))
+        else:
+            _, pair = self._pairs.popitem(last=False)
+            self.evictions += 1
+        curses.init_pair(pair, fg, bg)
+        self._pairs[key] = pair
+        return curses.color_pair(pair)
 
 
 class _CursesWindow(IWindow):
@@ -24,6 +117,15 @@ class _CursesWindow(IWindow):
     def __init__(self, screen):
         self.screen = screen
 
+        # As for the blessed backend, get_input() waits on the keyboard and on a self-pipe written by a SIGWINCH
+        # handler. It replaces the handler of curses, the terminal is resized by _resize() instead.
+        self._keyboard_fd: int = sys.stdin.fileno()
+        self._pipe: SelfPipe = SelfPipe()
+        self._watch_resize: bool = self._pipe.watch_resize()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._keyboard_fd, selectors.EVENT_READ)
+        self._selector.register(self._pipe, selectors.EVENT_READ)
+
         # Perform initialisation on the curses window
         curses.curs_set(0)
         curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
@@ -33,8 +135,78 @@ class _CursesWindow(IWindow):
         curses.init_pair(5, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
         curses.init_pair(6, curses.COLOR_CYAN, curses.COLOR_BLACK)
 
-    def get_input(self) -> int:
-        return self.screen.getch()
+        # Curses attribute of every combination of TextStyles flags.
+        self._styles = TextStyles.compile({
+            TextStyles.HIGHLIGHTED: curses.A_STANDOUT,
+            TextStyles.UNDERLINE: curses.A_UNDERLINE,
+            TextStyles.BOLD: curses.A_BOLD,
+            TextStyles.RED: curses.color_pair(1),
+            TextStyles.GREEN: curses.color_pair(2),
+            TextStyles.YELLOW: curses.color_pair(3),
+            TextStyles.BLUE: curses.color_pair(4),
+            TextStyles.MAGENTA: curses.color_pair(5),
+            TextStyles.CYAN: curses.color_pair(6),
+        }, or_, 0)
+
+        # The pairs of the fg()/bg() colors of TextStyles are allocated on demand, after the six pairs above.
+        # The pair number is stored in the 8 bits of curses.A_COLOR: whatever COLOR_PAIRS, at most 255 are usable.
+        try:
+            curses.use_default_colors()
+            self._default_colors: Tuple[int, int] = (-1, -1)
+        except curses.error:
+            self._default_colors = (curses.COLOR_WHITE, curses.COLOR_BLACK)
+        self._colors: int = max(curses.COLORS, 8)
+        # Without any pair left after them, the colors fall back to the pairs of the color flags.
+        self._pairs: _ColorPairs = _ColorPairs(7, min(curses.COLOR_PAIRS, 256) - 1, {
+            curses.COLOR_RED: 1, curses.COLOR_GREEN: 2, curses.COLOR_YELLOW: 3,
+            curses.COLOR_BLUE: 4, curses.COLOR_MAGENTA: 5, curses.COLOR_CYAN: 6,
+        })
+        # The (foreground, background) curses colors of each encoded pair of TextStyles colors met so far, with the
+        # color flags set along with them.
+        self._color_keys: Dict[int, Tuple[int, int]] = {}
+
+    def get_input(self, timeout: float = None) -> Union[None, int]:
+        """Waits for the next key or terminal resize.
+
+        Parameters:
+            timeout (float): (Optional) Maximum time to wait in seconds. It blocks until an event by default.
+
+        Returns:
+            The code of the pressed key, curses.KEY_RESIZE after a resize, or None on timeout.
+        """
+        if not self._watch_resize:
+            # curses still handles SIGWINCH itself, getch() must be the one waiting. Wakeups are only noticed at the
+            # next key.
+            self.screen.timeout(-1 if timeout is None else int(timeout * 1000))
+            key = self.screen.getch()
+            return None if key == -1 else key
+
+        # Keys already received (e.g. the rest of a paste) are returned before waiting.
+        self.screen.timeout(0)
+        key = self.screen.getch()
+        if key != -1:
+            return key
+
+        for selected, _ in self._selector.select(timeout):
+            if selected.fileobj is self._pipe and SelfPipe.RESIZE in self._pipe.drain():
+                self._resize()
+                return curses.KEY_RESIZE
+
+        key = self.screen.getch()
+        return None if key == -1 else key
+
+    def wakeup(self) -> None:
+        self._pipe.notify(SelfPipe.WAKEUP)
+
+    def input_fds(self) -> List[int]:
+        return [self._keyboard_fd, self._pipe.fileno()]
+
+    def _resize(self) -> None:
+        size = os.get_terminal_size(sys.__stdout__.fileno())
+        curses.resizeterm(size.lines, size.columns)
+
+    def is_resize(self, key: int) -> bool:
+        return key == curses.KEY_RESIZE
 
     def draw(self, y_pos: int, x_pos: int, text: str, attr=0) -> None:
         """Draw a string of text at a given (relative) position.
@@ -50,31 +222,27 @@ class _CursesWindow(IWindow):
         max_len = max_x - x_pos
 
         if max_len > 0 and x_pos < max_x and y_pos < max_y:
-            if len(text) > max_len:
-                text = text[:max_len]
-
-            # A bitmask is used to set multiple concurrent text styles:
-            mask = 0
-            if (attr & TextStyles.HIGHLIGHTED) >> int(log2(TextStyles.HIGHLIGHTED)):
-                mask = mask | curses.A_STANDOUT
-            if (attr & TextStyles.UNDERLINE) >> int(log2(TextStyles.UNDERLINE)):
-                mask = mask | curses.A_UNDERLINE
-            if (attr & TextStyles.BOLD) >> int(log2(TextStyles.BOLD)):
-                mask = mask | curses.A_BOLD
-            if (attr & TextStyles.RED) >> int(log2(TextStyles.RED)):
-                mask = mask | curses.color_pair(1)
-            if (attr & TextStyles.GREEN) >> int(log2(TextStyles.GREEN)):
-                mask = mask | curses.color_pair(2)
-            if (attr & TextStyles.YELLOW) >> int(log2(TextStyles.YELLOW)):
-                mask = mask | curses.color_pair(3)
-            if (attr & TextStyles.BLUE) >> int(log2(TextStyles.BLUE)):
-                mask = mask | curses.color_pair(4)
-            if (attr & TextStyles.MAGENTA) >> int(log2(TextStyles.MAGENTA)):
-                mask = mask | curses.color_pair(5)
-            if (attr & TextStyles.CYAN) >> int(log2(TextStyles.CYAN)):
-                mask = mask | curses.color_pair(6)
-
-            return self.screen.addstr(y_pos, x_pos, text, mask)
+            if len(text) > max_len or not text.isascii():
+                text = truncate(text, max_len)
+
+            # A bitmask is used to set multiple concurrent text styles, its curses attribute is precompiled.
+            style = self._styles[attr & (TextStyles.COMBINATIONS - 1)]
+            if attr >> TextStyles.COLOR_SHIFT:
+                style = (style & ~curses.A_COLOR) | self._color_attr(attr)
+            return self.screen.addstr(y_pos, x_pos, text, style)
+
+    def _color_attr(self, attr: int) -> int:
+        colors = attr & ~(TextStyles.COMBINATIONS - 1 - _COLOR_FLAGS)
+        key = self._color_keys.get(colors)
+        if key is None:
+            fg, bg = (_curses_color(color, self._colors) for color in TextStyles.colors(attr))
+            default_fg, default_bg = self._default_colors
+            if fg < 0:
+                # Without fg(), the foreground is the one of the color flag, as with blessed.
+                fg = next((color for flag, color in _FLAG_COLORS if attr & flag), default_fg)
+            key = (fg, default_bg if bg < 0 else bg)
+            self._color_keys[colors] = key
+        return self._pairs.attr(*key)
 
     def draw_rectangle(self, uly: int, ulx: int, lry: int, lrx: int) -> None:
         """Draw a rectangle with corners at the provided upper-left and lower-right coordinates.
@@ -105,6 +273,9 @@ class _CursesWindow(IWindow):
     def clear(self) -> None:
         return self.screen.clear()
 
+    def flush(self) -> None:
+        return self.screen.refresh()
+
     def erase(self) -> None:
         return self.screen.erase()
 
@@ -129,3 +300,17 @@ class CursesApp(WindowManager):
             self.main()
 
         curses.wrapper(set_screen)
+
+    def run_async(self):
+        """Runs the application on an asyncio event loop instead of main(). Keys are handled by on_key()."""
+        # Imported here: the synchronous run mode does not pay for it.
+        import asyncio
+
+        def set_screen(screen):
+            self.window = _CursesWindow(screen)
+            self.design()
+            self.render()
+            self.reset_active()
+            asyncio.run(self.serve())
+
+        curses.wrapper(set_screen)
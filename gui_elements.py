@@ -3,7 +3,7 @@
 
 # Imports used for type hints
 from __future__ import annotations
-from typing import Tuple, List, Union
+from typing import Any, Callable, Dict, Tuple, List, Union
 
 # Allows the definition of interfaces
 from abc import ABC, abstractmethod
@@ -11,6 +11,8 @@ from abc import ABC, abstractmethod
 # Import needed by ElementTreeManager
 from _tree import Node, Tree
 
+from text_width import truncate
+
 
 class TextStyles(object):
     # Flags for drawing options
@@ -24,6 +26,82 @@ class TextStyles(object):
     MAGENTA = 256
     CYAN = 512
 
+    # All the flags, in the order the backends apply them.
+    FLAGS = (HIGHLIGHTED, UNDERLINE, BOLD, RED, GREEN, YELLOW, BLUE, MAGENTA, CYAN)
+    # Any combination of flags is lower than this value, it is the size of the compiled style tables.
+    COMBINATIONS = CYAN << 1
+
+    # Foreground and background colors are encoded above the flags, in two fields of COLOR_BITS bits each. A field
+    # holds 0 for the default color, a palette index + 1, or RGB_COLOR | 0xRRGGBB for a true color.
+    COLOR_SHIFT = COMBINATIONS.bit_length() - 1
+    COLOR_BITS = 25
+    RGB_COLOR = 1 << 24
+    _COLOR_MASK = (1 << COLOR_BITS) - 1
+
+    @staticmethod
+    def _encode_color(color: Union[int, Tuple[int, int, int]]) -> int:
+        if isinstance(color, tuple):
+            r, g, b = color
+            return TextStyles.RGB_COLOR | (r & 255) << 16 | (g & 255) << 8 | (b & 255)
+        if not 0 <= color < 256:
+            raise ValueError("Palette colors range from 0 to 255, got {}".format(color))
+        return color + 1
+
+    @staticmethod
+    def _decode_color(field: int) -> Union[None, int, Tuple[int, int, int]]:
+        if not field:
+            return None
+        if field & TextStyles.RGB_COLOR:
+            return (field >> 16) & 255, (field >> 8) & 255, field & 255
+        return field - 1
+
+    @staticmethod
+    def fg(color: Union[int, Tuple[int, int, int]]) -> int:
+        """Returns the style bits of a foreground color, to be combined with the flags, e.g.
+            TextStyles.BOLD | TextStyles.fg(208) | TextStyles.bg((0, 0, 64)).
+            It takes precedence over the color flags (RED, GREEN...).
+
+        Parameters:
+            color: Either an index of the 256-color palette, or a (red, green, blue) tuple of values from 0 to 255.
+                   Backends unable to display it use the closest color available.
+        """
+        return TextStyles._encode_color(color) << TextStyles.COLOR_SHIFT
+
+    @staticmethod
+    def bg(color: Union[int, Tuple[int, int, int]]) -> int:
+        """Returns the style bits of a background color. See fg()."""
+        return TextStyles._encode_color(color) << (TextStyles.COLOR_SHIFT + TextStyles.COLOR_BITS)
+
+    @staticmethod
+    def colors(attr: int) -> Tuple[Union[None, int, Tuple[int, int, int]], Union[None, int, Tuple[int, int, int]]]:
+        """Decodes the (foreground, background) colors of a style. Each one is None when not set, a palette index or
+            a (red, green, blue) tuple."""
+        colors = attr >> TextStyles.COLOR_SHIFT
+        return (TextStyles._decode_color(colors & TextStyles._COLOR_MASK),
+                TextStyles._decode_color(colors >> TextStyles.COLOR_BITS))
+
+    @staticmethod
+    def compile(styles: Dict[int, Any], combine: Callable[[Any, Any], Any], empty: Any) -> List[Any]:
+        """Precomputes the backend representation of every combination of flags, so that styling a text becomes a
+            single lookup: table[attr & (TextStyles.COMBINATIONS - 1)].
+
+        Parameters:
+            styles (Dict[int, Any]): The backend representation of each flag.
+            combine (Callable): Adds the representation of a flag (second argument) to an accumulated value (first).
+            empty (Any): The representation of unstyled text.
+
+        Returns:
+            The table of the COMBINATIONS representations, indexed by attr.
+        """
+        table = []
+        for attr in range(TextStyles.COMBINATIONS):
+            value = empty
+            for flag in TextStyles.FLAGS:
+                if attr & flag:
+                    value = combine(value, styles[flag])
+            table.append(value)
+        return table
+
 
 class CannotDrawError(Exception):
     """Error to throw when a constraint cannot be satisfied."""
@@ -32,11 +110,13 @@ class CannotDrawError(Exception):
 
 class IConstraint(ABC):
     """Interface to the constraints that can be imposed to a GUI Element."""
-    pass
+    __slots__ = ()
 
 
 class IPositionConstraint(IConstraint):
     """Interface to the constraints that can be imposed to the position of GUI Element."""
+    __slots__ = ()
+
     @abstractmethod
     def impose(self, direction: str, h: int, w: int, max_y: int, max_x: int) -> int:
         """Called when trying to impose the position constraint.
@@ -55,6 +135,8 @@ class IPositionConstraint(IConstraint):
 
 
 class ISizeConstraint(IConstraint):
+    __slots__ = ()
+
     @abstractmethod
     def impose(self, direction: str, min_h: int, min_w: int, max_y: int, max_x: int):
         """Called when trying to impose the size constraint.
@@ -73,6 +155,9 @@ class ISizeConstraint(IConstraint):
 
 
 class ICanvas(ABC):
+    # Empty slots, so that the elements deriving from it can do without a per-instance dict.
+    __slots__ = ()
+
     @abstractmethod
     def get_max_yx(self):
         """Compute and returns the boundaries for x and y positions."""
@@ -116,7 +201,27 @@ class GuiElement(ICanvas):
             w_constraint (ISizeConstraint): Constraint for the width of the element.
             is_active (bool): Internal state of the element. Useful to allow actions on it.
                               Can modify the appearance on screen of the element.
+            shown (bool): Set to False to hide the element and its children. They are skipped by the renders and by
+                          the focus traversal, and disappear from the screen at the next render of the window.
+            is_visible (bool): True when the element and all its parents are shown and could be drawn by their last
+                               render. Setting it records the outcome of the render of the element itself.
+
+        Note:
+            Applications create many elements: their attributes are kept in slots, which take less memory than a
+            per-instance dict and are faster to access. A subclass declares its own attributes in __slots__ too, or
+            its instances get a dict back.
+
+            Hiding or showing an element does not walk its subtree: the effective visibility of each element is
+            computed when it is read, then cached until the local visibility of any element changes.
     """
+    __slots__ = ("_node", "_x_constraint", "_y_constraint", "_w_constraint", "_h_constraint", "is_active",
+                 "_is_visible", "_shown", "_visible", "_is_shown", "_visibility_generation", "_start_drawing_x",
+                 "_start_drawing_y", "min_h", "min_w", "max_h", "max_w")
+
+    # Incremented whenever the local visibility of an element changes. The effective visibility cached by an element is
+    # only valid for the generation it was computed in.
+    _generation: int = 0
+
     def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
                  h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, element_id: str, min_h: int = 0,
                  min_w: int = 0, max_h: int = -1, max_w: int = -1):
@@ -132,6 +237,10 @@ class GuiElement(ICanvas):
 
         self.is_active: bool = False
         self._is_visible: bool = False
+        self._shown: bool = True
+        self._visible: bool = False
+        self._is_shown: bool = True
+        self._visibility_generation: int = -1
 
         self._start_drawing_x = 0
         self._start_drawing_y = 0
@@ -142,13 +251,59 @@ class GuiElement(ICanvas):
         self.max_h = max_h
         self.max_w = max_w
 
+    def __setstate__(self, state: Union[Dict, Tuple[Dict, Dict]]) -> None:
+        # The effective visibility cached when the element was saved (e.g. in a layout cache) is computed again.
+        attributes, slots = state if isinstance(state, tuple) else (state, None)
+        for mapping in (attributes, slots):
+            for name, value in (mapping or {}).items():
+                setattr(self, name, value)
+        self._visibility_generation = -1
+
+    def _update_visibility(self) -> None:
+        parent = self._node.parent
+        payload = None if parent is None else parent.payload
+        if isinstance(payload, GuiElement):
+            self._is_shown = self._shown and payload.is_shown
+            self._visible = self._is_shown and self._is_visible and payload.is_visible
+        else:
+            self._is_shown = self._shown
+            self._visible = self._shown and self._is_visible
+        self._visibility_generation = GuiElement._generation
+
+    @property
+    def shown(self) -> bool:
+        return self._shown
+
+    @shown.setter
+    def shown(self, shown: bool) -> None:
+        if shown != self._shown:
+            self._shown = shown
+            GuiElement._generation += 1
+
+    def hide(self) -> None:
+        self.shown = False
+
+    def show(self) -> None:
+        self.shown = True
+
+    @property
+    def is_shown(self) -> bool:
+        """True when the element and all its parents are shown, whether they could be drawn or not."""
+        if self._visibility_generation != GuiElement._generation:
+            self._update_visibility()
+        return self._is_shown
+
     @property
     def is_visible(self) -> bool:
-        return self._is_visible
+        if self._visibility_generation != GuiElement._generation:
+            self._update_visibility()
+        return self._visible
 
     @is_visible.setter
     def is_visible(self, is_visible) -> None:
-        self._is_visible = is_visible
+        if is_visible != self._is_visible:
+            self._is_visible = is_visible
+            GuiElement._generation += 1
 
     # The use of @property allows to hide the existence of the node.
     @property
@@ -203,8 +358,9 @@ class GuiElement(ICanvas):
         y = y_pos + self._start_drawing_y + self.y
         max_size = self.get_max_yx()[1] - x_pos
 
-        if len(text) > max_size:
-            text = text[:max_size]
+        # Inlined ASCII fast path of truncate(), as draw() is called for every piece of text.
+        if len(text) > max_size or not text.isascii():
+            text = truncate(text, max_size)
 
         self.parent.draw(y, x, text, attr)
 
@@ -219,10 +375,18 @@ class GuiElement(ICanvas):
             It should use the draw method."""
         pass
 
-    def interact(self, value: int = 0) -> None:
+    def interact(self, value: Union[int, str] = 0) -> None:
+        """Reacts to the user. The value is the input that triggered it, e.g. the key typed into a text element (see
+            text_input.py): a key code or a character, depending on the backend."""
         pass
 
 
+def _is_hidden(node: Node) -> bool:
+    # The subtrees of the hidden elements are skipped by the focus traversal.
+    payload = node.payload
+    return isinstance(payload, GuiElement) and not payload.shown
+
+
 class ElementTreeManager(object):
     """Manage a tree made of panels.
         Based the concept of active element, it can step trough all the leaves of the tree to activate them.
@@ -237,13 +401,23 @@ class ElementTreeManager(object):
 
     """
     def __init__(self, canvas: ICanvas):
-        self._tree: Tree = Tree("Manager", canvas)
+        self._tree: Tree = Tree("Manager", canvas, skip=_is_hidden)
         self._canvas: ICanvas = canvas
 
     @property
     def tree(self):
         return self._tree
 
+    @property
+    def canvas(self) -> ICanvas:
+        return self._canvas
+
+    @canvas.setter
+    def canvas(self, canvas: ICanvas) -> None:
+        """Replaces the canvas the elements draw on, keeping the tree and the active element."""
+        self._canvas = canvas
+        self._tree.root.payload = canvas
+
     def get_elements(self) -> List[GuiElement]:
         return [child.payload for child in self.tree.root]
 
@@ -265,16 +439,16 @@ class ElementTreeManager(object):
         self.get_current().is_active = False
         self.tree.reset_current()
 
-        if self.get_current().is_visible:
+        if self._current_is_visible():
             self.get_current().is_active = True
             return self.get_current()
 
         for n in range(len(self.tree.leaves) - 1):
             self.tree.set_next()
-            if self.get_current().is_visible:
+            if self._current_is_visible():
                 break
 
-        if self.get_current().is_visible:
+        if self._current_is_visible():
             self.get_current().is_active = True
             return self.get_current()
         else:
@@ -283,6 +457,25 @@ class ElementTreeManager(object):
     def get_current(self) -> GuiElement:
         return self.tree.current.payload
 
+    def _current_is_visible(self) -> bool:
+        # When every element is hidden, the current node is the root: its payload is the canvas.
+        current = self.tree.current.payload
+        return isinstance(current, GuiElement) and current.is_visible
+
+    def activate(self, element: GuiElement) -> bool:
+        """" This method deactivate the current active element and activate the given one, if it is a visible leaf
+             of the tree.
+
+             Returns:
+                 True if the element is now the active one.
+        """
+        old = self.get_current()
+        if not element.is_visible or not self.tree.set_current(element.node):
+            return False
+        old.is_active = False
+        element.is_active = True
+        return True
+
     def activate_next(self) -> Union[None, GuiElement]:
         """" This method deactivate the current active element and activate the element contained
              in the next leaf.
@@ -293,16 +486,16 @@ class ElementTreeManager(object):
         self.get_current().is_active = False
         self.tree.set_next()
 
-        if self.get_current().is_visible:
+        if self._current_is_visible():
             self.get_current().is_active = True
             return self.get_current()
 
         for n in range(len(self.tree.leaves) - 1):
             self.tree.set_next()
-            if self.get_current().is_visible:
+            if self._current_is_visible():
                 break
 
-        if self.get_current().is_visible:
+        if self._current_is_visible():
             self.get_current().is_active = True
             return self.get_current()
         else:
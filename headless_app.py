@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# allows the definition of interfaces
+from abc import abstractmethod
+from collections import deque
+from typing import Any, Callable, Deque, List, Tuple
+
+import select
+
+from _window_manager import IWindow, WindowManager, KEY_RESIZE
+from _self_pipe import SelfPipe
+from cell_buffer import CellBuffer
+
+
+class _HeadlessWindow(IWindow):
+    """ Implements the IWindow interface on top of an in-memory cell buffer. Nothing is written to the terminal.
+        Inputs are taken from a queue filled through the feed() method, possibly from another thread.
+
+        Attributes:
+            h (int): The number of rows of the virtual screen.
+            w (int): The number of columns of the virtual screen.
+            flush_listeners (List[Callable]): Called without arguments by flush(), i.e. once a frame is complete.
+
+        Note:
+            it is meant for benchmarks, recordings and any environment without a terminal.
+
+    """
+    def __init__(self, h: int = 24, w: int = 80):
+        self.buffer: CellBuffer = CellBuffer(h, w)
+        self._inputs: Deque[Any] = deque()
+        # Readable whenever inputs are queued, for the asynchronous run mode.
+        self._pipe: SelfPipe = SelfPipe()
+        self.flush_listeners: List[Callable[[], None]] = []
+
+    def feed(self, *keys: Any) -> None:
+        """Queues keys to be returned by the next calls of get_input()."""
+        self._inputs.extend(keys)
+        self._pipe.notify()
+
+    def resize(self, h: int, w: int) -> None:
+        """Changes the size of the virtual screen and queues a KEY_RESIZE input, as a terminal would."""
+        self.buffer.resize(h, w)
+        self._inputs.append(KEY_RESIZE)
+        self._pipe.notify()
+
+    def get_input(self, timeout: float = None) -> Any:
+        # The queue can be filled by another thread: the pipe is notified after each feed() or wakeup().
+        if not self._inputs:
+            select.select([self._pipe], [], [], timeout)
+            self._pipe.drain()
+        if self._inputs:
+            return self._inputs.popleft()
+        return None
+
+    def wakeup(self) -> None:
+        self._pipe.notify()
+
+    def input_fds(self) -> List[int]:
+        return [self._pipe.fileno()]
+
+    def draw(self, y_pos: int, x_pos: int, text: str, attr=0) -> None:
+        """Draw a string of text at a given (relative) position.
+
+        Parameters:
+            y_pos (int): The relative y position to start drawing the text.
+            x_pos (int): The relative x position to start drawing the text.
+            text (str): The text to draw.
+            attr: Optional parameters to specify text styles.
+        """
+        self.buffer.draw(y_pos, x_pos, text, attr)
+
+    def draw_rectangle(self, uly: int, ulx: int, lry: int, lrx: int) -> None:
+        """Draw a rectangle with corners at the provided upper-left and lower-right coordinates.
+
+        Parameters:
+            uly: y position of the Upper-Left corner of the rectangle
+            ulx: x position of the Upper-Left corner of the rectangle
+            lry: y position of the Lower-Right corner of the rectangle
+            lrx: x position of the Lower-Right corner of the rectangle
+
+        """
+        self.buffer.draw_rectangle(uly, ulx, lry, lrx)
+
+    def get_max_yx(self) -> Tuple[int, int]:
+        return self.buffer.get_max_yx()
+
+    def delete(self, y_pos: int, x_pos: int) -> None:
+        self.buffer.draw(y_pos, x_pos, self.buffer.fill)
+
+    def clear(self) -> None:
+        self.buffer.clear()
+
+    def flush(self) -> None:
+        for listener in self.flush_listeners:
+            listener()
+
+
+class HeadlessApp(WindowManager):
+    def __init__(self, h: int = 24, w: int = 80):
+        super().__init__()
+        self.window: _HeadlessWindow = _HeadlessWindow(h, w)
+
+    @abstractmethod
+    def design(self):
+        pass
+
+    @abstractmethod
+    def main(self):
+        pass
+
+    def run(self):
+        self.design()
+        self.render()
+        self.reset_active()
+        self.main()
+
+    def run_async(self):
+        """Runs the application on an asyncio event loop instead of main(). Keys are handled by on_key()."""
+        # Imported here: the synchronous run mode does not pay for it.
+        import asyncio
+
+        self.design()
+        self.render()
+        self.reset_active()
+        asyncio.run(self.serve())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+
+# Allows the definition of interfaces
+from abc import ABC, abstractmethod
+
+from functools import wraps
+from time import perf_counter
+
+from gui_elements import IConstraint, ICanvas, GuiElement, CannotDrawError
+from constraints import position_constraint, size_constraint
+from panels import Panel
+
+
+class ISpanSink(ABC):
+    """Interface of the objects receiving the calls measured by the instrumentation hooks."""
+    @abstractmethod
+    def span(self, kind: str, target: Any, args: Tuple, start: float, end: float) -> None:
+        """Called after each instrumented call returned (or raised).
+
+        Parameters:
+            kind (str): The hooked method: "impose", "get_max_yx", "draw", "draw_rectangle", "render" or "interact".
+            target (Any): The object whose method has been called.
+            args (Tuple): The positional arguments of the call.
+            start (float): perf_counter() value when the call started.
+            end (float): perf_counter() value when the call ended.
+        """
+        pass
+
+
+def _hooked_methods() -> List[Tuple[type, str, str]]:
+    """Lists the (base class, method name, kind) triplets instrumented by the hooks."""
+    # Imported here as the window manager itself depends on this module.
+    from _window_manager import IWindow
+    return [
+        (IConstraint, "impose", "impose"),
+        (ICanvas, "get_max_yx", "get_max_yx"),
+        (IWindow, "draw", "draw"),
+        (IWindow, "draw_rectangle", "draw_rectangle"),
+        (GuiElement, "render", "render"),
+        (GuiElement, "interact", "interact"),
+    ]
+
+
+# The sinks currently listening and the original methods replaced by the hooks.
+# Hooks are only installed while at least one sink is registered: when disabled, there is no overhead at all.
+_sinks: List[ISpanSink] = []
+_originals: List[Tuple[type, str, Callable]] = []
+
+
+def _subclasses(cls: type) -> List[type]:
+    found = [cls]
+    for sub in cls.__subclasses__():
+        found.extend(s for s in _subclasses(sub) if s not in found)
+    return found
+
+
+def _wrap(method: Callable, kind: str) -> Callable:
+    @wraps(method)
+    def hook(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            end = perf_counter()
+            for sink in _sinks:
+                sink.span(kind, self, args, start, end)
+    return hook
+
+
+def _install() -> None:
+    for base, name, kind in _hooked_methods():
+        for cls in _subclasses(base):
+            method = cls.__dict__.get(name)
+            if method is None or getattr(method, "__isabstractmethod__", False):
+                continue
+            # A window wrapping another one forwards the calls: they would be counted twice.
+            if getattr(cls, "wraps_window", False):
+                continue
+            _originals.append((cls, name, method))
+            setattr(cls, name, _wrap(method, kind))
+
+
+def _uninstall() -> None:
+    while _originals:
+        cls, name, method = _originals.pop()
+        setattr(cls, name, method)
+
+
+def add_sink(sink: ISpanSink) -> None:
+    """Registers a sink. The hooks are installed when the first sink is registered.
+
+    Note:
+        Only the classes already defined when the hooks are installed are instrumented.
+    """
+    if sink not in _sinks:
+        if not _sinks:
+            _install()
+        _sinks.append(sink)
+
+
+def remove_sink(sink: ISpanSink) -> None:
+    """Unregisters a sink. The original methods are restored when the last sink is removed."""
+    if sink in _sinks:
+        _sinks.remove(sink)
+        if not _sinks:
+            _uninstall()
+
+
+def _payload_bytes(kind: str, args: Tuple) -> int:
+    """Computes the bytes of text sent to the terminal by a backend draw call (escape sequences excluded)."""
+    if kind == "draw":
+        return len(args[2].encode("utf-8"))
+    uly, ulx, lry, lrx = args[:4]
+    if uly == lry or ulx == lrx:
+        return 0
+    # Box-drawing characters take 3 bytes in UTF-8.
+    return 3 * (2 * (lrx - ulx + 1) + 2 * (lry - uly - 1))
+
+
+class RenderStats(ISpanSink):
+    """Collects counters and render timings from the instrumentation hooks.
+
+        Attributes:
+            counters (Dict[str, int]): Number of calls of impose, get_max_yx, draw and draw_rectangle, the bytes of
+                                       text written by the backends and the frames rendered by the window manager.
+            render_times (Dict[str, List]): For each element id, the number of render() calls and their total time in
+                                            seconds. Times are inclusive of the children rendered by a panel.
+    """
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.render_times: Dict[str, List] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters = {"frames": 0, "impose": 0, "get_max_yx": 0, "draw": 0, "draw_rectangle": 0, "bytes": 0}
+        self.render_times = {}
+
+    def span(self, kind: str, target: Any, args: Tuple, start: float, end: float) -> None:
+        self.counters[kind] = self.counters.get(kind, 0) + 1
+        if kind == "render":
+            entry = self.render_times.get(target.node.name)
+            if entry is None:
+                self.render_times[target.node.name] = [1, end - start]
+            else:
+                entry[0] += 1
+                entry[1] += end - start
+        elif kind == "draw" or kind == "draw_rectangle":
+            self.counters["bytes"] += _payload_bytes(kind, args)
+
+    def slowest(self, n: int = 5) -> List[Tuple[str, int, float]]:
+        """Returns the (element id, calls, total seconds) triplets of the n elements with the highest render time."""
+        ranked = sorted(self.render_times.items(), key=lambda item: item[1][1], reverse=True)
+        return [(name, calls, total) for name, (calls, total) in ranked[:n]]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a copy of the collected data, suitable for json.dump."""
+        return {
+            "counters": dict(self.counters),
+            "render_times": {name: {"calls": calls, "total": total}
+                             for name, (calls, total) in self.render_times.items()},
+        }
+
+
+class StatsOverlay(Panel):
+    """A panel displaying the content of a RenderStats instance: the counters and the slowest elements.
+        It is drawn by the window manager on top of the other elements, outside of the element tree, so that it never
+        receives the focus.
+
+        Attributes:
+            stats (RenderStats): The statistics to display.
+    """
+    def __init__(self, stats: RenderStats, n_slowest: int = 3):
+        super().__init__(position_constraint("absolute", 0), position_constraint("relative", .6),
+                         size_constraint("absolute", 8 + n_slowest), size_constraint("absolute", 38),
+                         "__stats_overlay__", title="Render stats")
+        self.stats: RenderStats = stats
+        self.n_slowest: int = n_slowest
+
+    def render(self) -> None:
+        lines = ["{:<14}{:>20}".format(name, value) for name, value in self.stats.counters.items()]
+        lines += ["{:<22.22}{:>9.2f}ms".format(name, total * 1000)
+                  for name, calls, total in self.stats.slowest(self.n_slowest)]
+        try:
+            self.draw_borders()
+            self.is_visible = True
+            # Every inner row is drawn, padded with spaces, to hide the elements underneath the overlay.
+            max_y, max_x = self.get_max_yx()
+            lines += [""] * (max_y - len(lines))
+            for n, line in enumerate(lines[:max_y]):
+                self.draw(n, 0, line.ljust(max_x))
+        except CannotDrawError:
+            self.is_visible = False
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import gc
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+from functools import lru_cache
+
+import _tree
+import checkbox
+import constraints
+import gui_elements
+import panels
+import radiobutton
+from gui_elements import GuiElement, IPositionConstraint, ISizeConstraint
+from constraints import position_constraint, size_constraint, UnknownConstraintError
+from panels import Panel
+from checkbox import Checkbox
+from radiobutton import RadioButton
+
+
+# Bumped whenever the cached trees become invalid for a reason the source of the element modules does not show.
+CACHE_VERSION = 5
+# The modules of the classes pickled in the cache: a change of their source invalidates the cached trees.
+_ELEMENT_MODULES = (_tree, gui_elements, constraints, panels, checkbox, radiobutton)
+CACHE_DIRECTORY = "__layoutcache__"
+
+# The element types a layout can use: type name -> class. The constructor is called with the y and x constraints,
+# then the h and w ones when given, then the element id, the other keys of the description being keyword arguments.
+_ELEMENT_TYPES: Dict[str, Callable[..., GuiElement]] = {
+    "panel": Panel,
+    "checkbox": Checkbox,
+    "radiobutton": RadioButton,
+}
+
+# Constraints are immutable: a single instance is shared by all the elements using the same one.
+_interned: Dict[Tuple[str, str, Any], Union[IPositionConstraint, ISizeConstraint]] = {}
+# The signature of each factory, against which the keys of the descriptions are checked.
+_signatures: Dict[Callable[..., GuiElement], Union[None, inspect.Signature]] = {}
+
+
+class LayoutError(Exception):
+    """Error to throw when a layout description is invalid."""
+    pass
+
+
+def register_element(type_name: str, factory: Callable[..., GuiElement]) -> None:
+    """Makes an element class usable in layout files under the given type name.
+
+    Note:
+        The class must be importable by its module name for the cached trees to be loaded. The source of its module
+        is part of the name of the cache files: changing it invalidates them.
+    """
+    _ELEMENT_TYPES[type_name] = factory
+
+
+def _constraint(kind: str, spec: Any) -> Union[IPositionConstraint, ISizeConstraint]:
+    # A constraint is either written ["relative", 0.5] or, when it takes no value, "centered".
+    if isinstance(spec, str):
+        nature, value = spec, None
+    elif isinstance(spec, (list, tuple)) and 1 <= len(spec) <= 2 and isinstance(spec[0], str):
+        nature, value = spec[0], spec[1] if len(spec) == 2 else None
+    else:
+        raise LayoutError("Invalid {} constraint: {!r}".format(kind, spec))
+
+    key = (kind, nature.lower(), value)
+    try:
+        constraint = _interned.get(key)
+    except TypeError:
+        # e.g. a list as value: it cannot be a key of the interned constraints, nor a valid value.
+        raise LayoutError("Invalid {} constraint value: {!r}".format(kind, spec)) from None
+    if constraint is None:
+        factory = position_constraint if kind == "position" else size_constraint
+        try:
+            constraint = factory(nature, value)
+        except (UnknownConstraintError, ValueError) as error:
+            raise LayoutError("Invalid {} constraint {!r}: {}".format(kind, spec, error)) from None
+        _interned[key] = constraint
+    return constraint
+
+
+def _signature(factory: Callable[..., GuiElement]) -> Union[None, inspect.Signature]:
+    # Computed once per factory, as it is checked for every element built. None if it cannot be inspected.
+    signature = _signatures.get(factory, False)
+    if signature is False:
+        try:
+            signature = inspect.signature(factory)
+        except (TypeError, ValueError):
+            signature = None
+        _signatures[factory] = signature
+    return signature
+
+
+def build(description: Dict[str, Any], path: str = "element") -> GuiElement:
+    """Builds an element, and its children, from its description.
+
+    Parameters:
+        description (Dict[str, Any]): The keys "type", "id", "y" and "x" are required, "h" and "w" are required by
+                                      the elements taking a size. "children" lists the descriptions of the children.
+                                      The other keys are passed to the constructor, e.g. "title" or "text".
+        path (str): (Optional) The position of the description in the layout, e.g. "elements[0].children[2]". It
+                    is given by the errors.
+
+    Returns:
+        The element, with its children added.
+    """
+    if not isinstance(description, dict):
+        raise LayoutError("{}: an element must be a table, not {!r}".format(path, description))
+    spec = dict(description)
+    children = spec.pop("children", [])
+    if not isinstance(children, list):
+        raise LayoutError("{}: children must be a list, not {!r}".format(path, children))
+    try:
+        factory = _ELEMENT_TYPES[spec.pop("type")]
+        args = [_constraint("position", spec.pop("y")), _constraint("position", spec.pop("x"))]
+        if "h" in spec or "w" in spec:
+            args += [_constraint("size", spec.pop("h")), _constraint("size", spec.pop("w"))]
+        args.append(spec.pop("id"))
+    except KeyError as error:
+        raise LayoutError("{}: missing key or unknown type {} in {!r}".format(path, error, description)) from None
+    except (LayoutError, TypeError) as error:
+        raise LayoutError("{}: {}".format(path, error)) from None
+
+    # The keys are checked against the constructor, so that a typo is reported as such and not as a TypeError.
+    signature = _signature(factory)
+    if signature is not None:
+        try:
+            signature.bind(*args, **spec)
+        except TypeError as error:
+            raise LayoutError("{}: invalid keys for {}: {}".format(path, description["type"], error)) from None
+
+    element = factory(*args, **spec)
+    if children and not isinstance(element, Panel):
+        raise LayoutError("{}: only panels can have children, not {}".format(path, description["type"]))
+    for n, child in enumerate(children):
+        element.add_child(build(child, "{}.children[{}]".format(path, n)))
+    return element
+
+
+def parse(path: str) -> List[Dict[str, Any]]:
+    """Reads the descriptions of the top-level elements of a JSON or TOML layout file.
+        The file holds an "elements" list, written [[elements]] in TOML.
+    """
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            document = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+
+    if not isinstance(document, dict) or not isinstance(document.get("elements"), list):
+        raise LayoutError("{} must define a list of elements".format(path))
+    return document["elements"]
+
+
+def _element_modules() -> Tuple[str, ...]:
+    # The built-in element modules, and those of the factories added by register_element().
+    names = {module.__name__ for module in _ELEMENT_MODULES}
+    names.update(getattr(factory, "__module__", None) or '' for factory in _ELEMENT_TYPES.values())
+    names.discard('')
+    return tuple(sorted(names))
+
+
+@lru_cache(maxsize=16)
+def _modules_digest(names: Tuple[str, ...]) -> bytes:
+    # Read once per process and set of modules: the modules do not change while they are imported.
+    digest = hashlib.sha256()
+    for name in names:
+        try:
+            with open(sys.modules[name].__file__, "rb") as f:
+                digest.update(f.read())
+        except (OSError, KeyError, AttributeError, TypeError):
+            # Without a source file, the module is only identified by its name.
+            digest.update(name.encode())
+    return digest.digest()
+
+
+def cache_path(path: str, content: bytes) -> str:
+    """Path of the cached tree of a layout file, in a __layoutcache__ directory next to it. The name is a hash of the
+        content of the file, of the source of the element modules (with those of register_element()), of the cache
+        version and of the Python version."""
+    digest = hashlib.sha256(content)
+    digest.update(_modules_digest(_element_modules()))
+    digest.update("{}:{}.{}".format(CACHE_VERSION, *sys.version_info[:2]).encode())
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY, digest.hexdigest() + ".pickle")
+
+
+def load(path: str, use_cache: bool = True) -> List[GuiElement]:
+    """Builds the top-level elements of a layout file.
+
+    Parameters:
+        path (str): A .json or .toml layout file.
+        use_cache (bool): The built tree is pickled in a cache file, which later calls load instead of parsing and
+                          building the layout again, as long as the content of the file is unchanged.
+
+    Returns:
+        The top-level elements, to be added to a WindowManager.
+    """
+    if not use_cache:
+        return [build(description, "elements[{}]".format(n)) for n, description in enumerate(parse(path))]
+
+    with open(path, "rb") as f:
+        cached = cache_path(path, f.read())
+    # Thousands of objects are created at once without any garbage: the collector would only slow the loading down.
+    collect = gc.isenabled()
+    gc.disable()
+    try:
+        with open(cached, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+        # Missing, truncated, or written by incompatible classes: the layout is built again.
+        pass
+    finally:
+        if collect:
+            gc.enable()
+
+    elements = [build(description, "elements[{}]".format(n)) for n, description in enumerate(parse(path))]
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        # Written under a temporary name then renamed, so that a concurrent launch never reads a partial file.
+        temporary = "{}.{}.tmp".format(cached, os.getpid())
+        with open(temporary, "wb") as f:
+            pickle.dump(elements, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cached)
+    except OSError:
+        # The cache is an optimization, a read-only directory is not an error.
+        pass
+    return elements
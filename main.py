@@ -37,27 +37,21 @@ class MyApp(BlessedApp):
 
 
     def main(self):
-        k = 0
-
-        screen_y = 0
-        screen_x = 0
-
-        while k != "q": # ESC_KEY:
-
-            if k == "a":  # KEY_TAB
-                self.get_next()
-            elif k == "e":
-                self.get_active().interact()
-
-            old_screen_y = screen_y
-            old_screen_x = screen_x
-            screen_y, screen_x = self.get_max_yx()
-
-            # Wait for next input
-            k = self.get_input()
-
-            if screen_y != old_screen_y or screen_x != old_screen_x:
-                self.render()
+        running = True
+
+        while running:
+            # All the pending keys are dispatched, then drawn once. Repeated "a" make a single focus jump.
+            with self.batch():
+                for k, count in self.get_inputs(collapse=("a",)):
+                    if k == "q":  # ESC_KEY:
+                        running = False
+                        break
+
+                    # Resizes are handled by the window manager, which already redrew the window.
+                    if k == "a":  # KEY_TAB
+                        self.get_next(count)
+                    elif k == "e":
+                        self.get_active().interact()
 
 
         self.clear()
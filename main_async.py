@@ -0,0 +1,28 @@
+import asyncio
+
+from main_curses import MyApp
+
+
+class MyAsyncApp(MyApp):
+    """The curses demo driven by the asyncio event loop: a background task toggles a checkbox every second while the
+    keys are still handled."""
+
+    def on_key(self, key):
+        if key == ord("q"):
+            self.stop()
+        elif key == ord("a"):  # KEY_TAB
+            self.get_next()
+        elif key == ord("e"):
+            self.interact()
+
+    async def main_async(self):
+        check = self._element_tree_manager.tree.get_node("chk2").payload
+        while True:
+            await asyncio.sleep(1)
+            check.toggle = not check.toggle
+            self.invalidate(check)
+
+
+if __name__ == "__main__":
+    app = MyAsyncApp()
+    app.run_async()
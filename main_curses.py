@@ -1,59 +1,28 @@
-from constraints import position_constraint, size_constraint
-from panels import Panel
-from radiobutton import RadioButton
-from checkbox import Checkbox
+import os
 
 from curses_app import CursesApp
-import curses
 
 class MyApp(CursesApp):
     def design(self):
-        panel_1 = Panel(position_constraint("relative", .2), position_constraint("centered"),
-                        size_constraint("relative", .7), size_constraint("relative", .7), "Main",
-                        max_w=50, title="Main")
-        self.add_element(panel_1)
-
-        panel_2 = Panel(position_constraint("absolute", 0), position_constraint("relative", .05),
-                        size_constraint("relative", .45), size_constraint("relative", .45), "RadioPan",
-                        max_w=40, title="Radio Buttons")
-        panel_1.add_child(panel_2)
-
-        radio_1 = RadioButton(position_constraint("absolute", 1), position_constraint("absolute", 0), "rad1", "Radio 1")
-        panel_2.add_child(radio_1)
-
-        radio_2 = RadioButton(position_constraint("absolute", 3), position_constraint("absolute", 0), "rad2", "Radio 2")
-        panel_2.add_child(radio_2)
-
-        panel_3 = Panel(position_constraint("absolute", 0), position_constraint("relative", .5),
-                        size_constraint("relative", .45), size_constraint("relative", .45), "Check Pan",
-                        max_w=40, title="Check Boxes")
-        panel_1.add_child(panel_3)
-
-        check_1 = Checkbox(position_constraint("absolute", 1), position_constraint("absolute", 0), "chk1", "Check 1")
-        panel_3.add_child(check_1)
-
-        check_2 = Checkbox(position_constraint("absolute", 3), position_constraint("absolute", 0), "chk2", "Check 2")
-        panel_3.add_child(check_2)
-
+        # The same layout as main.py, described in a file. The built tree is cached next to it.
+        self.load_layout(os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo_layout.toml"))
 
     def main(self):
-        k = 0
-
-        screen_y = 0
-        screen_x = 0
-
-        while k != ord("q"): # ESC_KEY:
-
-            if k== curses.KEY_RESIZE:
-                self.render()
-
-            if k == ord("a"):  # KEY_TAB
-                self.get_next()
-            elif k == ord("e"):
-                self.get_active().interact()
-
-            # Wait for next input
-            k = self.get_input()
+        running = True
+
+        while running:
+            # All the pending keys are dispatched, then drawn once. Repeated "a" make a single focus jump.
+            with self.batch():
+                for k, count in self.get_inputs(collapse=(ord("a"),)):
+                    if k == ord("q"):  # ESC_KEY:
+                        running = False
+                        break
+
+                    # Resizes are handled by the window manager, which already redrew the window.
+                    if k == ord("a"):  # KEY_TAB
+                        self.get_next(count)
+                    elif k == ord("e"):
+                        self.get_active().interact()
 
 
         self.clear()
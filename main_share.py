@@ -0,0 +1,45 @@
+import asyncio
+import os
+import sys
+
+from headless_app import HeadlessApp
+from share import ShareServer
+
+
+class MySharedApp(HeadlessApp):
+    """The demo layout rendered once and shared with every terminal attached to the socket given on the command line,
+    with: python share.py SOCKET_PATH. A background task toggles a checkbox every second."""
+
+    def __init__(self, path):
+        super().__init__(24, 80)
+        self.server = ShareServer(self, path)
+
+    def design(self):
+        self.load_layout(os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo_layout.toml"))
+
+    def main(self):
+        pass
+
+    def on_key(self, key):
+        if key == ord("q"):
+            self.stop()
+        elif key == ord("a"):  # KEY_TAB
+            self.get_next()
+        elif key == ord("e"):
+            self.interact()
+
+    async def main_async(self):
+        await self.server.start()
+        check = self._element_tree_manager.tree.get_node("chk2").payload
+        try:
+            while True:
+                await asyncio.sleep(1)
+                check.toggle = not check.toggle
+                self.invalidate(check)
+        finally:
+            await self.server.close()
+
+
+if __name__ == "__main__":
+    app = MySharedApp(sys.argv[1] if len(sys.argv) > 1 else "/tmp/terminal_gui.sock")
+    app.run_async()
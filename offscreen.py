@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Off-screen rendering of heavy elements in a pool of processes.
+
+The cells of an OffscreenElement are a pure function of an immutable snapshot of its state: paint(snapshot, buffer)
+fills a private cell buffer of the size of the element, without touching the element itself. An OffscreenRenderer
+paints the snapshots of many elements at once in a ProcessPoolExecutor before a frame, the workers writing the cells
+into blocks of shared memory. The elements then copy their painted buffer onto the screen when the frame renders
+them, so that the time of a frame made of many charts or tables scales with the number of cores.
+
+    class Histogram(OffscreenElement):
+        __slots__ = ("_snapshot",)
+
+        def snapshot(self):
+            return self._snapshot            # a tuple, replaced (not modified) when the data changes
+
+        @staticmethod
+        def paint(snapshot, buffer):
+            ...                              # buffer.draw(y, x, text, attr)
+
+    app.enable_offscreen()                   # see WindowManager.enable_offscreen()
+
+The snapshot and paint() are sent to the workers with pickle: the snapshot must be picklable and the subclass defined
+at the top level of a module the workers can import.
+"""
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple, Union
+
+from abc import abstractmethod
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from gui_elements import GuiElement, IPositionConstraint, ISizeConstraint, CannotDrawError
+from cell_buffer import CellBuffer, PACKED_CELL_SIZE
+
+
+class OffscreenElement(GuiElement):
+    """A leaf element whose cells are computed by paint() from snapshot() into a private cell buffer, which is then
+        copied onto its canvas. When an OffscreenRenderer painted the buffer in advance for the same snapshot and
+        size, render() only copies it.
+
+        Note:
+            snapshot() should return the same object as long as the state of the element does not change: a painted
+            buffer is used only if it was painted from that very object.
+    """
+    __slots__ = ("_painted",)
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, element_id: str, min_h: int = 0,
+                 min_w: int = 0, max_h: int = -1, max_w: int = -1):
+        super().__init__(y_constraint, x_constraint, h_constraint, w_constraint, element_id, min_h, min_w, max_h,
+                         max_w)
+        # The (snapshot, buffer) pair painted in advance for the next render.
+        self._painted: Union[None, Tuple[Any, CellBuffer]] = None
+
+    @abstractmethod
+    def snapshot(self) -> Any:
+        """Returns an immutable and picklable value holding everything paint() needs."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def paint(snapshot: Any, buffer: CellBuffer) -> None:
+        """Draws a snapshot into an empty buffer with the size of the element. It must not depend on anything else,
+            as it may run in another process."""
+        pass
+
+    def render(self) -> None:
+        painted, self._painted = self._painted, None
+        try:
+            # The size is computed inside the try: an element which does not fit is hidden, not its panel.
+            h, w = self.get_max_yx()
+            snapshot = self.snapshot()
+            if painted is not None and painted[0] is snapshot and painted[1].get_max_yx() == (h, w):
+                buffer = painted[1]
+            else:
+                buffer = CellBuffer(h, w)
+                type(self).paint(snapshot, buffer)
+
+            for y in range(h):
+                for _, x, text, attr in buffer.runs(y):
+                    self.draw(y, x, text, attr)
+            self.is_visible = True
+
+        except CannotDrawError:
+            self.is_visible = False
+
+
+# The blocks of shared memory attached by a worker process, by name.
+_attached: Dict[str, SharedMemory] = {}
+
+
+def _paint_shared(paint, snapshot: Any, h: int, w: int, name: str) -> Union[None, CellBuffer]:
+    # Runs in a worker: the cells are written into the shared block. A buffer which cannot be packed is returned.
+    buffer = CellBuffer(h, w)
+    paint(snapshot, buffer)
+    block = _attached.get(name)
+    if block is None:
+        # The blocks replaced by larger ones are not used anymore: the cache is emptied from time to time.
+        if len(_attached) > 64:
+            for stale in _attached.values():
+                stale.close()
+            _attached.clear()
+        block = _attached[name] = SharedMemory(name=name)
+    if buffer.pack_into(block.buf):
+        return None
+    return buffer
+
+
+class OffscreenRenderer(object):
+    """Paints the buffers of OffscreenElements in a pool of worker processes.
+
+        Attributes:
+            workers (int): The number of worker processes, the number of CPUs by default.
+            min_elements (int): Below this number of elements to paint, prefetch() does nothing: the elements paint
+                                themselves when rendered, which avoids the cost of the transfer.
+    """
+    def __init__(self, workers: int = None, min_elements: int = 2):
+        self.workers: int = workers or os.cpu_count() or 1
+        self._executor: ProcessPoolExecutor = ProcessPoolExecutor(self.workers)
+        self.min_elements: int = min_elements
+        # One block of shared memory per job of a batch, kept from one frame to the next.
+        self._blocks: List[SharedMemory] = []
+
+    def _block(self, index: int, size: int) -> SharedMemory:
+        if index == len(self._blocks):
+            self._blocks.append(SharedMemory(create=True, size=max(size, 1)))
+        elif self._blocks[index].size < size:
+            self._blocks[index].close()
+            self._blocks[index].unlink()
+            # Grown with some margin, so that a window being enlarged does not replace it at each frame.
+            self._blocks[index] = SharedMemory(create=True, size=size * 2)
+        return self._blocks[index]
+
+    def prefetch(self, elements: List[OffscreenElement]) -> int:
+        """Paints the buffers of the elements in parallel, for their next render.
+
+        Returns:
+            The number of elements painted.
+        """
+        if len(elements) < self.min_elements:
+            return 0
+        jobs = []
+        for element in elements:
+            try:
+                h, w = element.get_max_yx()
+            except CannotDrawError:
+                # It does not fit in the window: its render() hides it.
+                continue
+            if h <= 0 or w <= 0:
+                continue
+            snapshot = element.snapshot()
+            block = self._block(len(jobs), PACKED_CELL_SIZE * h * w)
+            future = self._executor.submit(_paint_shared, type(element).paint, snapshot, h, w, block.name)
+            jobs.append((element, snapshot, h, w, block, future))
+
+        for element, snapshot, h, w, block, future in jobs:
+            buffer = future.result()
+            if buffer is None:
+                buffer = CellBuffer(h, w)
+                buffer.unpack_from(block.buf)
+            element._painted = (snapshot, buffer)
+        return len(jobs)
+
+    def close(self) -> None:
+        """Stops the workers and frees the shared memory."""
+        self._executor.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
@@ -6,6 +6,7 @@ from __future__ import annotations
 from typing import List, Tuple
 
 from gui_elements import CannotDrawError, IPositionConstraint, ISizeConstraint, GuiElement, TextStyles
+from text_width import truncate, width
 
 
 class Panel(GuiElement):
@@ -22,6 +23,8 @@ class Panel(GuiElement):
             has_borders (bool): Set to True to draw borders. Title is rendered on the top border.
 
     """
+    __slots__ = ("has_borders", "title")
+
     def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
                  h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, panel_id: str, max_h=-1, max_w=-1,
                  title: str = '', has_borders: bool = True):
@@ -38,17 +41,6 @@ class Panel(GuiElement):
             self.min_h = 2
             self.min_w = 2
 
-    @property
-    def is_visible(self) -> bool:
-        return self._is_visible
-
-    @is_visible.setter
-    def is_visible(self, is_visible) -> None:
-        self._is_visible = is_visible
-        if not is_visible:
-            for child in self.children:
-                child.is_visible = False
-
     # The use of @property allows to hide the existence of the node.
     @property
     def children(self) -> List[GuiElement]:
@@ -80,21 +72,38 @@ class Panel(GuiElement):
 
         """
         self.draw_rectangle(-1, -1, self.h - 2, self.w - 2)
-        text = self.title[:self.w - 4]
+        text = truncate(self.title, self.w - 4)
 
         if self.is_active:
             if len(text) > 0:
                 self.draw(-1, 0, " ")
                 self.draw(-1, 1, text, TextStyles.BOLD | TextStyles.CYAN)
-                self.draw(-1, len(text) + 1, " ")
+                self.draw(-1, width(text) + 1, " ")
         else:
             if len(text) > 0:
                 self.draw(-1, 0, " " + text + " ")
 
     def draw_children(self) -> None:
-        for elem in self.children:
-            # Draw child only if it can fit entirely inside the panel.
-            elem.render()
+        children = self.children
+        # The cells of the hidden children are blanked first, as redrawing only the panel would leave them on screen.
+        for elem in children:
+            if not elem.shown:
+                self.clear_child(elem)
+        for elem in children:
+            # Draw child only if it can fit entirely inside the panel. The hidden children are skipped with their
+            # subtrees.
+            if elem.shown:
+                elem.render()
+
+    def clear_child(self, elem: GuiElement) -> None:
+        """Draws blanks over the area of a child, e.g. of a hidden one. Nothing is drawn if it does not fit inside
+            the panel."""
+        try:
+            blank = ' ' * elem.w
+            for row in range(elem.h):
+                self.draw(elem.y + row, elem.x, blank)
+        except CannotDrawError:
+            pass
 
     def add_child(self, elem: GuiElement) -> None:
         self.node.add_child(elem.node)
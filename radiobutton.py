@@ -3,32 +3,83 @@
 
 # Imports used for type hints
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Callable, Dict, List, Tuple, Union
 
 from gui_elements import GuiElement, IPositionConstraint, TextStyles, CannotDrawError
 from constraints import size_constraint
+from text_width import width
 
 
 class RadioButton(GuiElement):
-    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint, box_id: str, text: str):
+    """A button selected among the other buttons of its group. Selecting it deselects the previous one.
+
+        Attributes:
+            toggle (bool): True when the button is the selected one of its group. Setting it changes the selection
+                           of the group.
+            group (RadioGroup): The group of the button. Buttons created without one share an implicit group with
+                                the other ungrouped buttons of their panel, set up the first time one of them is
+                                clicked.
+    """
+    __slots__ = ("_toggle", "_text", "_group")
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint, box_id: str, text: str,
+                 group: RadioGroup = None):
 
         super().__init__(y_constraint, x_constraint, size_constraint("absolute", 1),
-                         size_constraint("relative", 1), box_id, min_w=len(text) + 4)
+                         size_constraint("relative", 1), box_id, min_w=width(text) + 4)
 
-        self.toggle = False
+        self._toggle = False
         self._text = text
         self._is_visible = False
+        self._group: Union[None, RadioGroup] = None
+        if group is not None:
+            group.add(self)
+
+    @property
+    def group(self) -> Union[None, RadioGroup]:
+        return self._group
+
+    @property
+    def toggle(self) -> bool:
+        return self._toggle
+
+    @toggle.setter
+    def toggle(self, toggle: bool) -> None:
+        if self._group is None and toggle and self._node.parent is not None:
+            # Selecting a button deselects its siblings, as a click does: it joins their implicit group first.
+            self._join_siblings()
+        if self._group is None:
+            self._toggle = toggle
+        elif toggle:
+            self._group.select(self)
+        elif self._group.selected is self:
+            self._group.select(None)
 
     def interact(self, value: int = 0) -> None:
-        if not self.toggle:
-            for brother in self.parent.node:
-                if isinstance(brother.payload, RadioButton):
-                    brother.payload.toggle = False
-            self.toggle = True
-            self.parent.render()
+        if self._group is None:
+            self._join_siblings()
+        self._group.select(self)
+
+    def _join_siblings(self) -> None:
+        # The ungrouped buttons of the panel join the implicit group of their siblings, created if there is none yet.
+        # The panel is scanned once for all of them, not on every click.
+        group = None
+        ungrouped = []
+        for brother in self._node.parent:
+            button = brother.payload
+            if isinstance(button, RadioButton):
+                if button._group is None:
+                    ungrouped.append(button)
+                elif group is None and button._group.implicit:
+                    group = button._group
+        if group is None:
+            group = RadioGroup()
+            group.implicit = True
+        for button in ungrouped:
+            group.add(button)
 
     def render(self) -> None:
-        if self.toggle:
+        if self._toggle:
             text = "(x) "
         else:
             text = "( ) "
@@ -41,10 +92,103 @@ class RadioButton(GuiElement):
             else:
                 self.draw(0, 0, text)
 
-            if self.parent.is_visible:
-                self.is_visible = True
-            else:
-                self.is_visible = False
+            # The visibility of the parent is taken into account when is_visible is read.
+            self.is_visible = True
 
         except CannotDrawError:
             self.is_visible = False
+
+
+class RadioGroup(object):
+    """The set of radio buttons among which at most one is selected. Its buttons can belong to different panels.
+        Changing the selection redraws only the previously and the newly selected buttons, whatever the size of the
+        group.
+
+        Attributes:
+            selected (RadioButton): The selected button, None if there is none.
+            buttons (List[RadioButton]): The buttons of the group, in the order they were added.
+            implicit (bool): True for the groups created for the buttons which were not given one.
+
+        Note:
+            The redraws happen on the canvas of the buttons, without flushing the window: as for the interaction with
+            any element, the application (or the window manager batch) flushes once the inputs are handled.
+    """
+    def __init__(self, on_change: Callable[[Union[None, RadioButton], Union[None, RadioButton]], None] = None):
+        # A dict is used as an ordered set: adding and removing buttons does not depend on the size of the group.
+        self._buttons: Dict[RadioButton, None] = {}
+        self._selected: Union[None, RadioButton] = None
+        self._callbacks: List[Callable[[Union[None, RadioButton], Union[None, RadioButton]], None]] = []
+        self.implicit: bool = False
+        if on_change is not None:
+            self._callbacks.append(on_change)
+
+    @property
+    def selected(self) -> Union[None, RadioButton]:
+        return self._selected
+
+    @property
+    def buttons(self) -> List[RadioButton]:
+        return list(self._buttons)
+
+    def __len__(self) -> int:
+        return len(self._buttons)
+
+    def __contains__(self, button: RadioButton) -> bool:
+        return button in self._buttons
+
+    def add(self, button: RadioButton) -> None:
+        """Adds a button to the group, removing it from its former group. If the button is toggled, it becomes the
+            selected one unless the group already has a selection, in which case it is deselected."""
+        if button._group is self:
+            return
+        if button._group is not None:
+            button._group.remove(button)
+        button._group = self
+        self._buttons[button] = None
+        if button._toggle:
+            if self._selected is None:
+                self._selected = button
+            else:
+                button._toggle = False
+
+    def remove(self, button: RadioButton) -> None:
+        """Removes a button from the group. It keeps its toggle, the group is left without selection if it was the
+            selected one."""
+        if button in self._buttons:
+            del self._buttons[button]
+            button._group = None
+            if self._selected is button:
+                self._selected = None
+
+    def select(self, button: Union[None, RadioButton]) -> None:
+        """Makes a button the selected one, or clears the selection if None is given. The previous and the new
+            selected buttons are redrawn if they are visible, then the change callbacks are called.
+
+        Raises:
+            ValueError: The button does not belong to the group.
+        """
+        previous = self._selected
+        if button is previous:
+            return
+        if button is not None and button not in self._buttons:
+            raise ValueError("{} does not belong to the group".format(button.node.name))
+
+        self._selected = button
+        for changed, toggle in ((previous, False), (button, True)):
+            if changed is not None:
+                changed._toggle = toggle
+                # The hidden buttons are drawn with the new state by the next render of their panel.
+                if changed.is_visible:
+                    changed.render()
+
+        for callback in self._callbacks:
+            callback(previous, button)
+
+    def on_change(self, callback: Callable[[Union[None, RadioButton], Union[None, RadioButton]], None]) -> Callable:
+        """Registers a function called with the previous and the new selected buttons (either can be None) when the
+            selection changes. It returns the function, so that it can be used as a decorator."""
+        self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: Callable) -> None:
+        self._callbacks.remove(callback)
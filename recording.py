@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Session recording and replay.
+
+A RecordingWindow wraps the window of an application and streams to a file the inputs it returns and, at each flush,
+the cells changed since the previous frame. A full keyframe is written periodically and after each resize, so that
+a truncated file stays readable up to its last complete line. The file holds one JSON value per line, gzip compressed
+when its name ends with .gz:
+
+    {"version": 1, "h": 24, "w": 80, "timestamp": 1700000000, "keyframe_interval": 100}
+    ["K", 0.0105, 24, 80, [[0, 0, "┌──┐", 0], ...]]    keyframe: time, size and the non-blank runs
+    ["k", 1.2512, 9]                                  input: time, key (and the key code of a blessed keystroke)
+    ["r", 2.0031, 30, 100]                            resize input: time and new size
+    ["f", 1.2544, [[3, 2, "[X]", 1024], ...]]         frame: time and the runs of cells that changed
+
+The times are in seconds since the start of the recording. Recordings are read by Recording, converted to asciicast
+v2 by Recording.to_asciicast() and played again against the headless backend by replay().
+"""
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Dict, IO, Iterator, List, Tuple, Union
+
+import gzip
+import json
+import statistics
+import time
+from time import perf_counter
+
+from _window_manager import IWindow, KEY_RESIZE
+from ansi import Encoder
+from cell_buffer import CellBuffer, Run
+from headless_app import HeadlessApp, _HeadlessWindow
+
+FORMAT_VERSION = 1
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class RecordingWindow(IWindow):
+    """Wraps a window to record the session into a file. Every call is forwarded to the wrapped window.
+
+        Attributes:
+            window (IWindow): The wrapped window.
+            path (str): The recording file.
+            keyframe_interval (int): Number of frames between two keyframes.
+            frames (int): Number of frames recorded so far.
+            mirrored (bool): True when the screen is rebuilt from the draw calls, i.e. when the wrapped window does
+                             not draw into a cell buffer. The elements must then draw through the recorder.
+
+        Note:
+            The attributes of the wrapped window (e.g. screen or feed()) remain reachable through the wrapper.
+    """
+    wraps_window = True
+
+    # Calls logged on a row without a clear() before its calls are replaced by the runs they produced.
+    max_row_calls = 256
+
+    def __init__(self, window: IWindow, path: str, keyframe_interval: int = 100):
+        self.window: IWindow = window
+        self.path: str = path
+        self.keyframe_interval: int = max(keyframe_interval, 1)
+        self.frames: int = 0
+
+        shared = getattr(window, "buffer", None)
+        self.mirrored: bool = not isinstance(shared, CellBuffer)
+        self._screen: CellBuffer = CellBuffer(*window.get_max_yx()) if self.mirrored else shared
+        # Mirrored screens: the (x, text, attr) draws of each row since the last clear(), and the ones the row of
+        # _screen was built from. A row is only drawn again when its calls changed, which is cheaper than mirroring
+        # every call as a full render draws the same calls again.
+        self._calls: List[List[tuple]] = [[] for _ in range(self._screen.h)]
+        self._drawn: List[List[tuple]] = [[] for _ in range(self._screen.h)]
+        # The screen as written in the file so far.
+        self._previous: CellBuffer = CellBuffer(0, 0)
+        self._start: float = perf_counter()
+        self._file: Union[None, IO[str]] = _open(path, "w")
+        # The size is queried by every layout computation: the wrapped method is called without going through the
+        # wrapper.
+        self.get_max_yx = window.get_max_yx
+        h, w = self._screen.get_max_yx()
+        self._write({"version": FORMAT_VERSION, "h": h, "w": w, "timestamp": int(time.time()),
+                     "keyframe_interval": self.keyframe_interval})
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the attributes the wrapper does not have.
+        return getattr(self.window, name)
+
+    def _write(self, event: Any) -> None:
+        if self._file is not None:
+            self._file.write(_dumps(event) + "\n")
+
+    def _now(self) -> float:
+        return round(perf_counter() - self._start, 6)
+
+    def close(self) -> None:
+        """Records the last frame and closes the file. The wrapped window keeps working."""
+        if self._file is not None:
+            self._record_frame()
+            self._file.close()
+            self._file = None
+
+    def get_input(self, timeout: float = None) -> Any:
+        key = self.window.get_input(timeout)
+        if key is None:
+            return None
+        if self.window.is_resize(key):
+            self._write(["r", self._now(), *self.window.get_max_yx()])
+        else:
+            # A blessed keystroke is written as its text, followed by its code for the special keys.
+            code = getattr(key, "code", None)
+            self._write(["k", self._now(), key] if code is None else ["k", self._now(), str(key), code])
+        return key
+
+    def wakeup(self) -> None:
+        self.window.wakeup()
+
+    def input_fds(self) -> List[int]:
+        return self.window.input_fds()
+
+    def is_resize(self, key: int) -> bool:
+        return self.window.is_resize(key)
+
+    def draw(self, y_pos: int, x_pos: int, text: str, attr=0) -> None:
+        self.window.draw(y_pos, x_pos, text, attr)
+        if self.mirrored and 0 <= y_pos < len(self._calls):
+            self._calls[y_pos].append((x_pos, text, attr))
+
+    def draw_rectangle(self, uly: int, ulx: int, lry: int, lrx: int) -> None:
+        self.window.draw_rectangle(uly, ulx, lry, lrx)
+        if self.mirrored and uly != lry and ulx != lrx:
+            # The same draws as CellBuffer.draw_rectangle(). The two sides of a row are a single call, drawing its
+            # text at x and at the fourth item.
+            screen, calls = self._screen, self._calls
+            h = len(calls)
+            if 0 <= uly < h:
+                calls[uly].append((ulx, screen.border_tl + screen.border_h * (lrx - ulx - 1) + screen.border_tr, 0))
+            if 0 <= lry < h:
+                calls[lry].append((ulx, screen.border_bl + screen.border_h * (lrx - ulx - 1) + screen.border_br, 0))
+            sides = (ulx, screen.border_v, 0, lrx)
+            for row in calls[max(uly + 1, 0):max(lry, 0)]:
+                row.append(sides)
+
+    def get_max_yx(self) -> Tuple[int, int]:
+        return self.window.get_max_yx()
+
+    def delete(self, y_pos: int, x_pos: int) -> None:
+        self.window.delete(y_pos, x_pos)
+        if self.mirrored and 0 <= y_pos < len(self._calls):
+            self._calls[y_pos].append((x_pos, self._screen.fill, 0))
+
+    def clear(self) -> None:
+        self.window.clear()
+        if self.mirrored:
+            h, w = self.window.get_max_yx()
+            if (h, w) != self._screen.get_max_yx():
+                self._screen.resize(h, w)
+                self._drawn = [[] for _ in range(h)]
+            self._calls = [[] for _ in range(h)]
+
+    def flush(self) -> None:
+        self.window.flush()
+        self._record_frame()
+
+    def _update_screen(self) -> None:
+        # Draws again the rows of the mirrored screen whose calls changed since they were drawn.
+        screen, blank = self._screen, self._screen.fill * self._screen.w
+        for y, calls in enumerate(self._calls):
+            if calls == self._drawn[y]:
+                continue
+            screen.draw(y, 0, blank)
+            for call in calls:
+                screen.draw(y, call[0], call[1], call[2])
+                if len(call) > 3:
+                    screen.draw(y, call[3], call[1], call[2])
+            if len(calls) > self.max_row_calls:
+                calls[:] = [(x, text, attr) for _, x, text, attr in screen.update_view(CellBuffer(1, screen.w), y)]
+            self._drawn[y] = calls[:]
+
+    def _record_frame(self) -> None:
+        if self._file is None:
+            return
+        if self.mirrored:
+            self._update_screen()
+        screen, previous = self._screen, self._previous
+        if screen.get_max_yx() != previous.get_max_yx() or self.frames % self.keyframe_interval == 0:
+            # The keyframe is the difference with a blank screen: only the non-blank runs are written.
+            previous.resize(screen.h, screen.w)
+            runs = screen.update_view(previous)
+            self._write(["K", self._now(), screen.h, screen.w, runs])
+            # A keyframe is a safe point to make the file readable up to here.
+            self._file.flush()
+        else:
+            # Comparing whole rows is cheap, only the changed ones are compared cell by cell.
+            changed = screen.changed_rows(previous)
+            if not changed:
+                return
+            self._write(["f", self._now(), screen.update_view(previous, rows=changed)])
+        self.frames += 1
+
+
+class Recording(object):
+    """Reads a recording file.
+
+        Attributes:
+            path (str): The recording file.
+            header (Dict[str, Any]): The first line of the file: format version, initial size and start timestamp.
+    """
+    def __init__(self, path: str):
+        self.path: str = path
+        with _open(path, "r") as f:
+            self.header: Dict[str, Any] = json.loads(f.readline())
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError("{} is not a recording of version {}".format(path, FORMAT_VERSION))
+
+    def events(self) -> Iterator[List[Any]]:
+        """Yields the events in the order they were recorded. A truncated last line is ignored."""
+        with _open(self.path, "r") as f:
+            f.readline()
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+    def inputs(self) -> List[List[Any]]:
+        """The "k" and "r" events."""
+        return [event for event in self.events() if event[0] in ("k", "r")]
+
+    def frames(self) -> Iterator[Tuple[float, CellBuffer]]:
+        """Rebuilds the screen at each recorded frame.
+
+        Returns:
+            An iterator of (time, screen) pairs. The same CellBuffer is updated and yielded at every frame, copy() it
+            to keep a frame.
+        """
+        screen = CellBuffer(self.header["h"], self.header["w"])
+        for event in self.events():
+            if event[0] == "K":
+                _, t, h, w, runs = event
+                screen.resize(h, w)
+            elif event[0] == "f":
+                _, t, runs = event
+            else:
+                continue
+            for y, x, text, attr in runs:
+                screen.draw(y, x, text, attr)
+            yield t, screen
+
+    def last_frame(self) -> Union[None, CellBuffer]:
+        screen = None
+        for _, screen in self.frames():
+            pass
+        return screen
+
+    def to_asciicast(self, path: str, idle_time_limit: float = None) -> None:
+        """Converts the recording to an asciicast v2 file, as played by asciinema.
+
+        Parameters:
+            path (str): The asciicast file to write.
+            idle_time_limit (float): (Optional) Longer pauses between two events are shortened to this many seconds.
+        """
+        header = {"version": 2, "width": self.header["w"], "height": self.header["h"],
+                  "timestamp": self.header["timestamp"]}
+        if idle_time_limit is not None:
+            header["idle_time_limit"] = idle_time_limit
+        screen = CellBuffer(self.header["h"], self.header["w"])
+        encoder = Encoder(screen.w)
+        shift = last = 0.0
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_dumps(header) + "\n")
+            for event in self.events():
+                kind, t = event[0], event[1]
+                if idle_time_limit is not None and t - last > idle_time_limit:
+                    shift += t - last - idle_time_limit
+                last = t
+                t = round(t - shift, 6)
+                if kind in ("K", "f"):
+                    output = ""
+                    if kind == "K":
+                        f.write(_dumps([t, "r", "{}x{}".format(event[3], event[2])]) + "\n")
+                        output = "\x1b[0m\x1b[2J"
+                        screen.resize(event[2], event[3])
+                        encoder.width = screen.w
+                        encoder.invalidate()
+                    runs = event[-1]
+                    for y, x, text, attr in runs:
+                        screen.draw(y, x, text, attr)
+                    f.write(_dumps([t, "o", output + encoder.encode(runs, screen) + encoder.end()]) + "\n")
+                elif kind == "k":
+                    key = event[2]
+                    f.write(_dumps([t, "i", chr(key) if isinstance(key, int) and 0 <= key < 0x110000 else str(key)]) +
+                            "\n")
+
+
+class EndOfRecording(Exception):
+    """Raised by a replayed window waiting for an input after it returned all the recorded ones."""
+    pass
+
+
+class _ReplayWindow(_HeadlessWindow):
+    """A headless window returning the inputs of a recording, immediately or at their recorded pace, and measuring
+        the time from each input to the next frame."""
+    def __init__(self, inputs: List[List[Any]], h: int, w: int, speed: float = None):
+        super().__init__(h, w)
+        self._script: List[List[Any]] = inputs
+        self._next: int = 0
+        self._speed: Union[None, float] = speed
+        self._start: float = perf_counter()
+        self._input_time: Union[None, float] = None
+        self.latencies: List[float] = []
+        self.flushes: int = 0
+
+    def get_input(self, timeout: float = None) -> Any:
+        if self._inputs:
+            return super().get_input(timeout)
+        if self._next >= len(self._script):
+            # Polling returns nothing, so that the inputs already read are processed. Waiting ends the replay.
+            if timeout == 0:
+                return None
+            raise EndOfRecording()
+        event = self._script[self._next]
+        if self._speed:
+            delay = self._start + event[1] / self._speed - perf_counter()
+            if timeout is not None and delay > timeout:
+                # Not due yet: the application sees the same timeout as during the recording.
+                time.sleep(timeout)
+                return None
+            if delay > 0:
+                time.sleep(delay)
+        self._next += 1
+        self._input_time = perf_counter()
+        if event[0] == "r":
+            self.buffer.resize(event[2], event[3])
+            return KEY_RESIZE
+        # The code of a blessed keystroke is a curses key code, as used by the headless backend.
+        return event[3] if len(event) > 3 else event[2]
+
+    def flush(self) -> None:
+        super().flush()
+        self.flushes += 1
+        if self._input_time is not None:
+            self.latencies.append(perf_counter() - self._input_time)
+            self._input_time = None
+
+
+def replay(path: str, app: HeadlessApp, speed: float = None) -> Dict[str, Any]:
+    """Plays a recording again: the recorded inputs are fed to an application on the headless backend, which runs
+        until they are exhausted. The application is deterministic when its screen only depends on the inputs, the
+        final screen is then the recorded one.
+
+    Parameters:
+        path (str): The recording file.
+        app (HeadlessApp): A new instance of the recorded application, not run yet.
+        speed (float): (Optional) The inputs are returned at their recorded times divided by speed. By default they
+                       are returned as soon as the application asks for them, to time the processing alone.
+
+    Returns:
+        A report: the number of inputs and frames, the total time and the time from an input to the next frame
+        (min, median and max, in seconds), and whether the final screen matches the recorded one.
+    """
+    recording = Recording(path)
+    inputs = recording.inputs()
+    window = _ReplayWindow(inputs, recording.header["h"], recording.header["w"], speed)
+    app.window = window
+    start = perf_counter()
+    try:
+        app.run()
+    except EndOfRecording:
+        pass
+    duration = perf_counter() - start
+
+    expected = recording.last_frame()
+    latencies = window.latencies or [0.0]
+    return {
+        "inputs": len(inputs),
+        "frames": window.flushes,
+        "duration": duration,
+        "latency_min": min(latencies),
+        "latency_median": statistics.median(latencies),
+        "latency_max": max(latencies),
+        "matches": expected is not None and expected.get_max_yx() == window.buffer.get_max_yx() and
+                   not window.buffer.changed_rows(expected),
+    }
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Dict, List, Set, Union
+
+import asyncio
+import json
+import os
+import struct
+
+from ansi import Encoder
+from cell_buffer import CellBuffer
+from gui_elements import GuiElement
+from _self_pipe import SelfPipe
+
+
+# Every message is a JSON object preceded by its length, as a 4 bytes big-endian integer.
+_HEADER = struct.Struct("!I")
+
+
+def pack(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(payload)) + payload
+
+
+class _Client(object):
+    """The state of an attached client, as known by the server.
+
+        Attributes:
+            view (CellBuffer): What the client displays once it applied every frame sent so far.
+            y (int): The row of the shared screen shown at the top of the client.
+            x (int): The column of the shared screen shown at the left of the client.
+            focus (GuiElement): The element active for the keys of the client, None until it types a key.
+            dirty (Set[int]): The rows of the shared screen changed since the last frame sent to the client.
+            sent (int): The sequence number of the last frame sent.
+            acked (int): The sequence number of the last frame the client acknowledged.
+    """
+    def __init__(self, writer: asyncio.StreamWriter, h: int, w: int):
+        self.writer: asyncio.StreamWriter = writer
+        self.view: CellBuffer = CellBuffer(h, w)
+        self.y: int = 0
+        self.x: int = 0
+        self.focus: Union[None, GuiElement] = None
+        self.dirty: Set[int] = set()
+        self.full: bool = True
+        self.sent: int = 0
+        self.acked: int = 0
+
+
+class ShareServer(object):
+    """Serves the screen of an application using the headless backend to the clients connecting to a Unix socket.
+        The application renders once into the cell buffer of its window, whatever the number of clients. Each client
+        has its own viewport (size and scroll position) and receives the runs of cells that changed in it. A client
+        lagging behind does not receive every frame: the changes accumulate until it acknowledges the frames in
+        flight, then a single diff brings it up to date.
+
+        Each client has its own focus: the keys it types go to the element it activated last, whatever the other
+        clients did meanwhile. Its focus is made the active element of the application before each of its keys is
+        handled, so the shared screen highlights the focus of the client which typed last.
+
+        Attributes:
+            app: The application, a WindowManager whose window is a headless one (see headless_app.py).
+            path (str): The path of the Unix socket.
+            max_in_flight (int): Number of frames sent to a client before it has to acknowledge them. The changes made
+                                 meanwhile are merged into the next frame.
+
+        Note:
+            It runs on the event loop of the asynchronous run mode: start() it from main_async().
+    """
+    def __init__(self, app, path: str, max_in_flight: int = 2):
+        self.app = app
+        self.path: str = path
+        self.max_in_flight: int = max_in_flight
+        self.buffer: CellBuffer = app.window.buffer
+        # The shared screen as it was at the previous frame, to find the rows changed by a frame once for all clients.
+        self._previous: CellBuffer = CellBuffer(0, 0)
+        self._clients: List[_Client] = []
+        self._server: Union[None, asyncio.AbstractServer] = None
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            # Left by a server which did not terminate properly.
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        self.app.window.flush_listeners.append(self.publish)
+
+    async def close(self) -> None:
+        if self.publish in self.app.window.flush_listeners:
+            self.app.window.flush_listeners.remove(self.publish)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for client in self._clients:
+            client.writer.close()
+        self._clients = []
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def publish(self) -> None:
+        """Sends the changes of the shared screen to the clients. Called after each frame of the application."""
+        # Only the rows written since the previous frame are compared.
+        touched, self.buffer.touched = self.buffer.touched, set()
+        changed = self.buffer.changed_rows(self._previous, touched)
+        if not changed:
+            return
+        if self._previous.h != self.buffer.h or self._previous.w != self.buffer.w:
+            self._previous = self.buffer.copy()
+        else:
+            self.buffer.update_view(self._previous, rows=changed)
+
+        for client in self._clients:
+            client.dirty.update(changed)
+            self._send(client)
+
+    def attach(self, writer: Any, h: int, w: int) -> _Client:
+        """Registers a client displaying h rows and w columns, writing its frames to writer. The first frame holds the
+            whole viewport."""
+        client = _Client(writer, h, w)
+        self._clients.append(client)
+        self._send(client)
+        return client
+
+    def detach(self, client: _Client) -> None:
+        if client in self._clients:
+            self._clients.remove(client)
+
+    def _send(self, client: _Client) -> None:
+        if client.sent - client.acked >= self.max_in_flight or not (client.dirty or client.full):
+            return
+        if client.full:
+            # The client clears its screen: the view is compared to a blank one.
+            client.view.clear()
+            runs = self.buffer.update_view(client.view, client.y, client.x)
+        else:
+            runs = self.buffer.update_view(client.view, client.y, client.x, client.dirty)
+        client.dirty.clear()
+        if not runs and not client.full:
+            return
+        client.sent += 1
+        client.writer.write(pack({"t": "frame", "seq": client.sent, "full": client.full, "runs": runs}))
+        client.full = False
+
+    def _on_message(self, client: _Client, message: Dict[str, Any]) -> None:
+        kind = message.get("t")
+        if kind == "ack":
+            client.acked = max(client.acked, message["seq"])
+            self._send(client)
+        elif kind == "key":
+            self._handle_key(client, message["key"])
+        elif kind == "size":
+            client.view.resize(message["h"], message["w"])
+            client.full = True
+            self._send(client)
+        elif kind == "scroll":
+            client.y = max(0, min(client.y + message.get("dy", 0), self.buffer.h - 1))
+            client.x = max(0, min(client.x + message.get("dx", 0), self.buffer.w - 1))
+            client.full = True
+            self._send(client)
+
+    def _handle_key(self, client: _Client, key: Any) -> None:
+        # The key is handled at once, not queued on the window, so that it meets the focus of the client which typed it.
+        app = self.app
+        if client.focus is not None and client.focus is not app.get_active() and not app.activate(client.focus):
+            # The element is hidden or gone: the client continues from the active element of the application.
+            client.focus = None
+        app.handle_key(key)
+        active = app.get_active()
+        client.focus = active if isinstance(active, GuiElement) else None
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = None
+        try:
+            while True:
+                size, = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                message = json.loads(await reader.readexactly(size))
+                if client is None:
+                    if message.get("t") != "hello":
+                        break
+                    client = self.attach(writer, message["h"], message["w"])
+                else:
+                    self._on_message(client, message)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            if client is not None:
+                self.detach(client)
+            writer.close()
+
+
+# Escape sequences of the special keys, translated to the curses key codes used by the headless backend.
+_KEYS = {
+    "\x1b[A": 259, "\x1b[B": 258, "\x1b[D": 260, "\x1b[C": 261,
+    "\x1b[H": 262, "\x1b[F": 360, "\x1b[5~": 339, "\x1b[6~": 338,
+    "\r": 10, "\x7f": 263,
+}
+# Shift + arrows scroll the viewport of the client instead.
+_SCROLL = {"\x1b[1;2A": (-1, 0), "\x1b[1;2B": (1, 0), "\x1b[1;2D": (0, -1), "\x1b[1;2C": (0, 1)}
+_DETACH = "\x04"  # Ctrl-D
+
+
+def _split_keys(text: str) -> List[str]:
+    keys = []
+    n = 0
+    while n < len(text):
+        for sequence in (text[n:n + 6], text[n:n + 4], text[n:n + 3]):
+            if sequence in _KEYS or sequence in _SCROLL:
+                keys.append(sequence)
+                n += len(sequence)
+                break
+        else:
+            keys.append(text[n])
+            n += 1
+    return keys
+
+
+def connect(path: str) -> None:
+    """The thin client: displays the shared screen in the current terminal and sends the keys typed. Shift + arrows
+        scroll the view, Ctrl-D detaches. It is started with: python share.py SOCKET_PATH"""
+    import codecs
+    import selectors
+    import shutil
+    import socket
+    import sys
+    import termios
+    import tty
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    stdin, stdout = sys.stdin.fileno(), sys.stdout
+    size = shutil.get_terminal_size()
+    sock.sendall(pack({"t": "hello", "h": size.lines, "w": size.columns}))
+
+    pipe = SelfPipe()
+    pipe.watch_resize()
+    saved = termios.tcgetattr(stdin)
+    tty.setraw(stdin)
+    stdout.write("\x1b[?1049h\x1b[?25l\x1b[2J")
+    stdout.flush()
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(stdin, selectors.EVENT_READ)
+    selector.register(pipe, selectors.EVENT_READ)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    # What the terminal displays, so that the encoder can write unchanged cells again instead of moving over them.
+    view = CellBuffer(size.lines, size.columns)
+    encoder = Encoder(size.columns)
+    received = b""
+    try:
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is pipe:
+                    pipe.drain()
+                    size = shutil.get_terminal_size()
+                    sock.sendall(pack({"t": "size", "h": size.lines, "w": size.columns}))
+                elif key.fileobj is sock:
+                    chunk = sock.recv(1 << 16)
+                    if not chunk:
+                        return
+                    received += chunk
+                    while len(received) >= _HEADER.size:
+                        length, = _HEADER.unpack_from(received)
+                        if len(received) < _HEADER.size + length:
+                            break
+                        message = json.loads(received[_HEADER.size:_HEADER.size + length])
+                        received = received[_HEADER.size + length:]
+                        if message["t"] == "frame":
+                            output = ""
+                            if message["full"]:
+                                output = "\x1b[0m\x1b[2J"
+                                view.resize(size.lines, size.columns)
+                                encoder.width = size.columns
+                                encoder.invalidate()
+                            for y, x, text, attr in message["runs"]:
+                                view.draw(y, x, text, attr)
+                            stdout.write(output + encoder.encode(message["runs"], view) + encoder.end())
+                            stdout.flush()
+                            sock.sendall(pack({"t": "ack", "seq": message["seq"]}))
+                else:
+                    for typed in _split_keys(decoder.decode(os.read(stdin, 1024))):
+                        if typed == _DETACH:
+                            return
+                        if typed in _SCROLL:
+                            dy, dx = _SCROLL[typed]
+                            sock.sendall(pack({"t": "scroll", "dy": dy, "dx": dx}))
+                        else:
+                            sock.sendall(pack({"t": "key", "key": _KEYS.get(typed, ord(typed[0]))}))
+    finally:
+        termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+        stdout.write("\x1b[0m\x1b[?25h\x1b[?1049l")
+        stdout.flush()
+        sock.close()
+        pipe.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        sys.exit("usage: python share.py SOCKET_PATH")
+    connect(sys.argv[1])
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+import layout
+from checkbox import Checkbox
+from layout import LayoutError, build, cache_path, register_element
+
+
+def _description(**changes):
+    description = {"type": "panel", "id": "main", "y": ["absolute", 0], "x": ["absolute", 0],
+                   "h": ["relative", 1], "w": ["relative", 1],
+                   "children": [{"type": "checkbox", "id": "check", "y": ["absolute", 0], "x": ["absolute", 0],
+                                 "text": "Check"}]}
+    description.update(changes)
+    return description
+
+
+def test_valid_description():
+    panel = build(_description())
+    assert [child.node.name for child in panel.children] == ["check"]
+
+
+@pytest.mark.parametrize("description, where", [
+    (_description(titel="typo"), "elements[0]:"),
+    (_description(y=["absolute", [0]]), "elements[0]:"),
+    (_description(y=["nowhere", 0]), "elements[0]:"),
+    (_description(children=[{"type": "checkbox", "id": "check", "y": ["absolute", 0], "x": ["absolute", 0],
+                             "text": "Check", "children": []}, "text"]), "elements[0].children[1]:"),
+    (_description(children=[{"type": "checkbox", "id": "check", "y": ["absolute", 0], "x": ["absolute", 0],
+                             "text": "Check", "children": [{"type": "checkbox"}]}]), "elements[0].children[0]:"),
+    (_description(children=[{"type": "checkbox", "id": "check", "y": ["absolute", 0], "x": ["absolute", 0],
+                             "colour": 1}]), "elements[0].children[0]:"),
+])
+def test_invalid_description_raises_layout_error(description, where):
+    with pytest.raises(LayoutError, match=r"^" + where.replace("[", r"\[").replace("]", r"\]")):
+        build(description, "elements[0]")
+
+
+def test_registered_modules_are_part_of_the_cache_key(tmp_path):
+    path = tmp_path / "layout.json"
+    path.write_text(json.dumps({"elements": [_description()]}))
+    content = path.read_bytes()
+    before = cache_path(str(path), content)
+
+    # This module holds the factory: its source now takes part in the cache key.
+    register_element("test_checkbox", lambda *args, **kwargs: Checkbox(*args, **kwargs))
+    try:
+        assert cache_path(str(path), content) != before
+    finally:
+        del layout._ELEMENT_TYPES["test_checkbox"]
+    assert cache_path(str(path), content) == before
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from checkbox import Checkbox
+from constraints import position_constraint, size_constraint
+from headless_app import HeadlessApp
+from panels import Panel
+from text_input import KEY_DOWN, KEY_PAGE_DOWN, KEY_RIGHT, TextEditor, TextInput
+
+
+class _App(HeadlessApp):
+    def design(self):
+        pass
+
+    def main(self):
+        pass
+
+
+def _build(h, w):
+    app = _App(h, w)
+    panel = Panel(position_constraint("absolute", 0), position_constraint("absolute", 0),
+                  size_constraint("relative", 1), size_constraint("relative", 1), "panel")
+    checkbox = Checkbox(position_constraint("absolute", 0), position_constraint("absolute", 0), "check", "Ok")
+    text_input = TextInput(position_constraint("absolute", 1), position_constraint("absolute", 0),
+                           size_constraint("absolute", 20), "input", "hello")
+    editor = TextEditor(position_constraint("absolute", 2), position_constraint("absolute", 0),
+                        size_constraint("absolute", 6), size_constraint("absolute", 20), "editor", "one\ntwo\n日本")
+    for element in (checkbox, text_input, editor):
+        panel.add_child(element)
+    app.add_element(panel)
+    return app, panel, checkbox, text_input, editor
+
+
+def test_wide_characters_are_cut_in_cells():
+    app, panel, checkbox, text_input, editor = _build(12, 30)
+    text_input.text = "y" * 19 + "日y"
+    text_input.cursor = 0
+    app.render()
+    app.flush()
+
+    row = app.window.buffer.lines()[2]
+    # The second wide character would straddle the right edge of the 20 cells of the input: a blank replaces it.
+    assert row[1:21] == "y" * 19 + " "
+
+
+def test_too_small_window_hides_the_text_widgets():
+    app, panel, checkbox, text_input, editor = _build(12, 30)
+    app.render()
+    assert text_input.is_visible and editor.is_visible
+
+    # Below the minimum size of both widgets: they are hidden, not their panel.
+    app.window.resize(5, 10)
+    app.render()
+    assert panel.is_visible and checkbox.is_visible
+    assert not text_input.is_visible and not editor.is_visible
+
+    # Keys reaching the hidden widgets do not raise either.
+    for key in ("x", KEY_RIGHT, KEY_DOWN, KEY_PAGE_DOWN, "\n"):
+        text_input.interact(key)
+        editor.interact(key)
+    assert text_input.text == "hellox"
+
+    app.window.resize(12, 30)
+    app.render()
+    assert text_input.is_visible and editor.is_visible
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from checkbox import Checkbox
+from constraints import position_constraint
+from headless_app import HeadlessApp
+
+
+class _App(HeadlessApp):
+    def design(self):
+        pass
+
+    def main(self):
+        pass
+
+
+def _toggle(checkbox):
+    def update():
+        checkbox.toggle = not checkbox.toggle
+    return update
+
+
+def _fail():
+    raise RuntimeError("update failed")
+
+
+def test_failing_update_does_not_drop_the_others():
+    app = _App(5, 20)
+    first = Checkbox(position_constraint("absolute", 0), position_constraint("absolute", 0), "first", "First")
+    second = Checkbox(position_constraint("absolute", 1), position_constraint("absolute", 0), "second", "Second")
+    app.add_element(first)
+    app.add_element(second)
+    app.render()
+
+    app.post(_toggle(first), first)
+    app.post(_fail, first)
+    app.post(_toggle(second), second)
+    # The error is raised once the updates around it are applied and drawn.
+    with pytest.raises(RuntimeError):
+        app.process_updates()
+
+    assert first.toggle and second.toggle
+    lines = app.window.buffer.lines()
+    assert lines[0].startswith("[x] First") and lines[1].startswith("[x] Second")
+    assert app.process_updates() == 0
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Callable, List, Set, Tuple, Union
+
+from gui_elements import GuiElement, IPositionConstraint, ISizeConstraint, TextStyles, CannotDrawError
+from constraints import size_constraint
+from _gap_buffer import GapBuffer
+from _rope import Rope
+from text_width import truncate, width
+
+# Codes of the editing keys. They have the values curses and blessed use.
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
+KEY_HOME = 262
+KEY_BACKSPACE = 263
+KEY_DELETE = 330
+KEY_PAGE_DOWN = 338
+KEY_PAGE_UP = 339
+KEY_ENTER = 343
+KEY_END = 360
+
+
+def _read_key(value: Any) -> Tuple[Union[None, int], str]:
+    """Converts an input of any backend to the code of an editing key, or to the text it types.
+
+    Returns:
+        The (code, text) pair: the code is None for a text, the text is empty for a key.
+    """
+    code = getattr(value, "code", None)
+    if code is not None:
+        # A blessed keystroke of a special key.
+        return code, ''
+    if isinstance(value, int):
+        if value >= 256:
+            return value, ''
+        value = chr(value)
+    if value in ('\r', '\n'):
+        return KEY_ENTER, ''
+    if value in ('\x7f', '\b'):
+        return KEY_BACKSPACE, ''
+    if isinstance(value, str) and value.isprintable():
+        return None, value
+    return None, ''
+
+
+class TextInput(GuiElement):
+    """A single line of text typed by the user. The text is kept in a gap buffer: typing and erasing at the cursor
+        take constant time whatever the length of the text. Keys are passed with interact(key), e.g. by
+        WindowManager.interact() while the input is the active element.
+
+        Attributes:
+            text (str): The text typed. Setting it moves the cursor to its end.
+            cursor (int): The position of the cursor in the text.
+    """
+    __slots__ = ("_buffer", "_scroll", "_callbacks")
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 w_constraint: ISizeConstraint, input_id: str, text: str = '',
+                 on_submit: Callable[[str], None] = None):
+
+        super().__init__(y_constraint, x_constraint, size_constraint("absolute", 1), w_constraint, input_id,
+                         min_w=1)
+
+        self._buffer: GapBuffer = GapBuffer(text)
+        # The first character shown, so that the cursor stays in view.
+        self._scroll: int = 0
+        self._callbacks: List[Callable[[str], None]] = []
+        if on_submit is not None:
+            self._callbacks.append(on_submit)
+
+    @property
+    def text(self) -> str:
+        return self._buffer.text
+
+    @text.setter
+    def text(self, text: str) -> None:
+        self._buffer = GapBuffer(text)
+        self._scroll = 0
+
+    @property
+    def cursor(self) -> int:
+        return self._buffer.cursor
+
+    @cursor.setter
+    def cursor(self, position: int) -> None:
+        self._buffer.cursor = position
+
+    def on_submit(self, callback: Callable[[str], None]) -> Callable:
+        """Registers a function called with the text when the enter key is pressed. It returns the function, so that
+            it can be used as a decorator."""
+        self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: Callable) -> None:
+        self._callbacks.remove(callback)
+
+    def interact(self, value: Any = 0) -> None:
+        code, text = _read_key(value)
+        buffer = self._buffer
+        if text:
+            buffer.insert(text)
+        elif code == KEY_BACKSPACE:
+            buffer.delete_before()
+        elif code == KEY_DELETE:
+            buffer.delete_after()
+        elif code == KEY_LEFT:
+            buffer.cursor -= 1
+        elif code == KEY_RIGHT:
+            buffer.cursor += 1
+        elif code == KEY_HOME:
+            buffer.cursor = 0
+        elif code == KEY_END:
+            buffer.cursor = len(buffer)
+        elif code == KEY_ENTER:
+            for callback in self._callbacks:
+                callback(buffer.text)
+            return
+        else:
+            return
+        self.render()
+
+    def render(self) -> None:
+        try:
+            # The size is computed inside the try: an input which does not fit is hidden, not its panel.
+            w = self.get_max_yx()[1]
+            buffer = self._buffer
+            cursor = buffer.cursor
+            # The character under the cursor, or a blank after the end of the text.
+            under = buffer.slice(cursor, cursor + 1) or ' '
+            # The view scrolls by the characters needed to keep the cursor in it, at worst in its last cells, and
+            # shows as much of the text as it can. The view is measured in cells: a wide character takes two of them.
+            self._scroll = min(max(min(self._scroll, len(buffer) - w + 1), cursor - w + 1, 0), cursor)
+            while self._scroll < cursor and width(buffer.slice(self._scroll, cursor)) + max(width(under), 1) > w:
+                self._scroll += 1
+
+            before = buffer.slice(self._scroll, cursor)
+            after = buffer.slice(cursor, cursor + w)
+            style = TextStyles.UNDERLINE | (TextStyles.CYAN if self.is_active else 0)
+            self.draw(0, 0, before, style)
+            x = width(before)
+            if self.is_active and x < w:
+                # A wide character does not fit in a view of a single cell.
+                self.draw(0, x, truncate(under, w - x) or ' ', style | TextStyles.HIGHLIGHTED)
+                x += max(width(under), 1)
+                after = after[1:]
+            # A wide character straddling the right edge is replaced by a blank, so that every cell is drawn.
+            after = truncate(after, w - x)
+            self.draw(0, x, after + ' ' * max(w - x - width(after), 0), style)
+            self.is_visible = True
+
+        except CannotDrawError:
+            self.is_visible = False
+
+
+class TextEditor(GuiElement):
+    """A multi-line text edited by the user. The text is kept in a rope: typing, erasing and moving between lines
+        take a time proportional to the logarithm of the length of the text, and a key only redraws the lines of the
+        view it changed. Keys are passed with interact(key), e.g. by WindowManager.interact() while the editor is the
+        active element.
+
+        Attributes:
+            text (str): The whole text. Setting it moves the cursor to its start.
+            cursor (int): The position of the cursor in the text.
+            line_count (int): The number of lines of the text.
+    """
+    __slots__ = ("_rope", "_cursor", "_column", "_top", "_left", "_dirty", "_dirty_from")
+
+    def __init__(self, y_constraint: IPositionConstraint, x_constraint: IPositionConstraint,
+                 h_constraint: ISizeConstraint, w_constraint: ISizeConstraint, editor_id: str, text: str = ''):
+
+        super().__init__(y_constraint, x_constraint, h_constraint, w_constraint, editor_id, min_h=1, min_w=1)
+
+        self._rope: Rope = Rope(text)
+        self._cursor: int = 0
+        # The column the cursor goes back to when moving across shorter lines, None after a horizontal move.
+        self._column: Union[None, int] = None
+        # The first line and the first column shown.
+        self._top: int = 0
+        self._left: int = 0
+        # The lines to redraw after a key: single lines, and all the lines from _dirty_from when lines were inserted or
+        # removed above the bottom of the view.
+        self._dirty: Set[int] = set()
+        self._dirty_from: Union[None, int] = None
+
+    @property
+    def text(self) -> str:
+        return str(self._rope)
+
+    @text.setter
+    def text(self, text: str) -> None:
+        self._rope = Rope(text)
+        self._cursor = 0
+        self._column = None
+        self._top = self._left = 0
+
+    @property
+    def cursor(self) -> int:
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, position: int) -> None:
+        self._cursor = min(max(position, 0), len(self._rope))
+        self._column = None
+
+    @property
+    def line_count(self) -> int:
+        return self._rope.line_count
+
+    def line(self, line: int) -> str:
+        """Returns the text of a line, counted from 0, without its line break."""
+        return self._rope.line(line)
+
+    def cursor_yx(self) -> Tuple[int, int]:
+        """Returns the line and the column of the cursor in the text."""
+        line = self._rope.line_of(self._cursor)
+        return line, self._cursor - self._rope.line_start(line)
+
+    def insert(self, text: str) -> None:
+        """Inserts text at the cursor, which moves after it, and redraws the lines changed."""
+        line = self._rope.line_of(self._cursor)
+        self._rope.insert(self._cursor, text)
+        self._cursor += len(text)
+        self._column = None
+        self._changed(line, '\n' in text)
+        self._redraw()
+
+    def interact(self, value: Any = 0) -> None:
+        code, text = _read_key(value)
+        if text:
+            self.insert(text)
+            return
+        if code == KEY_ENTER:
+            self.insert('\n')
+            return
+
+        rope = self._rope
+        line, column = self.cursor_yx()
+        if code == KEY_BACKSPACE or code == KEY_DELETE:
+            start = self._cursor - 1 if code == KEY_BACKSPACE else self._cursor
+            erased = rope.delete(start, start + 1)
+            if not erased:
+                return
+            self._cursor = start
+            self._column = None
+            self._changed(line - 1 if erased == '\n' and code == KEY_BACKSPACE else line, erased == '\n')
+        elif code in (KEY_LEFT, KEY_RIGHT, KEY_HOME, KEY_END):
+            if code == KEY_LEFT:
+                self._cursor = max(self._cursor - 1, 0)
+            elif code == KEY_RIGHT:
+                self._cursor = min(self._cursor + 1, len(rope))
+            elif code == KEY_HOME:
+                self._cursor -= column
+            else:
+                self._cursor = rope.line_start(line) + len(rope.line(line))
+            self._column = None
+            self._moved(line)
+        elif code in (KEY_UP, KEY_DOWN, KEY_PAGE_UP, KEY_PAGE_DOWN):
+            try:
+                page = self.h
+            except CannotDrawError:
+                # The editor does not fit in the window: a page is a line.
+                page = 1
+            steps = {KEY_UP: -1, KEY_DOWN: 1, KEY_PAGE_UP: -page, KEY_PAGE_DOWN: page}[code]
+            target = min(max(line + steps, 0), rope.line_count - 1)
+            if self._column is None:
+                self._column = column
+            self._cursor = rope.line_start(target) + min(self._column, len(rope.line(target)))
+            self._moved(line)
+        else:
+            return
+        self._redraw()
+
+    def _changed(self, line: int, lines_moved: bool) -> None:
+        # The text of a line changed, and the lines below it moved if a line break was inserted or erased.
+        if lines_moved:
+            self._dirty_from = line if self._dirty_from is None else min(self._dirty_from, line)
+        else:
+            self._dirty.add(line)
+        self._dirty.add(self._rope.line_of(self._cursor))
+
+    def _moved(self, line: int) -> None:
+        # The cursor left a line: the line it left and the line it reached are redrawn.
+        self._dirty.add(line)
+        self._dirty.add(self._rope.line_of(self._cursor))
+
+    def _scroll(self, h: int, w: int) -> bool:
+        """Scrolls the view so that the cursor is in it.
+
+        Returns:
+            True if the view moved.
+        """
+        line, column = self.cursor_yx()
+        top, left = self._top, self._left
+        if line < top:
+            top = line
+        elif line >= top + h:
+            top = line - h + 1
+        # The view jumps by a quarter of its width, not to redraw it at every character typed at its edge. The first
+        # column shown is counted in characters, the view in cells: a wide character takes two of them.
+        if column < left:
+            left = max(column - w // 4, 0)
+        else:
+            start = self._cursor - column
+            shown = self._rope.slice(start + left, self._cursor + 1)
+            under = shown[column - left:]
+            cursor_w = 1 if under in ('', '\n') else max(width(under), 1)
+            if width(shown[:column - left]) + cursor_w > w:
+                left = max(column - w + 1 + w // 4, left)
+                while left < column and width(self._rope.slice(start + left, self._cursor)) + cursor_w > w - w // 4:
+                    left += 1
+        moved = (top, left) != (self._top, self._left)
+        self._top, self._left = top, left
+        return moved
+
+    def _redraw(self) -> None:
+        # Draws the lines changed by a key, or the whole view if it scrolled.
+        try:
+            h, w = self.get_max_yx()
+            if self._scroll(h, w):
+                self.render()
+                return
+            rows = {line - self._top for line in self._dirty}
+            if self._dirty_from is not None:
+                rows.update(range(self._dirty_from - self._top, h))
+            self._dirty = set()
+            self._dirty_from = None
+            if not self.is_visible:
+                return
+            cursor = self.cursor_yx()
+            for row in sorted(rows):
+                if 0 <= row < h:
+                    self._draw_row(row, w, cursor)
+        except CannotDrawError:
+            self.is_visible = False
+
+    def _draw_row(self, row: int, w: int, cursor: Tuple[int, int]) -> None:
+        line = self._top + row
+        text = truncate(self._rope.line(line)[self._left:], w) if line < self._rope.line_count else ''
+        style = TextStyles.CYAN if self.is_active else 0
+        cursor_line, column = cursor
+        x = 0
+        if self.is_active and line == cursor_line:
+            # The character under the cursor is highlighted, or a blank after the end of the line.
+            column -= self._left
+            before, under, after = text[:column], text[column:column + 1] or ' ', text[column + 1:]
+            self.draw(row, 0, before, style)
+            x = width(before)
+            self.draw(row, x, truncate(under, w - x) or ' ', style | TextStyles.HIGHLIGHTED)
+            x += max(width(under), 1)
+            text = truncate(after, w - x)
+        # The text is cut and padded in cells, so that a wide character straddling the right edge leaves a blank.
+        self.draw(row, x, text + ' ' * max(w - x - width(text), 0), style)
+
+    def render(self) -> None:
+        self._dirty = set()
+        self._dirty_from = None
+        try:
+            # The size is computed inside the try: an editor which does not fit is hidden, not its panel.
+            h, w = self.get_max_yx()
+            self._scroll(h, w)
+            cursor = self.cursor_yx()
+            for row in range(h):
+                self._draw_row(row, w, cursor)
+            self.is_visible = True
+
+        except CannotDrawError:
+            self.is_visible = False
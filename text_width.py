@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from typing import List
+
+from functools import lru_cache
+from unicodedata import category, east_asian_width
+
+
+def char_width(char: str) -> int:
+    """Computes the number of terminal cells taken by a single character.
+
+    Returns:
+        0 for combining marks, format and control characters, 2 for wide and fullwidth characters (CJK, most emoji)
+        and 1 otherwise.
+    """
+    if char < '\x7f':
+        return 1 if char >= ' ' else 0
+    if category(char) in ('Mn', 'Me', 'Cf', 'Cc'):
+        return 0
+    return 2 if east_asian_width(char) in ('W', 'F') else 1
+
+
+@lru_cache(maxsize=4096)
+def _width(text: str) -> int:
+    return sum(char_width(char) for char in text)
+
+
+@lru_cache(maxsize=4096)
+def _truncate(text: str, max_width: int) -> str:
+    used = 0
+    for n, char in enumerate(text):
+        used += char_width(char)
+        if used > max_width:
+            return text[:n]
+    return text
+
+
+@lru_cache(maxsize=4096)
+def _cells(text: str) -> List[str]:
+    cells: List[str] = []
+    for char in text:
+        w = char_width(char)
+        if w == 0:
+            # Combining characters stay with the character they modify, not with the second cell of a wide one.
+            if not cells:
+                cells.append(char)
+            elif cells[-1] or len(cells) < 2:
+                cells[-1] += char
+            else:
+                cells[-2] += char
+        elif w == 1:
+            cells.append(char)
+        else:
+            cells.extend((char, ''))
+    return cells
+
+
+def width(text: str) -> int:
+    """Computes the number of terminal cells taken by a text.
+
+    Note:
+        ASCII text is measured by its length, other texts are measured character by character and the result is
+        cached, as the same labels are measured at every frame.
+    """
+    if text.isascii():
+        return len(text)
+    return _width(text)
+
+
+def truncate(text: str, max_width: int) -> str:
+    """Shortens a text to fit in at most max_width terminal cells. A wide character which would only fit by half is
+        removed.
+    """
+    if max_width <= 0:
+        return ''
+    if text.isascii():
+        return text[:max_width]
+    return _truncate(text, max_width)
+
+
+def cells(text: str) -> List[str]:
+    """Splits a text into terminal cells. A wide character takes its cell and an empty string for the next one,
+        combining characters are kept in the cell of the character they modify, so that ''.join(cells) == text.
+
+    Note:
+        The returned list is cached and shared, it must not be modified.
+    """
+    if text.isascii():
+        return list(text)
+    return _cells(text)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Imports used for type hints
+from __future__ import annotations
+from typing import Any, Deque, Dict, IO, Iterable, List, Tuple, Union
+
+from collections import deque
+from time import perf_counter
+import json
+import os
+import threading
+
+from instrumentation import ISpanSink
+
+
+# Category of the spans reported by the instrumentation hooks.
+_HOOK_CATEGORIES: Dict[str, str] = {
+    "impose": "layout",
+    "get_max_yx": "layout",
+    "render": "render",
+    "draw": "backend",
+    "draw_rectangle": "backend",
+    "interact": "dispatch",
+}
+
+CATEGORIES = ("input", "dispatch", "frame", "layout", "render", "backend")
+
+
+class TraceRecorder(ISpanSink):
+    """Records timed spans as Chrome trace events (the format read by chrome://tracing, Perfetto or speedscope).
+        The events are either streamed to a JSON file, or kept in a bounded in-memory ring buffer.
+
+        Attributes:
+            path (str): (Optional) The file the events are streamed to. Events are written as soon as they are
+                        recorded, so the memory used does not depend on the length of the session.
+            capacity (int): Maximum number of events kept in memory when no path is given. The oldest are dropped.
+            categories (Iterable[str]): (Optional) The categories to record among "input", "dispatch", "frame",
+                                        "layout", "render" and "backend". All of them by default.
+    """
+    def __init__(self, path: str = None, capacity: int = 100000, categories: Iterable[str] = None):
+        self.path: Union[None, str] = path
+        self.categories: frozenset = frozenset(categories if categories is not None else CATEGORIES)
+        self._origin: float = perf_counter()
+        self._pid: int = os.getpid()
+        self._ring: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._file: Union[None, IO] = None
+        self._written: int = 0
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self._file = open(path, "w")
+            self._file.write("[\n")
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        """The events currently held by the ring buffer (always empty when streaming to a file)."""
+        return list(self._ring)
+
+    def complete(self, name: str, category: str, start: float, end: float, args: Dict[str, Any] = None) -> None:
+        """Records a span that started and ended at the given perf_counter() values."""
+        if category not in self.categories:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+
+        if self._file is None:
+            self._ring.append(event)
+            return
+
+        with self._lock:
+            self._file.write((",\n" if self._written else "") + json.dumps(event))
+            self._written += 1
+            # The file is flushed at the end of every frame so that a trace survives an abrupt termination.
+            if category == "frame":
+                self._file.flush()
+
+    def span(self, kind: str, target: Any, args: Tuple, start: float, end: float) -> None:
+        """Implements the ISpanSink interface to record the calls reported by the instrumentation hooks."""
+        category = _HOOK_CATEGORIES.get(kind)
+        if category is None or category not in self.categories:
+            return
+        if kind == "render" or kind == "interact":
+            name = "{} {}".format(kind, target.node.name)
+        elif kind == "impose":
+            name = "impose {} {}".format(type(target).__name__.lstrip("_"), args[0] if args else "")
+        else:
+            name = "{} {}".format(kind, type(target).__name__.lstrip("_"))
+        self.complete(name, category, start, end)
+
+    def dump(self, path: str) -> None:
+        """Writes the events of the ring buffer as a complete JSON trace file."""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+    def close(self) -> None:
+        """Terminates the JSON array of the streamed file. Nothing is done for in-memory recorders."""
+        if self._file is not None:
+            with self._lock:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None